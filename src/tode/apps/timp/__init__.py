@@ -4,6 +4,8 @@ from textual.color import Color
 from textual.geometry import Size
 
 from .image import Image
+from .image.clipboard import glyphs
+from .image.stamp import Stamp
 
 from .dialogs.panels import RightDock
 from .dialogs.toolbox import Toolbox
@@ -11,7 +13,10 @@ from .dialogs.brush_selector import BrushSelector
 from .dialogs.color_picker import ColorPicker
 from .dialogs.layers import Layers
 
-from .tools import Pencil
+from .tools import (
+    BucketFill, Clone, Eraser, FreeSelect, FuzzySelect, MoveTool, Pencil,
+    RectangleSelect, Smudge
+)
 from .tools.color_area import ColorArea
 
 from .workspace import Workspace
@@ -45,12 +50,22 @@ class TIMP(App):
 
     """
 
+    BINDINGS = [
+        ("ctrl+z", "undo", "Undo"),
+        ("ctrl+y", "redo", "Redo"),
+        ("ctrl+x", "cut", "Cut"),
+        ("ctrl+c", "copy", "Copy"),
+        ("ctrl+v", "paste", "Paste"),
+        ("ctrl+b", "brush_from_clipboard", "Brush from clipboard"),
+    ]
+
     title = "TIMP"
     preferred_state = SizeState.maximized
     memory = dict()
     tools = dict()
     dialogs = dict()
     active_tool = None
+    clipboard = None
     AUTO_FOCUS = None
 
     def __init__(self):
@@ -78,6 +93,14 @@ class TIMP(App):
         self.dialogs[Layers] = Layers()
 
         self.tools[Pencil] = Pencil(self.tools[ColorArea])
+        self.tools[BucketFill] = BucketFill(self.tools[ColorArea])
+        self.tools[FuzzySelect] = FuzzySelect(self.tools[ColorArea])
+        self.tools[RectangleSelect] = RectangleSelect(self.tools[ColorArea])
+        self.tools[FreeSelect] = FreeSelect(self.tools[ColorArea])
+        self.tools[MoveTool] = MoveTool(self.tools[ColorArea])
+        self.tools[Eraser] = Eraser(self.tools[ColorArea])
+        self.tools[Clone] = Clone(self.tools[ColorArea])
+        self.tools[Smudge] = Smudge(self.tools[ColorArea])
         self.workspace = Workspace()
 
         self.right_dock = RightDock(
@@ -98,6 +121,7 @@ class TIMP(App):
         event.stop()
         self.memory['brush'] = event.brush
         self.tools[Pencil].brush = event.brush
+        self.tools[BucketFill].brush = event.brush
         self.dialogs[Toolbox].refresh(recompose=True)
 
     def on_color_picked(self, event):
@@ -131,7 +155,64 @@ class TIMP(App):
         self.workspace.new_tab(image)
         self.dialogs[Layers].image = image
 
+    @property
+    def active_image(self) -> Image | None:
+        workspace = self.workspace
+        if workspace.active_tab_idx is None:
+            return None
+        return workspace.tabs[workspace.active_tab_idx].content
+
+    def action_undo(self) -> None:
+        if self.active_image is not None:
+            self.active_image.undo()
+
+    def action_redo(self) -> None:
+        if self.active_image is not None:
+            self.active_image.redo()
+
+    def action_cut(self) -> None:
+        if self.active_image is not None:
+            self.clipboard = self.active_image.cut()
+
+    def action_copy(self) -> None:
+        if self.active_image is not None:
+            self.clipboard = self.active_image.copy()
+
+    def action_paste(self) -> None:
+        if self.active_image is not None and self.clipboard is not None:
+            self.active_image.paste(self.clipboard)
+
+    def action_brush_from_clipboard(self) -> None:
+        """Paints the glyphs of the clipboard with the custom shape."""
+        if self.clipboard is None:
+            return
+        try:
+            stamp = Stamp.from_glyphs(glyphs(self.clipboard))
+        except ValueError as e:
+            self.notify(str(e), severity="error")
+            return
+        for tool in (Pencil, Eraser, Clone, Smudge):
+            self.tools[tool].tool_options.use_stamp(stamp)
+
+    def on_image_release(self, message) -> None:
+        if self.active_tool is not None:
+            self.active_tool.end_stroke(message.image, message.pos)
+
+    def on_image_drag(self, message) -> None:
+        if self.active_tool is not None:
+            self.active_tool.drag_image(
+                message.image, message.layer, message.start, message.end
+            )
+
     def on_image_click(self, message) -> None:
         print(message.layer)
-        if self.active_tool is not None:
-            self.active_tool.apply_to_layer(message.layer, message.pos)
+        if self.active_tool is None:
+            return
+        if message.ctrl:
+            self.active_tool.ctrl_click(
+                message.image, message.layer, message.pos
+            )
+        else:
+            self.active_tool.apply_to_image(
+                message.image, message.layer, message.pos
+            )
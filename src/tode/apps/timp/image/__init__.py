@@ -1,18 +1,60 @@
+import os
+from bisect import bisect_right
+
 from textual.color import Color
 from textual.message import Message
 from textual.geometry import Size, Offset
 from textual.reactive import var, reactive
 from textual.widget import Widget
 
-from .canvas import Canvas, Layer, CanvasClick, LayerUpdate, LayerView
+from . import ansi, clipboard, document, journal
+from .canvas import (
+    Canvas, Layer, CanvasClick, CanvasDrag, CanvasRelease, LayerUpdate,
+    LayerView
+)
+from .history import History
+from .selection import Selection, combine
+from .flat import FlatView
 
 
 class ImageClick(Message):
 
-    def __init__(self, layer: Layer | None, pos: Offset) -> None:
+    def __init__(
+        self,
+        image,
+        layer: Layer | None,
+        pos: Offset,
+        ctrl: bool = False
+    ) -> None:
         super().__init__()
+        self.image = image
         self.layer = layer
         self.pos = pos
+        self.ctrl = ctrl
+
+
+class ImageDrag(Message):
+
+    def __init__(
+        self,
+        image,
+        layer: Layer | None,
+        start: Offset,
+        end: Offset
+    ) -> None:
+        super().__init__()
+        self.image = image
+        self.layer = layer
+        self.start = start
+        self.end = end
+
+
+class ImageRelease(Message):
+
+    def __init__(self, image, pos: Offset) -> None:
+        super().__init__()
+        self.image = image
+        self.pos = pos
 
 
 class Image(Widget):
@@ -32,6 +74,88 @@ class Image(Widget):
             image.create_layer(layer_name, size, background)
         return image
 
+    def open(path: str, compositing: str = "chain"):
+        size, layers, active = journal.recover(path)
+        image = Image(
+            name=os.path.basename(path), size=size, compositing=compositing
+        )
+        for layer in layers:
+            image.add_layer(layer)
+        if 0 <= active < len(layers):
+            image.active_layer_name = layers[active].name
+        return image
+
+    def from_ansi(path: str, compositing: str = "chain"):
+        layer = ansi.read_file(path, "Background")
+        image = Image(
+            name=os.path.basename(path),
+            size=layer.storage.size,
+            compositing=compositing
+        )
+        image.add_layer(layer)
+        return image
+
+    def save(self, path: str) -> None:
+        if self.journal is not None and self.journal.path == path:
+            self.journal.checkpoint()
+        else:
+            document.save(self, path)
+
+    def autosave(self, path: str | None) -> None:
+        """Journals every edit into `path` from now on, None to stop."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if path is not None:
+            self.journal = journal.Journal(self, path)
+        for layer in self._layers.values():
+            layer.journal = self.journal
+
+    def undo(self) -> bool:
+        return self.history.undo()
+
+    def redo(self) -> bool:
+        return self.history.redo()
+
+    def copy(self) -> clipboard.Clipboard | None:
+        """Copies the selected cells of the active layer."""
+        if self.active_layer is None:
+            return None
+        return clipboard.copy(self.active_layer, self.selection)
+
+    def cut(self) -> clipboard.Clipboard | None:
+        """Copies the selected cells of the active layer and clears them."""
+        clip = self.copy()
+        if clip is None:
+            return None
+        if self.selection is not None:
+            spans = self.selection.to_spans()
+        else:
+            width, height = self.image_size
+            spans = {y: [(0, width)] for y in range(height)}
+        self.history.end_stroke()
+        self.active_layer.set_spans(spans, None)
+        self.history.end_stroke()
+        return clip
+
+    def paste(self, clip: clipboard.Clipboard) -> Layer:
+        """Adds the clipboard as a new layer on top, where it was copied."""
+        name = self._unique_layer_name("Pasted Layer")
+        layer = clipboard.paste_layer(clip, name, self.image_size)
+        self.add_layer(layer)
+        return layer
+
+    def select(self, selection: Selection | None, mode: str = "replace"):
+        """Combines `selection` with the current one, None selects nothing."""
+        selection = combine(self.selection, selection, mode, self.image_size)
+        self.selection = selection
+        self.canvas.selection = selection
+        self.canvas.refresh()
+
+    def export_ansi(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            ansi.write(self.visible_layers, self.image_size, f)
+
     image_size: Size
     canvas: Canvas
     _layers: var[dict[str, Layer]] = var(None)
@@ -45,25 +169,39 @@ class Image(Widget):
         size: Size,
         layers: dict[str, Layer] | None = None,
         layer_order: list[str] | None = None,
-        active_layer_name: str | None = None
+        active_layer_name: str | None = None,
+        compositing: str = "chain"
     ) -> None:
         super().__init__(name=name)
         self.image_size = size
-        if layers is None:
-            layers = dict()
-            layer_order = list()
-        elif layer_order is None:
-            layer_order = layers.keys()
         self.canvas = Canvas(size)
-        self.set_reactive(Image._layers, layers)
-        self.set_reactive(Image.layer_order, layer_order)
+        self.set_reactive(Image._layers, dict())
+        self.set_reactive(Image.layer_order, list())
         self.set_reactive(Image.views, dict())
+        # position of each layer in layer_order, and the sorted positions
+        # of the visible ones, rebuilt whenever the order changes
+        self._layer_index: dict[str, int] = dict()
+        self._visible_index: list[int] = []
+
+        # "chain" keeps a LayerView with a full composite per layer, "flat"
+        # a single FlatView grouped around the active layer
+        self.compositing = compositing
+        self.flat_view = FlatView(self) if compositing == "flat" else None
+        self.journal = None
+        self.history = History()
+        # None when nothing is selected, tools then act on the whole image
+        self.selection: Selection | None = None
 
         canvas_view = LayerView(size, base=None, layer=self.canvas)
         self.create_view(self.canvas.name, canvas_view)
 
-        if len(layers) > 0 and active_layer_name is None:
-            active_layer_name = layers[-1].name
+        # layers given here are added like any other, so their indexes and
+        # views are built in one place
+        if layers is not None:
+            for layer_name in layer_order or list(layers):
+                self.add_layer(layers[layer_name])
+        if active_layer_name is None and self.layer_order:
+            active_layer_name = self.layer_order[-1]
         self.set_reactive(Image.active_layer_name, active_layer_name)
 
     def create_view(self, view_name, view):
@@ -77,31 +215,132 @@ class Image(Widget):
         background: Color | None = None,
         data: list | None = None
     ) -> None:
-        if name in self._layers.keys():
-            i = 1
-            while name := f'{name} #{i}' in self._layers.keys():
-                i += 1
-
+        name = self._unique_layer_name(name)
         if background is not None:
             layer = Layer.fill_with(name, size, background)
         else:
             layer = Layer(name, size, data)
+        self.add_layer(layer)
+
+    def _unique_layer_name(self, name: str) -> str:
+        if name not in self._layers:
+            return name
+        i = 1
+        while f'{name} #{i}' in self._layers:
+            i += 1
+        return f'{name} #{i}'
+
+    def add_layer(self, layer: Layer) -> None:
+        name = layer.name
         layer.post_message = self.post_message
+        layer.journal = self.journal
+        layer.history = self.history
 
+        previous_view = self._top_visible_view()
         self._layers[name] = layer
         self.layer_order.append(name)
+        layer_index = len(self.layer_order) - 1
+        self._layer_index[name] = layer_index
+        if layer.visible:
+            self._visible_index.append(layer_index)
         self.active_layer_name = name
+        if self.journal is not None:
+            self.journal.record_add(layer)
 
-        layer_index = self.layer_order.index(name)
-        if layer_index == 0:
-            previous_view = self.views[self.canvas.name]
-        else:
-            previous_layer_name = self.layer_order[layer_index - 1]
-            previous_view = self.views[previous_layer_name]
-
+        if self.flat_view is not None:
+            self.flat_view.invalidate()
+            self.mutate_reactive(Image.views)
+            return
         view = LayerView(self.image_size, previous_view, layer)
         self.create_view(name, view)
 
+    def remove_layer(self, name: str) -> None:
+        if self.journal is not None:
+            self.journal.record_remove(self._layer_index[name])
+        self.layer_order.remove(name)
+        layer = self._layers.pop(name)
+        layer.journal = None
+        layer.history = None
+        self.views.pop(name, None)
+        if self.active_layer_name == name:
+            self.active_layer_name = (
+                self.layer_order[-1] if self.layer_order else None
+            )
+        self._reindex()
+
+    def move_layer(self, name: str, index: int) -> None:
+        if self.journal is not None:
+            self.journal.record_move(self._layer_index[name], index)
+        self.layer_order.remove(name)
+        self.layer_order.insert(index, name)
+        self._reindex()
+
+    def set_layer_visible(self, name: str, visible: bool) -> None:
+        layer = self._layers[name]
+        if layer.visible == visible:
+            return
+        layer.visible = visible
+        if self.journal is not None:
+            self.journal.record_visible(layer)
+        self._reindex()
+        # views above kept compositing without this layer, or were hidden
+        # and never followed the layers below them
+        for above in self.layer_order[self._layer_index[name]:]:
+            if above in self.views:
+                self.views[above].invalidate()
+
+    def _reindex(self) -> None:
+        self._layer_index = {
+            name: i for i, name in enumerate(self.layer_order)
+        }
+        self._visible_index = [
+            i for i, name in enumerate(self.layer_order)
+            if self._layers[name].visible
+        ]
+        if self.flat_view is not None:
+            self.flat_view.invalidate()
+        base = self.views[self.canvas.name]
+        relinked = False
+        for name in self.layer_order:
+            view = self.views.get(name)
+            if view is None:
+                continue
+            # once a view composites on a new base, every view above it is
+            # stale even if its own base did not change
+            if view.base is not base or relinked:
+                relinked = True
+                view.rebase(base)
+                view.invalidate()
+            if self._layers[name].visible:
+                base = view
+        self.mutate_reactive(Image.layer_order)
+        self.mutate_reactive(Image.views)
+        self.canvas.refresh()
+
+    def _top_visible_view(self) -> LayerView:
+        if self.flat_view is not None:
+            return self.flat_view
+        if not self._visible_index:
+            return self.views[self.canvas.name]
+        return self.views[self.layer_order[self._visible_index[-1]]]
+
+    @property
+    def layers(self) -> list[Layer]:
+        """Every layer, from the bottom up."""
+        return [self._layers[name] for name in self.layer_order]
+
+    @property
+    def visible_layers(self) -> list[Layer]:
+        """The visible layers, from the bottom up."""
+        return [self._layers[self.layer_order[i]] for i in self._visible_index]
+
+    def get_layer(self, name: str) -> Layer | None:
+        return self._layers.get(name)
+
+    def layer_index(self, name: str) -> int | None:
+        """Position of the layer in layer_order, None if it is not there."""
+        return self._layer_index.get(name)
+
     @property
     def active_layer(self):
         if self._layers is None or self.active_layer_name is None:
@@ -110,10 +349,13 @@ class Image(Widget):
 
     @property
     def active_view(self):
-        for name in reversed(self.layer_order):
-            if self._layers[name].visible:
-                return self.views[name]
-        return self.views[self.canvas.name]
+        return self._top_visible_view()
+
+    def watch_active_layer_name(self, old_value, new_value) -> None:
+        if self.flat_view is not None:
+            # the groups are split around the active layer
+            self.flat_view.invalidate()
+            self.canvas.refresh()
 
     def watch_views(self, old_value, new_value) -> None:
         self.canvas.view = self.active_view
@@ -122,16 +364,29 @@ class Image(Widget):
         yield self.canvas
 
     def on_layer_update(self, message: LayerUpdate) -> None:
-        layer_idx = self.layer_order.index(message.layer.name)
-        # iterate through a list of pairs (prev, curr) of adjacent layers
-        # the prev of self._layers[0] is None
-        # the first curr is self._layers[layer_idx]
-        for name in self.layer_order[layer_idx:]:
-            self.views[name].update(message)
-        if message.region is None:
+        message.layer.end_update(message)
+        layer_idx = self._layer_index.get(message.layer.name)
+        if layer_idx is None:
+            return
+        if self.flat_view is not None:
+            self.flat_view.update(message)
+            self._refresh_canvas(message)
+            return
+        self.views[message.layer.name].update(message)
+        if not message.layer.visible:
+            # nothing composited on screen reads from a hidden layer
+            return
+        # every visible view above composites on top of this one
+        first_above = bisect_right(self._visible_index, layer_idx)
+        for idx in self._visible_index[first_above:]:
+            self.views[self.layer_order[idx]].update(message)
+        self._refresh_canvas(message)
+
+    def _refresh_canvas(self, message: LayerUpdate) -> None:
+        if message.lines or not message.spans:
             self.canvas.refresh()
         else:
-            self.canvas.refresh(message.region)
+            self.canvas.refresh(*message.regions)
 
     def get_content_width(self, container, viewport) -> int:
         return self.image_size.width
@@ -139,9 +394,23 @@ class Image(Widget):
     def get_content_height(self, container: Size, viewport: Size, width: int):
         return self.image_size.height
 
+    def on_canvas_release(self, message: CanvasRelease) -> None:
+        self.history.end_stroke()
+        self.post_message(ImageRelease(image=self, pos=message.pos))
+
+    def on_canvas_drag(self, message: CanvasDrag) -> None:
+        self.post_message(ImageDrag(
+            image=self,
+            layer=self.active_layer,
+            start=message.start,
+            end=message.end
+        ))
+
     def on_canvas_click(self, message: CanvasClick):
         pos = message.pos
         layer = self.active_layer
         print(pos, layer, self.active_layer_name)
-        self.post_message(ImageClick(layer=layer, pos=pos))
+        self.post_message(
+            ImageClick(image=self, layer=layer, pos=pos, ctrl=message.ctrl)
+        )
         # top_layer = self.active_layer
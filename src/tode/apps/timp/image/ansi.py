@@ -0,0 +1,328 @@
+# cSpell:disable
+"""Streaming import and export of ANSI escape-sequence art.
+
+Both directions work one line at a time: the reader turns each text line
+into a row of pixels while carrying the SGR state over like a terminal, and
+the writer emits each composited row as soon as it is blended, only
+switching colors where the style actually changes.
+
+Exports end with a SAUCE record holding their width, so reading them back
+wraps lines at that width instead of at 80 columns.
+"""
+from __future__ import annotations
+
+import codecs
+import io
+import os
+import re
+import struct
+import time
+from functools import lru_cache
+from typing import IO, Iterable, Iterator
+
+from rich.color import Color as RichColor
+
+from textual.color import Color
+from textual.geometry import Size
+
+from .flat import flatten_line
+from .layer import Layer
+from .pixel import Pixel
+from .storage import pack_pixel
+
+
+_CSI = re.compile(r"\x1b\[([0-9;?]*)([@-~])")
+# SAUCE metadata and anything else after the DOS end of file marker
+_EOF = "\x1a"
+# ANSI art is drawn for an 80 column terminal that wraps longer lines
+WIDTH = 80
+TAB_SIZE = 8
+# bytes looked at to tell UTF-8 from CP437
+PREFIX_SIZE = 64 * 1024
+
+# id, version, title, author, group, date, file size, data type, file
+# type, four type dependent numbers, comment count, flags and font name
+_SAUCE = struct.Struct("<5s2s35s20s20s8sIBBHHHHBB22s")
+# data type of text, and its file type for ANSI art
+SAUCE_CHARACTER = 1
+SAUCE_ANSI = 1
+
+
+@lru_cache(maxsize=256)
+def ansi_color(number: int) -> Color:
+    r, g, b = RichColor.from_ansi(number).get_truecolor()
+    return Color(r, g, b)
+
+
+def open_text(path: str) -> IO[str]:
+    """Opens ANSI art as text, falling back to CP437 for DOS era files.
+
+    The encoding is picked from the start of the file, the rest is decoded
+    while it is read.
+    """
+    f = open(path, "rb")
+    # SAUCE comments are often CP437 even when the art is UTF-8
+    prefix = f.read(PREFIX_SIZE).partition(_EOF.encode())[0]
+    f.seek(0)
+    try:
+        # a character cut by the end of the prefix is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(prefix)
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        encoding = "cp437"
+    # the reader stops at the end of file marker, the bytes after it are
+    # never decoded for real
+    return io.TextIOWrapper(f, encoding, errors="replace", newline="\n")
+
+
+def sauce_width(path: str) -> int | None:
+    """Width recorded in the SAUCE record of a text file, if it has one."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < _SAUCE.size:
+            return None
+        f.seek(-_SAUCE.size, os.SEEK_END)
+        record = _SAUCE.unpack(f.read(_SAUCE.size))
+    if record[0] != b"SAUCE" or record[7] != SAUCE_CHARACTER:
+        return None
+    return record[9] or None
+
+
+def read_file(path: str, name: str) -> Layer:
+    """Reads an ANSI file into a new layer, as wide as its SAUCE says.
+
+    Lines wrap at that width, at WIDTH for files without one.
+    """
+    width = sauce_width(path)
+    wrap = width or WIDTH
+    with open_text(path) as f:
+        size = measure(f, wrap)
+        f.seek(0)
+        # trailing blank columns are not written out
+        if width is not None:
+            size = Size(width, size.height)
+        return read_layer(f, name, size, wrap)
+
+
+def _params(params: str) -> list[int] | None:
+    """Numeric parameters of a sequence, None for private ones like ?7h."""
+    try:
+        return [int(value) if value else 0 for value in params.split(";")]
+    except ValueError:
+        return None
+
+
+class AnsiReader:
+    """Parses lines of ANSI text into rows of pixels.
+
+    Rows longer than `width` wrap onto the next one like on a terminal,
+    None keeps them whole.
+    """
+
+    def __init__(self, width: int | None = WIDTH) -> None:
+        self.width = width
+        self.fg: Color | None = None
+        self.bg: Color | None = None
+        # the 0-7 color of the last SGR 30-37, bold makes it bright
+        self.fg_index: int | None = None
+        self.bold = False
+        self.reverse = False
+        self.done = False
+
+    def rows(self, lines: Iterable[str]) -> Iterator[list[Pixel | None]]:
+        for line in lines:
+            if self.done:
+                return
+            row = self.parse_line(line)
+            if self.done and not row:
+                return
+            width = self.width
+            if width is None or len(row) <= width:
+                yield row
+                continue
+            for start in range(0, len(row), width):
+                yield row[start:start + width]
+
+    def parse_line(self, line: str) -> list[Pixel | None]:
+        if _EOF in line:
+            line = line[:line.index(_EOF)]
+            self.done = True
+        line = line.rstrip("\r\n")
+        row = []
+        pos = 0
+        for match in _CSI.finditer(line):
+            self._text(line[pos:match.start()], row)
+            params, command = match.groups()
+            pos = match.end()
+            values = _params(params)
+            if values is None:
+                # private modes such as ?7h draw nothing
+                continue
+            if command == "m":
+                self._sgr(values)
+            elif command == "C":
+                row.extend([None] * (values[0] or 1))
+        self._text(line[pos:], row)
+        return row
+
+    def _text(self, text: str, row: list[Pixel | None]) -> None:
+        fg, bg = self.fg, self.bg
+        if self.reverse:
+            fg, bg = bg, fg
+        for char in text:
+            if char == "\t":
+                row.extend([None] * (TAB_SIZE - len(row) % TAB_SIZE))
+                continue
+            if not char.isprintable():
+                continue
+            if char == Pixel.BLANK and bg is None:
+                row.append(None)
+            else:
+                row.append(Pixel(char, fg, bg))
+
+    def _sgr(self, codes: list[int]) -> None:
+        i = 0
+        while i < len(codes):
+            code = codes[i]
+            i += 1
+            if code == 0:
+                self.fg = self.bg = self.fg_index = None
+                self.bold = self.reverse = False
+            elif code == 1:
+                self.bold = True
+            elif code == 22:
+                self.bold = False
+            elif code == 7:
+                self.reverse = True
+            elif code == 27:
+                self.reverse = False
+            elif 30 <= code <= 37:
+                self.fg_index = code - 30
+            elif 90 <= code <= 97:
+                self.fg = ansi_color(code - 90 + 8)
+                self.fg_index = None
+            elif code == 39:
+                self.fg = self.fg_index = None
+            elif 40 <= code <= 47:
+                self.bg = ansi_color(code - 40)
+            elif 100 <= code <= 107:
+                self.bg = ansi_color(code - 100 + 8)
+            elif code == 49:
+                self.bg = None
+            elif code in (38, 48) and i < len(codes):
+                if codes[i] == 5 and i + 1 < len(codes):
+                    color = ansi_color(codes[i + 1])
+                    i += 2
+                elif codes[i] == 2 and i + 3 < len(codes):
+                    color = Color(*codes[i + 1:i + 4])
+                    i += 4
+                else:
+                    break
+                if code == 38:
+                    self.fg = color
+                    self.fg_index = None
+                else:
+                    self.bg = color
+        # bold brightens the color whichever order the codes came in
+        if self.fg_index is not None:
+            self.fg = ansi_color(self.fg_index + (8 if self.bold else 0))
+
+
+def measure(lines: Iterable[str], wrap: int | None = WIDTH) -> Size:
+    width = 0
+    height = 0
+    for row in AnsiReader(wrap).rows(lines):
+        width = max(width, len(row))
+        height += 1
+    return Size(width, height)
+
+
+def read_layer(
+    file: IO[str],
+    name: str,
+    size: Size | None = None,
+    wrap: int | None = WIDTH
+) -> Layer:
+    """Reads ANSI text into a new layer.
+
+    Without a size the file is scanned once to measure it, so it has to be
+    seekable. Lines wrap at `wrap` columns, None keeps them whole.
+    """
+    if size is None:
+        size = measure(file, wrap)
+        file.seek(0)
+    layer = Layer(name, size)
+    storage = layer.storage
+    for y, row in enumerate(AnsiReader(wrap).rows(file)):
+        if y >= size.height:
+            break
+        for x, pixel in enumerate(row[:size.width]):
+            if pixel is not None:
+                storage.set(x, y, pack_pixel(pixel))
+    return layer
+
+
+def _sgr_color(color: Color | None, base: int) -> str:
+    if color is None:
+        return str(base + 9)
+    r, g, b = color.rgb
+    return f"{base + 8};2;{r};{g};{b}"
+
+
+def _is_empty(pixel: Pixel | None) -> bool:
+    return pixel is None or (
+        pixel.bg is None and (pixel.char or Pixel.BLANK) == Pixel.BLANK
+    )
+
+
+def ansi_line(line: list[Pixel | None]) -> str:
+    """Encodes a row, emitting SGR codes only where fg or bg changes."""
+    end = len(line)
+    while end > 0 and _is_empty(line[end - 1]):
+        end -= 1
+
+    out = []
+    fg = bg = None
+    for pixel in line[:end]:
+        if pixel is None:
+            char, pixel_fg, pixel_bg = Pixel.BLANK, fg, None
+        else:
+            char = pixel.char or Pixel.BLANK
+            pixel_fg, pixel_bg = pixel.fg, pixel.bg
+            if char == Pixel.BLANK:
+                # the foreground of a space is never seen
+                pixel_fg = fg
+        codes = []
+        if pixel_fg != fg:
+            codes.append(_sgr_color(pixel_fg, 30))
+            fg = pixel_fg
+        if pixel_bg != bg:
+            codes.append(_sgr_color(pixel_bg, 40))
+            bg = pixel_bg
+        if codes:
+            out.append(f"\x1b[{';'.join(codes)}m")
+        out.append(char)
+    if fg is not None or bg is not None:
+        out.append("\x1b[0m")
+    return "".join(out)
+
+
+def sauce(size: Size, file_size: int) -> str:
+    """The end of file marker and a SAUCE record for art of `size`."""
+    record = _SAUCE.pack(
+        b"SAUCE", b"00", b"", b"", b"", time.strftime("%Y%m%d").encode(),
+        file_size, SAUCE_CHARACTER, SAUCE_ANSI, size.width, size.height,
+        0, 0, 0, 0, b""
+    )
+    return _EOF + record.decode("latin-1")
+
+
+def write(layers: list[Layer], size: Size, file: IO[str]) -> None:
+    blank = [None] * size.width
+    file_size = 0
+    for y in range(size.height):
+        line = flatten_line(layers, y)
+        text = ansi_line(line if line is not None else blank) + "\n"
+        file.write(text)
+        file_size += len(text.encode("utf-8"))
+    file.write(sauce(size, file_size))
@@ -1,23 +1,31 @@
 # cSpell: disable
 from __future__ import annotations
 
+from rich.segment import Segment
+from rich.style import Style
+
 from textual.color import Color
 from textual.message import Message
-from textual.geometry import Size, Offset
+from textual.errors import NoWidget
+from textual.geometry import Region, Size, Offset
 from textual.reactive import reactive
 from textual.strip import Strip
 from textual.scroll_view import ScrollView
 
+from . import composite
+from .dirty import DirtyRows
 from .pixel import Pixel
+from .selection import Selection
 
 from .layer import Layer, LayerUpdate
 
 
 class CanvasClick(Message):
 
-    def __init__(self, pos: Offset) -> None:
+    def __init__(self, pos: Offset, ctrl: bool = False) -> None:
         super().__init__()
         self.pos = pos
+        self.ctrl = ctrl
 
 
 def pixel_compute(p1: Pixel | None, p2: Pixel | None) -> Pixel | None:
@@ -26,6 +34,58 @@ def pixel_compute(p1: Pixel | None, p2: Pixel | None) -> Pixel | None:
     return p1 * p2
 
 
+def _run_segment(run: list[Pixel]) -> Segment:
+    if len(run) == 1:
+        return run[0].segment
+    return Segment("".join(pixel.char for pixel in run), run[0].style)
+
+
+def line_strip(line: list[Pixel]) -> Strip:
+    """Builds a strip, merging runs of cells that share a style."""
+    segments = []
+    run = []
+    for pixel in line:
+        if run and pixel.style is not run[0].style:
+            segments.append(_run_segment(run))
+            run = []
+        run.append(pixel)
+    if run:
+        segments.append(_run_segment(run))
+    return Strip(segments)
+
+
+OUTLINE_STYLE = Style(reverse=True)
+
+
+def outline_strip(strip: Strip, spans: list[tuple[int, int]]) -> Strip:
+    """Highlights the cells of `spans`, used to draw the selection edge."""
+    cuts = [cut for span in spans for cut in span]
+    # divide drops whatever follows the last cut
+    parts = strip.divide(cuts + [strip.cell_length])
+    # the parts alternate between outside and inside the spans
+    return Strip.join(
+        part.apply_style(OUTLINE_STYLE) if i % 2 else part
+        for i, part in enumerate(parts)
+    )
+
+
+class CanvasDrag(Message):
+    """The mouse moved from `start` to `end` while the button is down."""
+
+    def __init__(self, start: Offset, end: Offset) -> None:
+        super().__init__()
+        self.start = start
+        self.end = end
+
+
+class CanvasRelease(Message):
+    """The mouse was released, ending a stroke."""
+
+    def __init__(self, pos: Offset) -> None:
+        super().__init__()
+        self.pos = pos
+
+
 class LayerView:
 
     def __init__(
@@ -39,23 +99,17 @@ class LayerView:
         self.layer = layer
         self._render_cache = [None] * size.height
         self._result = [None] * size.height
-        self.dirty_lines = [y for y in self.size.line_range]
-        self.dirty_pixels = []
+        self._planes = [None] * size.height
+        # columns of each row the cached result is valid for
+        self._columns = [None] * size.height
+        self._dirty = DirtyRows(size.height, size.width)
+        self._render_dirty = bytearray([1]) * size.height
 
     def is_dirty(self, y: int):
-        if y in self.dirty_lines:
-            return True
-        for pos in self.dirty_pixels:
-            if pos.y == y:
-                return True
-        return False
+        return y in self._dirty
 
     def clear_dirty(self, y: int):
-        if y in self.dirty_lines:
-            self.dirty_lines.remove(y)
-        pixels = [p for p in self.dirty_pixels if p.y == y]
-        for p in pixels:
-            self.dirty_pixels.remove(p)
+        self._dirty.clear(y)
 
     def __str__(self):
         return f'LayerView(layer={self.layer.name})'
@@ -63,63 +117,162 @@ class LayerView:
     def __repr__(self):
         return f'LayerView(layer={self.layer.name})'
 
-    def _get_uncached(self, pos: Offset) -> None:
-        layer_pixel = self.layer.get(pos)
-        if self.base is None:
-            return layer_pixel
-
-        base_pixel = self.base.get(pos)
-        return pixel_compute(base_pixel, layer_pixel)
-
     def get(self, pos: Offset) -> Pixel:
-        y, x = pos
-        line = self._result[y]
-        if y in self.dirty_lines:
-            line = self._get_line_uncached(y)
-            self._result[y] = line
-            self.dirty_lines.remove(y)
-        pixel = line[x]
-        if pos in self.dirty_pixels:
-            pixel = self._get_uncached(pos)
-            self._result[y][x] = pixel
-            self.dirty_pixels.remove(pos)
+        return self.get_line(pos.y, pos.x, pos.x + 1)[pos.x]
 
-        return pixel
+    def _covers(self, y: int, start: int, end: int) -> bool:
+        columns = self._columns[y]
+        if columns is None:
+            return False
+        return columns[0] <= start and end <= columns[1]
 
-    def _get_line_uncached(self, y: int) -> list[Pixel]:
-        layer_line = self.layer.get_line(y)
+    def _get_line_uncached(
+        self,
+        y: int,
+        start: int,
+        end: int
+    ) -> list[Pixel]:
+        layer_line = self.layer.get_line(y, start, end)
         if self.base is None:
             return layer_line
 
-        base_line = self.base.get_line(y)
+        base_line = self.base.get_line(y, start, end)
         if layer_line is None:
             return base_line
+        if base_line is None:
+            return layer_line
 
         w = self.size.width
         return [pixel_compute(base_line[x], layer_line[x]) for x in range(w)]
 
-    def get_line(self, y: int) -> list[Pixel]:
-        if self.is_dirty(y):
-            self._result[y] = self._get_line_uncached(y)
-            self.clear_dirty(y)
-        return self._result[y]
-
-    def _cache_render_line(self, y: int) -> Strip:
-        data_row = self.get_line(y)
-        line = [pixel.segment for pixel in data_row]
-        self._render_cache[y] = Strip(line).simplify()
+    def _get_span_uncached(
+        self,
+        y: int,
+        line: list[Pixel],
+        start: int,
+        end: int
+    ) -> list[Pixel]:
+        base_line = self.base.get_line(y, start, end)
+        # the cached line may be shared with the base view, never edit it
+        line = line.copy()
+        for x in range(start, end):
+            layer_pixel = self.layer.get(Offset(x, y))
+            below = base_line[x] if base_line is not None else None
+            line[x] = pixel_compute(below, layer_pixel)
+        return line
+
+    def _get_planes_uncached(
+        self,
+        y: int,
+        start: int,
+        end: int
+    ) -> composite.Planes | None:
+        layer_planes = self.layer.get_planes(y, start, end)
+        if self.base is None:
+            return layer_planes
+
+        base_planes = self.base.get_planes(y, start, end)
+        if layer_planes is None:
+            return base_planes
+        if base_planes is None:
+            return layer_planes
+
+        return composite.blend(base_planes, layer_planes)
+
+    def _refresh_line(self, y: int, start: int, end: int) -> None:
+        """Recomputes row `y` for at least the columns `start` to `end`.
+
+        Columns outside of those are left to whoever asks for them, so the
+        tiles of a wide layer are only decoded once they are on screen.
+        """
+        columns = self._columns[y]
+        span = self._dirty.span(y)
+        if not self.is_dirty(y):
+            # clean but too narrow, widen it around the cached columns
+            start, end = min(start, columns[0]), max(end, columns[1])
+        if composite.enabled:
+            self._planes[y] = self._get_planes_uncached(y, start, end)
+            # pixels are only built if someone asks for them
+            self._result[y] = None
+        else:
+            line = self._result[y]
+            if (
+                span is None or line is None or self.base is None
+                or not self._covers(y, start, end)
+            ):
+                line = self._get_line_uncached(y, start, end)
+            else:
+                start, end = columns
+                span = max(span[0], start), min(span[1], end)
+                line = self._get_span_uncached(y, line, *span)
+            self._result[y] = line
+        self._columns[y] = (start, end)
+        self._render_dirty[y] = 1
         self.clear_dirty(y)
 
-    def render_line(self, y: int) -> Strip:
-        if self.is_dirty(y):
-            self._cache_render_line(y)
+    def _ensure(self, y: int, start: int, end: int | None) -> None:
+        if end is None:
+            end = self.size.width
+        if self.is_dirty(y) or not self._covers(y, start, end):
+            self._refresh_line(y, start, end)
+
+    def get_planes(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> composite.Planes | None:
+        self._ensure(y, start, end)
+        return self._planes[y]
+
+    def get_line(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> list[Pixel]:
+        self._ensure(y, start, end)
+        line = self._result[y]
+        if line is None and self._planes[y] is not None:
+            line = self._result[y] = composite.to_pixels(self._planes[y])
+        return line
+
+    def _cache_render_line(
+        self,
+        y: int,
+        start: int,
+        end: int | None
+    ) -> Strip:
+        self._render_cache[y] = line_strip(self.get_line(y, start, end))
+        self._render_dirty[y] = 0
+
+    def render_line(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> Strip:
+        self._ensure(y, start, end)
+        if self._render_dirty[y]:
+            self._cache_render_line(y, start, end)
         return self._render_cache[y]
 
+    def invalidate(self) -> None:
+        self._dirty.mark_all()
+        self._render_dirty[:] = bytearray([1]) * self.size.height
+
+    def rebase(self, base: LayerView | None) -> None:
+        if base is not self.base:
+            self.base = base
+            self.invalidate()
+
     def update(self, update: LayerUpdate) -> None:
-        for pos in update.offsets:
-            self.dirty_pixels.append(pos)
+        for y, (start, end) in update.spans.items():
+            self._dirty.mark(y, start, end)
+            self._render_dirty[y] = 1
         for line in update.lines:
-            self.dirty_lines.append(line)
+            self._dirty.mark_row(line)
+            self._render_dirty[line] = 1
 
 
 class Canvas(ScrollView):
@@ -144,7 +297,12 @@ class Canvas(ScrollView):
         super().__init__(id="Canvas", name="Canvas")
         self._size = size
         self.mouse_captured = False
+        # last position of the stroke in progress
+        self._last_pos = None
         self.view = view
+        self.selection: Selection | None = None
+        # image columns on screen, the views only decode those
+        self._window = (0, size.width)
 
     def __str__(self):
         return 'Canvas()'
@@ -152,8 +310,28 @@ class Canvas(ScrollView):
     def __repr__(self):
         return 'Canvas()'
 
+    def render_lines(self, crop: Region) -> list[Strip]:
+        try:
+            geometry = self.screen.find_widget(self)
+        except NoWidget:
+            window = (0, self._size.width)
+        else:
+            visible = geometry.visible_region
+            x = visible.x - geometry.region.x
+            window = (x, x + visible.width)
+        if window != self._window:
+            # strips cached for the old columns only hold those columns
+            self._window = window
+            self.refresh()
+        return super().render_lines(crop)
+
     def render_line(self, y: int):
-        return self.view.render_line(y)
+        strip = self.view.render_line(y, *self._window)
+        if self.selection is not None and y < self._size.height:
+            spans = self.selection.outline(y)
+            if spans:
+                strip = outline_strip(strip, spans)
+        return strip
 
     def on_mouse_move(self, event):
         if not self.mouse_captured:
@@ -162,17 +340,24 @@ class Canvas(ScrollView):
         if not self._size.contains_point(pos):
             return
         event.stop()
-        self.post_message(CanvasClick(pos))
+        if pos == self._last_pos:
+            return
+        # one message per segment, however many cells it crosses
+        self.post_message(CanvasDrag(self._last_pos, pos))
+        self._last_pos = pos
 
     def on_mouse_down(self, event):
         pos = Offset(x=event.x, y=event.y)
-        self.post_message(CanvasClick(pos=pos))
+        self.post_message(CanvasClick(pos=pos, ctrl=event.ctrl))
+        self._last_pos = pos
         self.mouse_captured = True
         self.capture_mouse()
 
     def on_mouse_up(self, event):
         self.release_mouse()
         self.mouse_captured = False
+        self._last_pos = None
+        self.post_message(CanvasRelease(Offset(x=event.x, y=event.y)))
 
     def get_content_width(self, container, viewport) -> int:
         return self._size.width
@@ -180,9 +365,22 @@ class Canvas(ScrollView):
     def get_content_height(self, container: Size, viewport: Size, width: int):
         return self._size.height
 
-    def get_line(self, y: int) -> list[Pixel]:
+    def get_line(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> list[Pixel]:
         chars = ["🬤", "🬗"]
         style = self.get_component_rich_style()
         fg = Color.from_rich_color(style.color)
         bg = Color.from_rich_color(style.bgcolor)
         return [Pixel(chars[y % 2], fg, bg)] * self._size.width
+
+    def get_planes(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> composite.Planes:
+        return composite.pixel_planes(self.get_line(y))
@@ -0,0 +1,85 @@
+# cSpell:disable
+"""Cut, copy and paste of layer regions.
+
+Copies share their tiles with the layer they came from, see
+PixelStorage.copy, so copying or pasting a large region costs memory only
+once one of the sides is written to.
+"""
+from __future__ import annotations
+
+from textual.geometry import Offset, Region, Size
+
+from .layer import Layer
+from .selection import Selection
+from .storage import CELL, PixelStorage, decode_glyph
+
+
+class Clipboard:
+    """Cells copied from a layer, kept at their position in the image."""
+
+    def __init__(
+        self,
+        storage: PixelStorage,
+        region: Region,
+        offset: Offset | None = None
+    ) -> None:
+        self.storage = storage
+        # bounding box of the copied cells, in image coordinates
+        self.region = region
+        # offset of the layer they were copied from
+        self.offset = offset or Offset(0, 0)
+
+    def __str__(self):
+        return f'Clipboard(region={self.region})'
+
+    def __repr__(self):
+        return f'Clipboard(region={self.region})'
+
+
+def copy(layer: Layer, selection: Selection | None = None) -> Clipboard:
+    """The cells of `layer` inside `selection`, all of them if None."""
+    storage = layer.storage
+    offset = layer.offset
+    if selection is None:
+        region = Region.from_offset(offset, storage.size)
+        return Clipboard(storage.copy(), region, offset)
+    mask = selection.mask(offset, storage.size)
+    return Clipboard(storage.copy(mask), selection.bbox, offset)
+
+
+def paste_layer(clip: Clipboard, name: str, size: Size) -> Layer:
+    """A new layer of `size` holding the clipboard at its original place."""
+    source = clip.storage
+    if source.size == size:
+        return Layer(name, size, source.copy(), offset=clip.offset)
+    storage = PixelStorage(size)
+    region = clip.region.translate(-clip.offset)
+    region = region.intersection(Region(0, 0, *source.size))
+    region = region.intersection(Region(0, 0, *size))
+    for y in range(region.y, region.bottom):
+        row = source.get_row(y)
+        if row is None:
+            continue
+        glyphs, fg, bg, mask = row
+        for x in range(region.x, region.right):
+            storage.set(x, y, (glyphs[x], fg[x], bg[x], mask[x]))
+    return Layer(name, size, storage, offset=clip.offset)
+
+
+def glyphs(clip: Clipboard) -> list[list[str | None]]:
+    """The glyph of every cell of the clipboard, row by row."""
+    source = clip.storage
+    region = clip.region.translate(-clip.offset)
+    region = region.intersection(Region(0, 0, *source.size))
+    lines = []
+    for y in range(region.y, region.bottom):
+        row = source.get_row(y, region.x, region.right)
+        if row is None:
+            lines.append([None] * region.width)
+            continue
+        glyph_row, _, _, mask = row
+        lines.append([
+            decode_glyph(glyph_row[x]) if mask[x] & CELL else None
+            for x in range(region.x, region.right)
+        ])
+    return lines
@@ -0,0 +1,156 @@
+# cSpell:disable
+from __future__ import annotations
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, views fall back to pixel_compute
+    np = None
+
+from .pixel import Pixel
+from .storage import CELL, FG, BG, decode_glyph, pack_pixel, unpack_color
+
+
+# set to False to force the pure python compositing path
+enabled = np is not None
+
+_SPACE = ord(Pixel.BLANK)
+
+
+class Planes:
+    """A row of cells split into glyph, fg, bg and mask arrays.
+
+    Colors are float arrays of shape (width, 4) holding r, g, b and alpha,
+    so blending a whole row is a handful of array operations.
+    """
+
+    __slots__ = ("glyphs", "fg", "bg", "mask")
+
+    def __init__(self, glyphs, fg, bg, mask) -> None:
+        self.glyphs = glyphs
+        self.fg = fg
+        self.bg = bg
+        self.mask = mask
+
+    def __len__(self):
+        return len(self.glyphs)
+
+
+def _unpack_colors(packed, opacity: float | None):
+    colors = np.empty((len(packed), 4))
+    colors[:, 0] = packed >> 24
+    colors[:, 1] = (packed >> 16) & 0xFF
+    colors[:, 2] = (packed >> 8) & 0xFF
+    colors[:, 3] = (packed & 0xFF) / 255
+    if opacity is not None:
+        colors[:, 3] *= opacity
+    return colors
+
+
+def row_planes(row, opacity: float | None = None) -> Planes | None:
+    if row is None:
+        return None
+    glyphs, fg, bg, mask = row
+    return Planes(
+        np.frombuffer(glyphs, dtype=np.uint32),
+        _unpack_colors(np.frombuffer(fg, dtype=np.uint32), opacity),
+        _unpack_colors(np.frombuffer(bg, dtype=np.uint32), opacity),
+        np.frombuffer(mask, dtype=np.uint8),
+    )
+
+
+def pixel_planes(pixels: list[Pixel | None]) -> Planes:
+    cells = [pack_pixel(pixel) for pixel in pixels]
+    glyphs, fg, bg, mask = zip(*cells)
+    return row_planes((
+        array('I', glyphs),
+        array('I', fg),
+        array('I', bg),
+        bytes(mask),
+    ))
+
+
+def to_pixels(planes: Planes) -> list[Pixel | None]:
+    fg_rgb = _pack_rgb(planes.fg).tolist()
+    bg_rgb = _pack_rgb(planes.bg).tolist()
+    fg_alpha = planes.fg[:, 3].tolist()
+    bg_alpha = planes.bg[:, 3].tolist()
+    line = []
+    cells = zip(planes.glyphs.tolist(), planes.mask.tolist())
+    for x, (glyph, mask) in enumerate(cells):
+        if not mask & CELL:
+            line.append(None)
+            continue
+        fg = unpack_color(fg_rgb[x], fg_alpha[x]) if mask & FG else None
+        bg = unpack_color(bg_rgb[x], bg_alpha[x]) if mask & BG else None
+        line.append(Pixel(decode_glyph(glyph), fg=fg, bg=bg))
+    return line
+
+
+def _pack_rgb(colors):
+    rgb = colors[:, :3].astype(np.uint32)
+    return (rgb[:, 0] << 24) | (rgb[:, 1] << 16) | (rgb[:, 2] << 8)
+
+
+def blend(base: Planes, top: Planes) -> Planes:
+    """Vectorized equivalent of `base[x] * top[x]` for every cell."""
+    b_set = (base.mask & CELL) != 0
+    t_set = (top.mask & CELL) != 0
+    b_bg = (base.mask & BG) != 0
+    t_fg = (top.mask & FG) != 0
+    t_bg = (top.mask & BG) != 0
+    b_alpha = base.bg[:, 3]
+    t_alpha = top.bg[:, 3]
+
+    blank = (
+        (top.glyphs == 0)
+        | (top.glyphs == _SPACE)
+        | ~t_fg
+        | (top.fg[:, 3] == 0)
+    )
+    glyphs = np.where(blank, base.glyphs, top.glyphs)
+    fg = np.where(blank[:, None], base.fg, top.fg)
+    fg_mask = np.where(blank, base.mask & FG, top.mask & FG)
+
+    bg = base.bg.copy()
+    bg_set = b_bg.copy()
+    replace = t_bg & (~b_bg | (b_alpha == 0))
+    bg[replace] = top.bg[replace]
+    bg_set |= replace
+    mix = t_bg & ~replace & (t_alpha > 0)
+    if mix.any():
+        factor = t_alpha[mix]
+        below = base.bg[mix, :3]
+        above = top.bg[mix, :3]
+        bg[mix, :3] = np.trunc(below + (above - below) * factor[:, None])
+        bg[mix, 3] = 1 - (1 - b_alpha[mix]) * (1 - factor)
+
+    mask = (
+        (b_set | t_set).astype(np.uint8) * CELL
+        | fg_mask
+        | bg_set.astype(np.uint8) * BG
+    )
+
+    # cells where one operand wins outright, as in Pixel.__mul__
+    use_top = t_set & (~b_set | (t_bg & (t_alpha == 1)))
+    use_base = ~t_set
+    top_only = use_top[:, None]
+    base_only = use_base[:, None]
+    return Planes(
+        np.where(use_top, top.glyphs, np.where(use_base, base.glyphs, glyphs)),
+        np.where(top_only, top.fg, np.where(base_only, base.fg, fg)),
+        np.where(top_only, top.bg, np.where(base_only, base.bg, bg)),
+        np.where(use_top, top.mask, np.where(use_base, base.mask, mask))
+        .astype(np.uint8),
+    )
+
+
+def composite_stack(stack: list[Planes | None]) -> Planes | None:
+    """Blends a stack of rows, bottom first, skipping empty ones."""
+    result = None
+    for planes in stack:
+        if planes is None:
+            continue
+        result = planes if result is None else blend(result, planes)
+    return result
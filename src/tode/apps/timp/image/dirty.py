@@ -0,0 +1,52 @@
+CLEAN = 0
+WHOLE = 1
+SPAN = 2
+
+
+class DirtyRows:
+    """Per-row invalidation state.
+
+    Each row is either clean, dirty as a whole or dirty over a single
+    column span. Marking a row that is already dirty widens its span
+    instead of queueing another entry, so repeated invalidations coalesce.
+    """
+
+    def __init__(self, height: int, width: int, dirty: bool = True) -> None:
+        self.width = width
+        self._rows = bytearray([WHOLE if dirty else CLEAN]) * height
+        self._spans = [None] * height
+
+    def __contains__(self, y: int) -> bool:
+        return self._rows[y] != CLEAN
+
+    def span(self, y: int) -> tuple[int, int] | None:
+        """(start, end) of the dirty columns, None if clean or whole."""
+        if self._rows[y] != SPAN:
+            return None
+        return self._spans[y]
+
+    def mark_row(self, y: int) -> None:
+        self._rows[y] = WHOLE
+        self._spans[y] = None
+
+    def mark(self, y: int, start: int, end: int) -> None:
+        state = self._rows[y]
+        if state == WHOLE:
+            return
+        if state == SPAN:
+            old_start, old_end = self._spans[y]
+            start = min(start, old_start)
+            end = max(end, old_end)
+        if start <= 0 and end >= self.width:
+            self.mark_row(y)
+            return
+        self._rows[y] = SPAN
+        self._spans[y] = (start, end)
+
+    def mark_all(self) -> None:
+        self._rows[:] = bytearray([WHOLE]) * len(self._rows)
+        self._spans = [None] * len(self._spans)
+
+    def clear(self, y: int) -> None:
+        self._rows[y] = CLEAN
+        self._spans[y] = None
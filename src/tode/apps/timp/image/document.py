@@ -0,0 +1,307 @@
+# cSpell:disable
+"""Native TIMP document format.
+
+The file starts with a fixed header pointing at an index stored at the end
+of the file. Dense tiles are written before the index as raw little endian
+planes, so a document is opened by memory-mapping it and reading only the
+index; each tile is decoded the first time a row crossing it is needed.
+
+    header   magic, version, width, height, layer count, active layer,
+             index offset
+    tiles    glyphs, fg, bg (u32 each), mask (u8) and cell count of every
+             dense tile
+    index    glyph table for multi-codepoint glyphs, then for each layer
+             bottom to top: name, opacity, flags, offset, per-row cell
+             counts and one entry per tile (empty, uniform cell or offset
+             of its data)
+
+Version 1 documents have no layer offsets.
+"""
+from __future__ import annotations
+
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from textual.geometry import Offset, Size
+
+from .layer import Layer
+from .storage import (
+    GLYPH_BASE, TILE_AREA, LazyTile, PixelStorage, Tile, encode_glyph,
+    interned_glyphs
+)
+
+
+MAGIC = b"TIMP"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sHIIIiQ")
+_GLYPH = struct.Struct("<H")
+_LAYER = struct.Struct("<HdBii")
+_LAYER_V1 = struct.Struct("<HdB")
+_TILE = struct.Struct("<BBxxIIIQ")
+_COUNT = struct.Struct("<I")
+_TILE_SIZE = TILE_AREA * 13 + _COUNT.size
+
+EMPTY_TILE = 0
+UNIFORM_TILE = 1
+DENSE_TILE = 2
+
+VISIBLE = 1
+LINKED = 2
+
+_SWAP = sys.byteorder != "little"
+
+
+class DocumentError(Exception):
+    """The file is not a TIMP document this version can read."""
+
+
+def _to_bytes(values: array | bytearray) -> bytes:
+    if _SWAP and isinstance(values, array):
+        values = array(values.typecode, values)
+        values.byteswap()
+    return bytes(values)
+
+
+def _from_bytes(typecode: str, data: bytes) -> array:
+    values = array(typecode, data)
+    if _SWAP:
+        values.byteswap()
+    return values
+
+
+class MappedTile(LazyTile):
+    """A dense tile still sitting in the memory-mapped document."""
+
+    __slots__ = ("buffer", "offset", "glyph_map", "glyph_end")
+
+    def __init__(
+        self,
+        buffer,
+        offset: int,
+        glyph_map: dict | None,
+        glyph_end: int
+    ) -> None:
+        self.buffer = buffer
+        self.offset = offset
+        self.glyph_map = glyph_map
+        # first glyph id past the document's glyph table
+        self.glyph_end = glyph_end
+
+    def load(self) -> Tile:
+        plane = TILE_AREA * 4
+        start = self.offset
+        tile = Tile()
+        tile.glyphs = _from_bytes('I', self.buffer[start:start + plane])
+        start += plane
+        tile.fg = _from_bytes('I', self.buffer[start:start + plane])
+        start += plane
+        tile.bg = _from_bytes('I', self.buffer[start:start + plane])
+        start += plane
+        tile.mask = bytearray(self.buffer[start:start + TILE_AREA])
+        start += TILE_AREA
+        tile.count, = _COUNT.unpack_from(self.buffer, start)
+        if max(tile.glyphs) >= self.glyph_end:
+            raise DocumentError(f"tile at {self.offset} has unknown glyphs")
+        if self.glyph_map:
+            glyphs = tile.glyphs
+            for i, glyph in enumerate(glyphs):
+                if glyph >= GLYPH_BASE:
+                    glyphs[i] = self.glyph_map[glyph]
+        return tile
+
+
+def save(image, path: str) -> None:
+    layers = image.layers
+    active = -1
+    if image.active_layer_name in image.layer_order:
+        active = image.layer_order.index(image.active_layer_name)
+    write_layers(path, image.image_size, layers, active)
+
+
+def write_layers(
+    path: str,
+    size: Size,
+    layers: list[Layer],
+    active: int
+) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(
+            MAGIC, VERSION, size.width, size.height, len(layers), active, 0
+        ))
+        tables = []
+        for layer in layers:
+            storage = layer.storage
+            entries = []
+            for index in range(storage.columns * storage.rows):
+                tile = storage._tiles[index]
+                if isinstance(tile, MappedTile) and not tile.glyph_map:
+                    # copy tiles that were never loaded straight across
+                    entries.append(
+                        _TILE.pack(DENSE_TILE, 0, 0, 0, 0, f.tell())
+                    )
+                    f.write(tile.buffer[tile.offset:tile.offset + _TILE_SIZE])
+                    continue
+                tile = storage.tile(index)
+                if tile is None:
+                    entries.append(_TILE.pack(EMPTY_TILE, 0, 0, 0, 0, 0))
+                elif type(tile) is tuple:
+                    glyph, fg, bg, mask = tile
+                    entries.append(
+                        _TILE.pack(UNIFORM_TILE, mask, glyph, fg, bg, 0)
+                    )
+                else:
+                    entries.append(
+                        _TILE.pack(DENSE_TILE, 0, 0, 0, 0, f.tell())
+                    )
+                    f.write(_to_bytes(tile.glyphs))
+                    f.write(_to_bytes(tile.fg))
+                    f.write(_to_bytes(tile.bg))
+                    f.write(bytes(tile.mask))
+                    f.write(_COUNT.pack(tile.count))
+            tables.append(entries)
+
+        index_offset = f.tell()
+        glyphs = interned_glyphs()
+        f.write(_COUNT.pack(len(glyphs)))
+        for glyph in glyphs:
+            data = glyph.encode("utf-8")
+            f.write(_GLYPH.pack(len(data)))
+            f.write(data)
+        for layer, entries in zip(layers, tables):
+            name = layer.name.encode("utf-8")
+            opacity = math.nan if layer._opacity is None else layer._opacity
+            flags = (VISIBLE if layer.visible else 0)
+            flags |= (LINKED if layer.linked else 0)
+            f.write(_LAYER.pack(len(name), opacity, flags, *layer.offset))
+            f.write(name)
+            f.write(_to_bytes(layer.storage._row_count))
+            f.write(b"".join(entries))
+
+        f.seek(0)
+        f.write(_HEADER.pack(
+            MAGIC, VERSION, size.width, size.height, len(layers), active,
+            index_offset
+        ))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _sync_directory(path)
+
+
+def _sync_directory(path: str) -> None:
+    """Makes the rename of `path` itself survive a crash."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_layers(path: str) -> tuple[Size, list[Layer], int]:
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files
+            raise DocumentError(f"{path} is empty") from None
+    try:
+        return _read_layers(path, buffer)
+    except (struct.error, UnicodeDecodeError, ValueError) as error:
+        raise DocumentError(f"{path} is truncated or corrupt") from error
+
+
+def _check(path: str, condition: bool) -> None:
+    if not condition:
+        raise DocumentError(f"{path} is truncated or corrupt")
+
+
+def _read_layers(path: str, buffer) -> tuple[Size, list[Layer], int]:
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise DocumentError(f"{path} is not a TIMP document")
+    _, version, width, height, layer_count, active, offset = (
+        _HEADER.unpack_from(buffer, 0)
+    )
+    if version not in (1, VERSION):
+        raise DocumentError(f"unsupported TIMP document version {version}")
+    size = Size(width, height)
+    _check(path, _HEADER.size <= offset <= len(buffer))
+    _check(path, -1 <= active < max(layer_count, 1))
+
+    glyph_count, = _COUNT.unpack_from(buffer, offset)
+    offset += _COUNT.size
+    glyph_map = dict()
+    for i in range(glyph_count):
+        length, = _GLYPH.unpack_from(buffer, offset)
+        offset += _GLYPH.size
+        _check(path, offset + length <= len(buffer))
+        glyph = buffer[offset:offset + length].decode("utf-8")
+        offset += length
+        glyph_map[GLYPH_BASE + i] = encode_glyph(glyph)
+    glyph_end = GLYPH_BASE + glyph_count
+    # ids match when this process interned the same glyphs in the same order
+    if all(key == value for key, value in glyph_map.items()):
+        glyph_map = None
+
+    layers = []
+    for _ in range(layer_count):
+        if version == 1:
+            name_length, opacity, flags = _LAYER_V1.unpack_from(buffer, offset)
+            layer_offset = Offset(0, 0)
+            offset += _LAYER_V1.size
+        else:
+            name_length, opacity, flags, x, y = (
+                _LAYER.unpack_from(buffer, offset)
+            )
+            layer_offset = Offset(x, y)
+            offset += _LAYER.size
+        _check(path, offset + name_length <= len(buffer))
+        name = buffer[offset:offset + name_length].decode("utf-8")
+        offset += name_length
+        if math.isnan(opacity):
+            opacity = None
+
+        storage = PixelStorage(size)
+        row_bytes = height * 4
+        tile_count = len(storage._tiles)
+        # check the whole table fits before trusting the sizes in the header
+        _check(
+            path, offset + row_bytes + tile_count * _TILE.size <= len(buffer)
+        )
+        storage._row_count = _from_bytes('I', buffer[offset:offset + row_bytes])
+        offset += row_bytes
+        tiles = storage._tiles
+        for index in range(tile_count):
+            kind, mask, glyph, fg, bg, tile_offset = (
+                _TILE.unpack_from(buffer, offset)
+            )
+            offset += _TILE.size
+            if kind == UNIFORM_TILE:
+                _check(path, glyph < glyph_end)
+                if glyph_map and glyph >= GLYPH_BASE:
+                    glyph = glyph_map[glyph]
+                tiles[index] = (glyph, fg, bg, mask)
+            elif kind == DENSE_TILE:
+                _check(path, tile_offset + _TILE_SIZE <= len(buffer))
+                tiles[index] = MappedTile(
+                    buffer, tile_offset, glyph_map, glyph_end
+                )
+            else:
+                _check(path, kind == EMPTY_TILE)
+
+        layer = Layer(
+            name, size, storage,
+            visible=bool(flags & VISIBLE),
+            linked=bool(flags & LINKED),
+            opacity=opacity,
+            offset=layer_offset
+        )
+        layers.append(layer)
+    return size, layers, active
@@ -0,0 +1,171 @@
+# cSpell:disable
+"""Scanline flood fill over a layer's storage.
+
+Instead of visiting cells one by one, the fill grows whole horizontal
+spans: it extends a seed left and right as far as cells match, then
+queues one seed per matching run in the rows above and below. Rows are
+only read, and compared against the target, the first time the fill
+reaches them.
+"""
+from __future__ import annotations
+
+from typing import Callable
+
+from .storage import BG, CELL, EMPTY, FG, Cell, PixelStorage, Spans
+
+
+MATCH_MODES = ("composite", "glyph", "fg", "bg")
+
+
+def _close(a: int, b: int, tolerance: int) -> bool:
+    """Whether two packed RGBA colors are within `tolerance` per channel."""
+    if a == b:
+        return True
+    for shift in (24, 16, 8, 0):
+        if abs(((a >> shift) & 0xFF) - ((b >> shift) & 0xFF)) > tolerance:
+            return False
+    return True
+
+
+def _color_matcher(
+    target: Cell,
+    plane: int,
+    flag: int,
+    tolerance: int
+) -> Callable[[Cell], bool]:
+    if not target[3] & flag:
+        return lambda cell: not cell[3] & flag
+    color = target[plane]
+    if tolerance == 0:
+        return lambda cell: bool(cell[3] & flag) and cell[plane] == color
+    return lambda cell: (
+        bool(cell[3] & flag) and _close(cell[plane], color, tolerance)
+    )
+
+
+def cell_matcher(
+    target: Cell,
+    match: str = "composite",
+    tolerance: int = 0
+) -> Callable[[Cell], bool]:
+    """Tests whether a cell counts as the same region as `target`.
+
+    Glyphs always have to be equal, `tolerance` is the largest difference
+    allowed on each color channel, 0 to 255.
+    """
+    glyph = target[0] if target[3] & CELL else 0
+    if match == "glyph":
+        return lambda cell: (cell[0] if cell[3] & CELL else 0) == glyph
+    if match == "fg":
+        return _color_matcher(target, 1, FG, tolerance)
+    if match == "bg":
+        return _color_matcher(target, 2, BG, tolerance)
+    if match != "composite":
+        raise ValueError(f"unknown match mode {match!r}")
+    if not target[3] & CELL:
+        return lambda cell: not cell[3] & CELL
+    if tolerance == 0:
+        # packed cells are canonical, unset colors are always 0
+        return target.__eq__
+    fg = _color_matcher(target, 1, FG, tolerance)
+    bg = _color_matcher(target, 2, BG, tolerance)
+    return lambda cell: (
+        bool(cell[3] & CELL) and cell[0] == glyph and fg(cell) and bg(cell)
+    )
+
+
+class _Rows:
+    """Per-row match flags, computed the first time a row is needed."""
+
+    def __init__(self, storage: PixelStorage, matches) -> None:
+        self.storage = storage
+        self.matches = matches
+        self.width = storage.size.width
+        self._rows = dict()
+        self._empty_row = None
+
+    def __getitem__(self, y: int) -> bytearray:
+        row = self._rows.get(y)
+        if row is None:
+            cells = self.storage.get_row(y)
+            if cells is None:
+                if self._empty_row is None:
+                    flag = 1 if self.matches(EMPTY) else 0
+                    self._empty_row = bytes([flag]) * self.width
+                row = self._empty_row
+            else:
+                row = bytes(map(self.matches, zip(*cells)))
+            self._rows[y] = row
+        return row
+
+
+def _runs(row: bytes) -> list[tuple[int, int]]:
+    runs = []
+    start = row.find(1)
+    while start != -1:
+        end = row.find(0, start)
+        if end == -1:
+            end = len(row)
+        runs.append((start, end))
+        start = row.find(1, end)
+    return runs
+
+
+def flood_spans(
+    storage: PixelStorage,
+    x: int,
+    y: int,
+    match: str = "composite",
+    tolerance: int = 0,
+    contiguous: bool = True
+) -> Spans:
+    """Spans of the cells a fill started at (x, y) would cover.
+
+    Without `contiguous` every matching cell of the layer is included.
+    """
+    width, height = storage.size
+    rows = _Rows(storage, cell_matcher(storage.get(x, y), match, tolerance))
+    spans: Spans = dict()
+    if not contiguous:
+        for row_y in range(height):
+            runs = _runs(rows[row_y])
+            if runs:
+                spans[row_y] = runs
+        return spans
+
+    # a run of matching cells is always filled as a whole, so checking
+    # where a seed lands is enough to know whether its run is done
+    filled: dict[int, bytearray] = dict()
+    stack = [(x, y)]
+    while stack:
+        x, y = stack.pop()
+        row = rows[y]
+        done = filled.get(y)
+        if done is None:
+            done = filled[y] = bytearray(width)
+        if not row[x] or done[x]:
+            continue
+        start = row.rfind(0, 0, x) + 1
+        end = row.find(0, x)
+        if end == -1:
+            end = width
+        done[start:end] = b"\x01" * (end - start)
+        spans.setdefault(y, []).append((start, end))
+
+        for next_y in (y - 1, y + 1):
+            if not 0 <= next_y < height:
+                continue
+            next_row = rows[next_y]
+            next_done = filled.get(next_y)
+            i = next_row.find(1, start, end)
+            while i != -1:
+                if next_done is None or not next_done[i]:
+                    stack.append((i, next_y))
+                i = next_row.find(0, i, end)
+                if i == -1:
+                    break
+                i = next_row.find(1, i, end)
+
+    for row_spans in spans.values():
+        row_spans.sort()
+    return spans
@@ -0,0 +1,217 @@
+# cSpell:disable
+from __future__ import annotations
+
+from textual.geometry import Offset
+from textual.strip import Strip
+
+from . import composite
+from .canvas import line_strip, pixel_compute
+from .dirty import DirtyRows
+from .layer import Layer, LayerUpdate
+from .pixel import Pixel
+
+
+# kinds of entries in the above-active summary, an entry of None means the
+# layers above leave the cell untouched
+CONST = 1    # (CONST, pixel): the result does not depend on what is below
+KEEP_BG = 2  # (KEEP_BG, char, fg): char and fg replaced, bg shows through
+MIXED = (3,)  # partially transparent background, blend layer by layer
+
+
+def summarize(entry: tuple | None, pixel: Pixel | None) -> tuple | None:
+    """Adds `pixel` on top of a summary of the layers below it."""
+    if pixel is None:
+        return entry
+    if pixel.bg is not None and pixel.bg.a == 1:
+        return (CONST, pixel)
+    if entry is not None and entry[0] == CONST:
+        return (CONST, entry[1] * pixel)
+    if entry is MIXED:
+        return MIXED
+    if pixel.bg is None:
+        if pixel.is_blank():
+            return entry
+        return (KEEP_BG, pixel.char, pixel.fg)
+    return MIXED
+
+
+def flatten_line(
+    layers: list[Layer],
+    y: int,
+    base=None
+) -> list[Pixel | None] | None:
+    """Blends row `y` of `layers`, bottom first, over `base` if given.
+
+    `base` is anything with get_line/get_planes, such as the Canvas.
+    """
+    if composite.enabled:
+        stack = [base.get_planes(y)] if base is not None else []
+        stack += [layer.get_planes(y) for layer in layers]
+        planes = composite.composite_stack(stack)
+        return composite.to_pixels(planes) if planes is not None else None
+    line = base.get_line(y) if base is not None else None
+    for layer in layers:
+        layer_line = layer.get_line(y)
+        if layer_line is None:
+            continue
+        if line is None:
+            line = layer_line
+            continue
+        line = [
+            pixel_compute(below, pixel)
+            for below, pixel in zip(line, layer_line)
+        ]
+    return line
+
+
+class FlatView:
+    """Composites an image from three groups around the active layer.
+
+    Only three row caches are kept however deep the image is: the visible
+    layers below the active one blended together, a per-cell summary of the
+    visible layers above it, and the final result. Drawing on the active
+    layer re-blends one cell of each.
+    """
+
+    def __init__(self, image) -> None:
+        self.image = image
+        self.size = image.image_size
+        height = self.size.height
+        width = self.size.width
+        self._below = [None] * height
+        self._above = [None] * height
+        self._result = [None] * height
+        self._render_cache = [None] * height
+        self._dirty_below = DirtyRows(height, width)
+        self._dirty_above = DirtyRows(height, width)
+        self._dirty = DirtyRows(height, width)
+        self._render_dirty = bytearray([1]) * height
+        self._groups = None
+
+    def __str__(self):
+        return f'FlatView(image={self.image.name})'
+
+    def __repr__(self):
+        return f'FlatView(image={self.image.name})'
+
+    def _split(self) -> tuple[list[Layer], Layer | None, list[Layer]]:
+        if self._groups is None:
+            visible = self.image.visible_layers
+            active = self.image.active_layer
+            if active is None or active not in visible:
+                self._groups = (visible, None, [])
+            else:
+                i = visible.index(active)
+                self._groups = (visible[:i], active, visible[i + 1:])
+        return self._groups
+
+    def invalidate(self) -> None:
+        self._groups = None
+        self._dirty_below.mark_all()
+        self._dirty_above.mark_all()
+        self._dirty.mark_all()
+        self._render_dirty[:] = bytearray([1]) * self.size.height
+
+    def update(self, update: LayerUpdate) -> None:
+        _, active, _ = self._split()
+        layer = update.layer
+        index = self.image.layer_index
+        if not layer.visible or index(layer.name) is None:
+            return
+        if layer is active:
+            group = None
+        elif active is not None and index(layer.name) > index(active.name):
+            group = self._dirty_above
+        else:
+            group = self._dirty_below
+        for y, (start, end) in update.spans.items():
+            if group is not None:
+                group.mark(y, start, end)
+            self._dirty.mark(y, start, end)
+            self._render_dirty[y] = 1
+        for y in update.lines:
+            if group is not None:
+                group.mark_row(y)
+            self._dirty.mark_row(y)
+            self._render_dirty[y] = 1
+
+    def _get_below(self, y: int) -> list[Pixel]:
+        if y in self._dirty_below:
+            below, _, _ = self._split()
+            line = flatten_line(below, y, self.image.canvas)
+            self._below[y] = line
+            self._dirty_below.clear(y)
+        return self._below[y]
+
+    def _get_above(self, y: int) -> list[tuple | None]:
+        if y in self._dirty_above:
+            _, _, above = self._split()
+            line = [None] * self.size.width
+            for layer in above:
+                layer_line = layer.get_line(y)
+                if layer_line is None:
+                    continue
+                line = [
+                    summarize(entry, pixel)
+                    for entry, pixel in zip(line, layer_line)
+                ]
+            self._above[y] = line
+            self._dirty_above.clear(y)
+        return self._above[y]
+
+    def _apply_above(self, entry, pixel: Pixel, x: int, y: int) -> Pixel:
+        if entry is None:
+            return pixel
+        if entry[0] == CONST:
+            return entry[1]
+        if entry[0] == KEEP_BG:
+            return Pixel(entry[1], entry[2], pixel.bg)
+        _, _, above = self._split()
+        pos = Offset(x, y)
+        for layer in above:
+            pixel = pixel_compute(pixel, layer.get(pos))
+        return pixel
+
+    def get_line(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> list[Pixel]:
+        # rows are always blended whole, the window is only a hint here
+        if y not in self._dirty:
+            return self._result[y]
+        _, active, _ = self._split()
+        below = self._get_below(y)
+        above = self._get_above(y)
+        active_line = active.get_line(y) if active is not None else None
+        line = self._result[y]
+        span = self._dirty.span(y)
+        if line is None or span is None:
+            start, end = 0, self.size.width
+            line = [None] * self.size.width
+        else:
+            start, end = span
+            line = line.copy()
+        for x in range(start, end):
+            pixel = below[x]
+            if active_line is not None:
+                pixel = pixel_compute(pixel, active_line[x])
+            line[x] = self._apply_above(above[x], pixel, x, y)
+        self._result[y] = line
+        self._dirty.clear(y)
+        return line
+
+    def get(self, pos: Offset) -> Pixel:
+        return self.get_line(pos.y)[pos.x]
+
+    def render_line(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> Strip:
+        if self._render_dirty[y] or y in self._dirty:
+            self._render_cache[y] = line_strip(self.get_line(y))
+            self._render_dirty[y] = 0
+        return self._render_cache[y]
@@ -0,0 +1,252 @@
+# cSpell:disable
+"""Undo and redo of layer edits.
+
+Every Layer.set made between two calls to `end_stroke` (mouse down to
+mouse up on the canvas) becomes one entry holding only the cells that
+changed, with their value before and after, and the offset of the layers
+that were moved. Entries are packed into
+plane arrays sorted by row and zlib compressed; once they take more than
+the memory budget the oldest ones are spilled to a temporary file, or
+dropped when spilling is disabled.
+"""
+from __future__ import annotations
+
+import tempfile
+import zlib
+from array import array
+
+from textual.geometry import Offset
+
+from .layer import Layer
+from .storage import Cell
+
+
+DEFAULT_BUDGET = 16 * 1024 * 1024
+
+
+def _pack(cells: list[tuple[tuple[int, int], list[Cell]]]) -> bytes:
+    planes = [
+        array('I', [position[i] for position, _ in cells]) for i in (0, 1)
+    ]
+    masks = bytearray()
+    for which in (0, 1):
+        planes += [
+            array('I', [change[which][i] for _, change in cells])
+            for i in (0, 1, 2)
+        ]
+        masks += bytes([change[which][3] for _, change in cells])
+    data = b"".join(bytes(plane) for plane in planes)
+    return zlib.compress(data + masks)
+
+
+def _unpack(data: bytes, count: int) -> tuple[list, list[Cell], list[Cell]]:
+    data = zlib.decompress(data)
+    words = array('I', data[:count * 32])
+    masks = data[count * 32:]
+    ys, xs, glyphs, fg, bg, new_glyphs, new_fg, new_bg = (
+        words[i * count:(i + 1) * count] for i in range(8)
+    )
+    old = list(zip(glyphs, fg, bg, masks[:count]))
+    new = list(zip(new_glyphs, new_fg, new_bg, masks[count:]))
+    return list(zip(ys, xs)), old, new
+
+
+class Delta:
+    """The cells one stroke changed on one layer."""
+
+    __slots__ = ("layer", "count", "data", "spilled")
+
+    def __init__(self, layer: Layer, cells: list) -> None:
+        self.layer = layer
+        self.count = len(cells)
+        self.data = _pack(cells)
+        # (offset, length) in the spill file once written out
+        self.spilled = None
+
+    @property
+    def size(self) -> int:
+        return 0 if self.data is None else len(self.data)
+
+    def apply(self, spill_file, undo: bool) -> None:
+        data = self.data
+        if data is None:
+            offset, length = self.spilled
+            spill_file.seek(offset)
+            data = spill_file.read(length)
+        positions, old, new = _unpack(data, self.count)
+        cells = old if undo else new
+        layer = self.layer
+        start = end = row = None
+        for (y, x), cell in zip(positions, cells):
+            layer._store(x, y, cell)
+            if y != row:
+                if row is not None:
+                    layer.invalidate_local(row, start, end)
+                row, start = y, x
+            end = x + 1
+        if row is not None:
+            layer.invalidate_local(row, start, end)
+
+
+class Move:
+    """The offset one stroke gave to one layer."""
+
+    __slots__ = ("layer", "old", "new")
+
+    # nothing to compress or spill
+    size = 0
+    data = None
+
+    def __init__(self, layer: Layer, old: Offset, new: Offset) -> None:
+        self.layer = layer
+        self.old = old
+        self.new = new
+
+    def apply(self, spill_file, undo: bool) -> None:
+        self.layer._move(self.old if undo else self.new)
+
+
+class History:
+
+    def __init__(self, budget: int = DEFAULT_BUDGET, spill: bool = True):
+        self.budget = budget
+        self.spill = spill
+        self._undo: list[list[Delta | Move]] = []
+        self._redo: list[list[Delta | Move]] = []
+        # layer -> {(y, x): [cell before the stroke, latest cell]}
+        self._stroke: dict[Layer, dict] = dict()
+        # layer -> [offset before the stroke, latest offset]
+        self._moves: dict[Layer, list[Offset]] = dict()
+        self._memory = 0
+        self._spill_file = None
+
+    @property
+    def memory(self) -> int:
+        """Compressed bytes of history held in memory."""
+        return self._memory
+
+    def can_undo(self) -> bool:
+        return bool(self._undo or self._stroke or self._moves)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def record(self, layer: Layer, x: int, y: int, old: Cell, new: Cell):
+        cells = self._stroke.get(layer)
+        if cells is None:
+            cells = self._stroke[layer] = dict()
+        change = cells.get((y, x))
+        if change is None:
+            cells[(y, x)] = [old, new]
+        else:
+            change[1] = new
+
+    def record_span(
+        self,
+        layer: Layer,
+        y: int,
+        start: int,
+        old_cells,
+        new: Cell
+    ) -> None:
+        """Like record, for cells of row `y` from `start` all set to `new`."""
+        cells = self._stroke.get(layer)
+        if cells is None:
+            cells = self._stroke[layer] = dict()
+        for x, old in enumerate(old_cells, start):
+            change = cells.get((y, x))
+            if change is None:
+                cells[(y, x)] = [old, new]
+            else:
+                change[1] = new
+
+    def record_offset(self, layer: Layer, old: Offset, new: Offset) -> None:
+        move = self._moves.get(layer)
+        if move is None:
+            self._moves[layer] = [old, new]
+        else:
+            move[1] = new
+
+    def end_stroke(self) -> None:
+        if not self._stroke and not self._moves:
+            return
+        entry = []
+        for layer, cells in self._stroke.items():
+            changed = [
+                item for item in sorted(cells.items())
+                if item[1][0] != item[1][1]
+            ]
+            if changed:
+                entry.append(Delta(layer, changed))
+        # undo moves the layers back before restoring their cells
+        for layer, (old, new) in self._moves.items():
+            if old != new:
+                entry.append(Move(layer, old, new))
+        self._stroke = dict()
+        self._moves = dict()
+        if not entry:
+            return
+        self._drop(self._redo)
+        self._redo = []
+        self._undo.append(entry)
+        self._memory += sum(delta.size for delta in entry)
+        self._enforce_budget()
+
+    def undo(self) -> bool:
+        self.end_stroke()
+        if not self._undo:
+            return False
+        entry = self._undo.pop()
+        for delta in reversed(entry):
+            delta.apply(self._spill_file, undo=True)
+        self._redo.append(entry)
+        return True
+
+    def redo(self) -> bool:
+        self.end_stroke()
+        if not self._redo:
+            return False
+        entry = self._redo.pop()
+        for delta in entry:
+            delta.apply(self._spill_file, undo=False)
+        self._undo.append(entry)
+        return True
+
+    def clear(self) -> None:
+        self._stroke = dict()
+        self._moves = dict()
+        self._drop(self._undo)
+        self._drop(self._redo)
+        self._undo = []
+        self._redo = []
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def _drop(self, entries: list[list[Delta | Move]]) -> None:
+        for entry in entries:
+            self._memory -= sum(delta.size for delta in entry)
+
+    def _enforce_budget(self) -> None:
+        # the oldest entries go first, the latest one always stays
+        if not self.spill:
+            while self._memory > self.budget and len(self._undo) > 1:
+                self._drop(self._undo[:1])
+                del self._undo[0]
+            return
+        for entry in self._undo[:-1]:
+            if self._memory <= self.budget:
+                return
+            for delta in entry:
+                self._spill(delta)
+
+    def _spill(self, delta: Delta | Move) -> None:
+        if delta.data is None:
+            return
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="timp-history-")
+        self._spill_file.seek(0, 2)
+        delta.spilled = (self._spill_file.tell(), len(delta.data))
+        self._spill_file.write(delta.data)
+        self._memory -= len(delta.data)
+        delta.data = None
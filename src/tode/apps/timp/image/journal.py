@@ -0,0 +1,366 @@
+# cSpell:disable
+"""Append-only journal of layer edits.
+
+An autosaved document is a snapshot in the native format plus a journal
+next to it. Every Layer.set queues a fixed size record with the layer,
+position and packed cell, and a background thread appends them to the
+journal, so saving costs as much as the edit rather than the document.
+Once the journal grows past a limit the same thread folds it into a new
+snapshot, built from the old snapshot on disk instead of the live layers.
+Adding, removing, moving and hiding layers are journaled as well.
+
+Every journal starts with a record naming the snapshot it extends, by size
+and modification time. A crash between writing a snapshot and truncating
+the journal leaves a journal for the previous snapshot, which is skipped.
+"""
+from __future__ import annotations
+
+import math
+import os
+import queue
+import struct
+import threading
+
+from textual.geometry import Offset, Size
+
+from . import document
+from .layer import Layer
+from .storage import GLYPH_BASE, Cell, decode_glyph, encode_glyph
+
+
+SET = 1
+GLYPH = 2
+OFFSET = 3
+BEGIN = 4
+ADD = 5
+REMOVE = 6
+MOVE = 7
+VISIBLE = 8
+
+# kind, layer, x, y, glyph, fg, bg, mask
+_SET = struct.Struct("<BHIIIIIB")
+# kind, glyph id, length of the utf-8 text that follows
+_GLYPH = struct.Struct("<BIH")
+# kind, layer, x, y
+_OFFSET = struct.Struct("<BHii")
+# kind, snapshot size, snapshot modification time in nanoseconds
+_BEGIN = struct.Struct("<BQq")
+# kind, name length, width, height, opacity, flags, x, y, then the name;
+# the layer goes on top and its cells follow as SET records
+_ADD = struct.Struct("<BHIIdBii")
+# kind, layer
+_REMOVE = struct.Struct("<BH")
+# kind, layer, new position
+_MOVE = struct.Struct("<BHH")
+# kind, layer, visible
+_VISIBLE = struct.Struct("<BHB")
+
+COMPACT_SIZE = 4 * 1024 * 1024
+
+
+def journal_path(path: str) -> str:
+    return f"{path}.journal"
+
+
+def _snapshot_id(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def replay(data: bytes, size: Size, layers: list[Layer]) -> int:
+    """Applies journal records to `layers`, returns how many were applied.
+
+    Layers are added, removed and moved in the list itself. A torn record
+    at the end, left by a crash mid-write, is ignored.
+    """
+    glyph_map = dict()
+    applied = 0
+    offset = 0
+    end = len(data)
+    while offset < end:
+        kind = data[offset]
+        if kind == GLYPH:
+            if offset + _GLYPH.size > end:
+                break
+            _, glyph, length = _GLYPH.unpack_from(data, offset)
+            start = offset + _GLYPH.size
+            if start + length > end:
+                break
+            text = data[start:start + length].decode("utf-8")
+            glyph_map[glyph] = encode_glyph(text)
+            offset = start + length
+        elif kind == SET:
+            if offset + _SET.size > end:
+                break
+            _, index, x, y, glyph, fg, bg, mask = _SET.unpack_from(data, offset)
+            offset += _SET.size
+            if index >= len(layers):
+                continue
+            storage = layers[index].storage
+            if x >= storage.size.width or y >= storage.size.height:
+                continue
+            glyph = glyph_map.get(glyph, glyph)
+            storage.set(x, y, (glyph, fg, bg, mask))
+            applied += 1
+        elif kind == OFFSET:
+            if offset + _OFFSET.size > end:
+                break
+            _, index, x, y = _OFFSET.unpack_from(data, offset)
+            offset += _OFFSET.size
+            if index < len(layers):
+                layers[index].offset = Offset(x, y)
+                applied += 1
+        elif kind == BEGIN:
+            if offset + _BEGIN.size > end:
+                break
+            offset += _BEGIN.size
+        elif kind == ADD:
+            if offset + _ADD.size > end:
+                break
+            _, length, width, height, opacity, flags, x, y = (
+                _ADD.unpack_from(data, offset)
+            )
+            start = offset + _ADD.size
+            if start + length > end:
+                break
+            name = data[start:start + length].decode("utf-8")
+            offset = start + length
+            layers.append(Layer(
+                name, Size(width, height),
+                visible=bool(flags & document.VISIBLE),
+                linked=bool(flags & document.LINKED),
+                opacity=None if math.isnan(opacity) else opacity,
+                offset=Offset(x, y)
+            ))
+            applied += 1
+        elif kind == REMOVE:
+            if offset + _REMOVE.size > end:
+                break
+            _, index = _REMOVE.unpack_from(data, offset)
+            offset += _REMOVE.size
+            if index < len(layers):
+                del layers[index]
+                applied += 1
+        elif kind == MOVE:
+            if offset + _MOVE.size > end:
+                break
+            _, index, new_index = _MOVE.unpack_from(data, offset)
+            offset += _MOVE.size
+            if index < len(layers):
+                layers.insert(new_index, layers.pop(index))
+                applied += 1
+        elif kind == VISIBLE:
+            if offset + _VISIBLE.size > end:
+                break
+            _, index, visible = _VISIBLE.unpack_from(data, offset)
+            offset += _VISIBLE.size
+            if index < len(layers):
+                layers[index].visible = bool(visible)
+                applied += 1
+        else:
+            break
+    return applied
+
+
+def recover(path: str) -> tuple[Size, list[Layer], int]:
+    """Reads the snapshot at `path` and replays its journal, if any."""
+    size, layers, active = document.read_layers(path)
+    try:
+        with open(journal_path(path), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return size, layers, active
+    if data[:1] == bytes([BEGIN]) and len(data) >= _BEGIN.size:
+        _, *snapshot = _BEGIN.unpack_from(data, 0)
+        if tuple(snapshot) != _snapshot_id(path):
+            # the snapshot was rewritten after this journal, it has its edits
+            return size, layers, active
+    replay(data, size, layers)
+    return size, layers, min(active, len(layers) - 1)
+
+
+class Journal:
+    """Journals the edits of an image into `path`.
+
+    Only `record`, `checkpoint` and `close` are called from the app; the
+    journal file and the snapshot are only ever written by the background
+    thread.
+    """
+
+    def __init__(
+        self,
+        image,
+        path: str,
+        compact_size: int = COMPACT_SIZE
+    ) -> None:
+        self.image = image
+        self.path = path
+        self.journal_path = journal_path(path)
+        self.compact_size = compact_size
+        self._queue = queue.Queue()
+        # owned by the background thread
+        self._file = None
+        self._size = 0
+        self._glyphs = set()
+        # a failed write, reported by the next flush or checkpoint
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name=f"journal {path}", daemon=True
+        )
+        self._thread.start()
+        self.checkpoint()
+
+    def record(self, layer: Layer, x: int, y: int, cell: Cell) -> None:
+        index = self.image.layer_index(layer.name)
+        if index is not None:
+            self._queue.put((index, x, y, cell))
+
+    def record_offset(self, layer: Layer) -> None:
+        index = self.image.layer_index(layer.name)
+        if index is not None:
+            self._queue.put(_OFFSET.pack(OFFSET, index, *layer.offset))
+
+    def record_add(self, layer: Layer) -> None:
+        """Journals a layer put on top of the others, with its cells."""
+        name = layer.name.encode("utf-8")
+        opacity = math.nan if layer._opacity is None else layer._opacity
+        flags = (document.VISIBLE if layer.visible else 0)
+        flags |= (document.LINKED if layer.linked else 0)
+        self._queue.put(_ADD.pack(
+            ADD, len(name), *layer.storage.size, opacity, flags,
+            *layer.offset
+        ) + name)
+        index = self.image.layer_index(layer.name)
+        storage = layer.storage
+        for y in range(storage.size.height):
+            row = storage.get_row(y)
+            if row is None:
+                continue
+            for x, cell in enumerate(zip(*row)):
+                if cell[3]:
+                    self._queue.put((index, x, y, cell))
+
+    def record_remove(self, index: int) -> None:
+        self._queue.put(_REMOVE.pack(REMOVE, index))
+
+    def record_move(self, index: int, new_index: int) -> None:
+        self._queue.put(_MOVE.pack(MOVE, index, new_index))
+
+    def record_visible(self, layer: Layer) -> None:
+        index = self.image.layer_index(layer.name)
+        self._queue.put(_VISIBLE.pack(VISIBLE, index, layer.visible))
+
+    def checkpoint(self) -> None:
+        """Saves the live image as the snapshot and empties the journal.
+
+        Blocks until it is written.
+        """
+        self._call(self._save)
+
+    def flush(self) -> None:
+        """Blocks until every queued record is on disk."""
+        self._call(self._check)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _call(self, function) -> None:
+        """Runs `function` on the background thread and waits for it.
+
+        Whatever it raises is raised again here.
+        """
+        done = threading.Event()
+        errors = []
+
+        def command():
+            try:
+                function()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                done.set()
+
+        self._queue.put(command)
+        done.wait()
+        if errors:
+            raise errors[0]
+
+    def _check(self) -> None:
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _run(self) -> None:
+        self._file = open(self.journal_path, "ab")
+        try:
+            while True:
+                items = [self._queue.get()]
+                # take whatever piled up while the last batch was written
+                while True:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    if not self._process(items):
+                        return
+                except (OSError, document.DocumentError) as error:
+                    # keep journaling, the records of this batch are lost
+                    self._error = error
+        finally:
+            self._file.close()
+
+    def _process(self, items: list) -> bool:
+        records = []
+        for item in items:
+            if item is None:
+                self._write(records)
+                return False
+            if callable(item):
+                self._write(records)
+                records = []
+                item()
+                continue
+            if isinstance(item, bytes):
+                records.append(item)
+                continue
+            index, x, y, cell = item
+            glyph = cell[0]
+            if glyph >= GLYPH_BASE and glyph not in self._glyphs:
+                self._glyphs.add(glyph)
+                text = decode_glyph(glyph).encode("utf-8")
+                records.append(_GLYPH.pack(GLYPH, glyph, len(text)) + text)
+            records.append(_SET.pack(SET, index, x, y, *cell))
+        self._write(records)
+        if self._size >= self.compact_size:
+            self._compact()
+        return True
+
+    def _write(self, records: list[bytes]) -> None:
+        if not records:
+            return
+        data = b"".join(records)
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._size += len(data)
+
+    def _truncate(self) -> None:
+        """Starts a journal for the snapshot just written."""
+        self._file.truncate(0)
+        self._size = 0
+        self._glyphs.clear()
+        self._write([_BEGIN.pack(BEGIN, *_snapshot_id(self.path))])
+
+    def _save(self) -> None:
+        # the app thread is blocked in checkpoint, the layers are stable
+        document.save(self.image, self.path)
+        # the snapshot holds whatever a failed write lost
+        self._error = None
+        self._truncate()
+
+    def _compact(self) -> None:
+        size, layers, active = recover(self.path)
+        document.write_layers(self.path, size, layers, active)
+        self._truncate()
@@ -4,10 +4,21 @@ from textual.message import Message
 from textual.reactive import var
 from textual.widget import Widget
 
+from . import composite
 from .pixel import Pixel
+from .storage import (
+    EMPTY, Cell, PixelStorage, Row, Spans, add_cells, fade_cell, pack_pixel,
+    shift_row, unpack_pixel
+)
 
 
 class LayerUpdate(Message):
+    """Rows and column spans of a layer that changed.
+
+    A layer keeps adding to its pending update until the image handles
+    it, so a burst of writes reaches the views as a single message with
+    one merged span per row.
+    """
 
     def __init__(
         self,
@@ -17,37 +28,61 @@ class LayerUpdate(Message):
     ) -> None:
         super().__init__()
         self.layer = layer
-        self._offsets = offsets
+        self.spans: dict[int, tuple[int, int]] = dict()
         self._lines = lines
+        if offsets is not None:
+            for offset in offsets:
+                self.add(offset.y, offset.x, offset.x + 1)
+
+    def add(self, y: int, start: int, end: int) -> None:
+        span = self.spans.get(y)
+        if span is not None:
+            start = min(start, span[0])
+            end = max(end, span[1])
+        self.spans[y] = (start, end)
 
     @property
     def region(self):
-        if self._offsets is not None:
-            min_x = None
-            min_y = None
-            max_x = None
-            max_y = None
-            for offset in self._offsets:
-                if min_x is None or offset.x < min_x:
-                    min_x = offset.x
-                if max_x is None or offset.x > max_x:
-                    max_x = offset.x
-                if min_y is None or offset.y < min_y:
-                    min_y = offset.y
-                if max_y is None or offset.y > max_y:
-                    max_y = offset.y
-            return Region.from_corners(min_x, min_y, max_x + 1, max_y + 1)
+        if not self.spans:
+            return None
+        return Region.from_union(self.regions)
 
     @property
-    def offsets(self):
-        return self._offsets if self._offsets is not None else []
+    def regions(self) -> list[Region]:
+        """The spans as rectangles, merging rows that share a span."""
+        regions = []
+        start_y = None
+        for y in sorted(self.spans):
+            span = self.spans[y]
+            if start_y is not None and y == end_y and span == last_span:
+                end_y += 1
+                continue
+            if start_y is not None:
+                regions.append(_span_region(start_y, end_y, last_span))
+            start_y = y
+            end_y = y + 1
+            last_span = span
+        if start_y is not None:
+            regions.append(_span_region(start_y, end_y, last_span))
+        return regions
 
     @property
     def lines(self):
         return self._lines if self._lines is not None else []
 
 
+def _span_region(start_y: int, end_y: int, span: tuple[int, int]) -> Region:
+    start_x, end_x = span
+    return Region(start_x, start_y, end_x - start_x, end_y - start_y)
+
+
 class Layer(Widget):
+    """Cells drawn over the image, shifted by the layer offset.
+
+    The storage holds the cells in layer coordinates, everything else
+    (positions, spans and updates) is in image coordinates. Layers are the
+    size of their image, moving one leaves part of it outside the image.
+    """
 
     active: var[bool] = var(False)
     visible: var[bool] = var(False)
@@ -57,21 +92,29 @@ class Layer(Widget):
         self,
         name: str,
         size: Size,
-        data: list | None = None,
+        data: list | PixelStorage | None = None,
         visible: bool | None = True,
         linked: bool | None = True,
         active: bool | None = False,
-        opacity: float | None = 1.0
+        opacity: float | None = 1.0,
+        offset: Offset | None = None
     ) -> None:
         super().__init__(name=name)
         if data is None:
-            data = [[None] * size.width for i in range(size.height)]
-        self.data = data
-        self._region = Region.from_offset(Offset(0, 0), size)
+            storage = PixelStorage(size)
+        elif isinstance(data, PixelStorage):
+            storage = data
+        else:
+            storage = PixelStorage.from_rows(size, data)
+        self.storage = storage
+        self._region = Region.from_offset(offset or Offset(0, 0), size)
         self.visible = visible
         self.active = active
         self.linked = linked
         self._opacity = opacity
+        self._pending_update = None
+        self.journal = None
+        self.history = None
 
     def __str__(self):
         return f'Layer(name={self.name})'
@@ -80,36 +123,249 @@ class Layer(Widget):
         return f'Layer(name={self.name})'
 
     def fill_with(name, size, color: Color):
-        data = [
-            [Pixel(Pixel.BLANK, bg=color) for j in range(size.width)]
-            for i in range(size.height)
-        ]
-        return Layer(name, size, data)
+        cell = pack_pixel(Pixel(Pixel.BLANK, bg=color))
+        return Layer(name, size, PixelStorage.filled(size, cell))
+
+    @property
+    def offset(self) -> Offset:
+        return self._region.offset
+
+    @offset.setter
+    def offset(self, offset: Offset) -> None:
+        self._region = Region.from_offset(offset, self.storage.size)
+
+    def move_to(self, offset: Offset) -> None:
+        """Moves the layer without touching its cells.
+
+        Only the union of the bounds of its cells before and after the
+        move is redrawn.
+        """
+        old = self.offset
+        if offset == old:
+            return
+        if self.history is not None:
+            self.history.record_offset(self, old, offset)
+        self._move(offset)
+
+    def _move(self, offset: Offset) -> None:
+        old = self.offset
+        self.offset = offset
+        if self.journal is not None:
+            self.journal.record_offset(self)
+        bounds = self.storage.bounds()
+        if bounds is None:
+            return
+        region = bounds.translate(old).union(bounds.translate(offset))
+        region = region.intersection(Region(0, 0, *self.storage.size))
+        for y in range(region.y, region.bottom):
+            self.invalidate(y, region.x, region.right)
 
     def get(self, pos: Offset) -> Pixel | None:
         if not self._region.contains_point(pos):
             return None
-        pixel = self.data[pos.y][pos.x]
-        if pixel is not None:
-            pixel = pixel.clone()
-            pixel.set_opacity(self._opacity)
-
-        return pixel
-
-    def get_line(self, y: int) -> list[Pixel | None] | None:
-        if self.data[y] is None:
-            return self.data[y]
-        line = []
-        for x in range(self._region.width):
-            pixel = self.data[y][x]
-            if pixel is not None:
-                pixel = pixel * self._opacity
-            line.append(pixel)
-        return line
-
-    def set(self, pos: Offset, pixel: Pixel) -> None:
-        self.data[pos.y][pos.x] = pixel
-        self.post_message(LayerUpdate(self, offsets=[pos]))
+        x, y = pos - self.offset
+        return unpack_pixel(self.storage.get(x, y), self._opacity)
+
+    def get_row(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> Row | None:
+        """Row `y` of the image as covered by the layer.
+
+        Only the columns from `start` to `end` are guaranteed to be read.
+        """
+        dx, dy = self.offset
+        y -= dy
+        if not 0 <= y < self.storage.size.height:
+            return None
+        if end is not None:
+            end -= dx
+        row = self.storage.get_row(y, start - dx, end)
+        if row is None or not dx:
+            return row
+        return shift_row(row, dx)
+
+    def get_line(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> list[Pixel | None] | None:
+        row = self.get_row(y, start, end)
+        if row is None:
+            return None
+        opacity = self._opacity
+        return [unpack_pixel(cell, opacity) for cell in zip(*row)]
+
+    def get_planes(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> composite.Planes | None:
+        return composite.row_planes(self.get_row(y, start, end), self._opacity)
+
+    def set(self, pos: Offset, pixel: Pixel | None) -> None:
+        if not self._region.contains_point(pos):
+            return
+        x, y = pos - self.offset
+        self._write(x, y, pack_pixel(pixel))
+        self.invalidate(pos.y, pos.x, pos.x + 1)
+
+    def apply_spans(self, spans: Spans, pixel: Pixel) -> None:
+        """Applies `pixel` to the (start, end) column spans of each row.
+
+        All rows end up in the same pending LayerUpdate.
+        """
+        top = pack_pixel(pixel)
+        self._write_spans(spans, lambda below: add_cells(below, top))
+
+    def apply_rows(self, spans: Spans, rows, offset: Offset) -> None:
+        """Applies cells read from another source over the spans.
+
+        The cell for (x, y) is `rows(y + offset.y)[x + offset.x]`, where
+        `rows` returns a list of packed cells per image row or None.
+        """
+        dx, dy = self.offset
+        source_x = dx + offset.x
+        for y, row, span_list in self._local_spans(spans):
+            source = rows(y + dy + offset.y)
+            if source is None:
+                continue
+            width = len(source)
+            cells = list(zip(*row)) if row is not None else None
+            for start, end in span_list:
+                start = max(start, -source_x)
+                end = min(end, width - source_x)
+                for x in range(start, end):
+                    below = cells[x] if cells is not None else EMPTY
+                    cell = add_cells(below, source[x + source_x])
+                    if cell != below:
+                        self._write(x, y, cell, below)
+
+    def set_cells(self, y: int, start: int, cells: list[Cell | None]):
+        """Sets the cells of row `y` from `start` on, None keeps a cell."""
+        dx, dy = self.offset
+        width, height = self.storage.size
+        local_y = y - dy
+        if not 0 <= local_y < height:
+            return
+        first = last = None
+        for x, cell in enumerate(cells, start - dx):
+            if cell is None or not 0 <= x < width:
+                continue
+            self._write(x, local_y, cell)
+            if first is None:
+                first = x
+            last = x
+        if first is not None:
+            self.invalidate(y, first + dx, last + dx + 1)
+
+    def set_spans(self, spans: Spans, pixel: Pixel | None) -> None:
+        """Like apply_spans, replacing the cells, None clears them.
+
+        The storage is written a span at a time, so clearing a large area
+        drops its tiles instead of expanding them cell by cell.
+        """
+        cell = pack_pixel(pixel)
+        for y, row, span_list in self._local_spans(spans):
+            if row is None and cell == EMPTY:
+                continue
+            for start, end in span_list:
+                if self.history is not None:
+                    if row is not None:
+                        old_cells = zip(*(plane[start:end] for plane in row))
+                    else:
+                        old_cells = [EMPTY] * (end - start)
+                    self.history.record_span(self, y, start, old_cells, cell)
+                self.storage.set_span(y, start, end, cell)
+                if self.journal is not None:
+                    for x in range(start, end):
+                        self.journal.record(self, x, y, cell)
+
+    def fade_spans(self, spans: Spans, strength: float) -> None:
+        """Lowers the alpha of the cells by `strength`, 1 clears them."""
+        keep = 1 - strength
+        self._write_spans(spans, lambda below: fade_cell(below, keep))
+
+    def _local_spans(self, spans: Spans):
+        """Yields the row, its cells and the spans in layer coordinates.
+
+        Each row is invalidated once the caller is done with it.
+        """
+        dx, dy = self.offset
+        width, height = self.storage.size
+        for y, row_spans in spans.items():
+            local_y = y - dy
+            if not row_spans or not 0 <= local_y < height:
+                continue
+            local = [
+                (max(start - dx, 0), min(end - dx, width))
+                for start, end in row_spans
+                if start - dx < width and end - dx > 0
+            ]
+            yield local_y, self.storage.get_row(local_y), local
+            start = min(span[0] for span in row_spans)
+            end = max(span[1] for span in row_spans)
+            self.invalidate(y, start, end)
+
+    def _write_spans(self, spans: Spans, compute) -> None:
+        for y, row, span_list in self._local_spans(spans):
+            cells = list(zip(*row)) if row is not None else None
+            for start, end in span_list:
+                for x in range(start, end):
+                    below = cells[x] if cells is not None else EMPTY
+                    cell = compute(below)
+                    if cell != below:
+                        self._write(x, y, cell, below)
+
+    def _write(
+        self,
+        x: int,
+        y: int,
+        cell: Cell,
+        old: Cell | None = None
+    ) -> None:
+        if self.history is not None:
+            if old is None:
+                old = self.storage.get(x, y)
+            self.history.record(self, x, y, old, cell)
+        self._store(x, y, cell)
+
+    def _store(self, x: int, y: int, cell: Cell) -> None:
+        self.storage.set(x, y, cell)
+        if self.journal is not None:
+            self.journal.record(self, x, y, cell)
+
+    def invalidate_local(self, y: int, start: int, end: int) -> None:
+        """Like invalidate, with the row and columns in layer coordinates."""
+        dx, dy = self.offset
+        width, height = self.storage.size
+        y += dy
+        start = max(start + dx, 0)
+        end = min(end + dx, width)
+        if 0 <= y < height and start < end:
+            self.invalidate(y, start, end)
+
+    def invalidate(self, y: int, start: int, end: int) -> None:
+        update = self._pending_update
+        if update is None:
+            update = self._pending_update = LayerUpdate(self)
+            self.post_message(update)
+        update.add(y, start, end)
+
+    def end_update(self, update: LayerUpdate) -> None:
+        """Stops merging writes into `update`, called once it is handled."""
+        if self._pending_update is update:
+            self._pending_update = None
 
     def apply(self, pos: Offset, pixel: Pixel) -> None:
-        self.set(pos, self.data[pos.y][pos.x] + pixel)
+        if not self._region.contains_point(pos):
+            return
+        x, y = pos - self.offset
+        current = unpack_pixel(self.storage.get(x, y))
+        if current is not None:
+            pixel = current + pixel
+        self.set(pos, pixel)
@@ -3,27 +3,70 @@
 from rich.style import Style as RichStyle
 from rich.segment import Segment
 
+from textual.cache import LRUCache
 from textual.color import Color
 
 
 class Pixel:
+    """An immutable cell value.
+
+    Pixels are interned on (char, fg, bg): building a pixel equal to one
+    already in the table returns that same instance, so an image made of a
+    few distinct cells holds only a few Pixel objects.
+    """
 
     BLANK = " "
-    fg: Color
+    INTERN_SIZE = 4096
+    _interned: dict[tuple, "Pixel"] = dict()
+
+    # results of `below * above`, see blend_cache.hits / blend_cache.misses
+    # and blend_cache.maxsize to tune it
+    blend_cache: LRUCache[tuple["Pixel", "Pixel"], "Pixel"] = LRUCache(4096)
+    # rich styles keyed on (fg, bg), shared by every pixel with those colors
+    style_cache: LRUCache[tuple, RichStyle] = LRUCache(1024)
+
+    __slots__ = ("char", "fg", "bg", "_hash", "_segment")
 
-    def __init__(
-        self,
+    char: str | None
+    fg: Color | None
+    bg: Color | None
+
+    def __new__(
+        cls,
         char: str,
         fg: Color | None = None,
         bg: Color | None = None,
-    ) -> None:
-        super().__init__()
-        self.char = char
-        self.fg = fg
-        self.bg = bg
+    ) -> "Pixel":
+        key = (char, fg, bg)
+        pixel = cls._interned.get(key)
+        if pixel is not None:
+            return pixel
+        pixel = object.__new__(cls)
+        object.__setattr__(pixel, "char", char)
+        object.__setattr__(pixel, "fg", fg)
+        object.__setattr__(pixel, "bg", bg)
+        object.__setattr__(pixel, "_hash", hash(key))
+        object.__setattr__(pixel, "_segment", None)
+        if len(cls._interned) >= cls.INTERN_SIZE:
+            cls._interned.clear()
+        cls._interned[key] = pixel
+        return pixel
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Pixel is immutable")
+
+    def __reduce__(self):
+        return (Pixel, (self.char, self.fg, self.bg))
+
+    def __hash__(self):
+        return self._hash
 
     @property
     def style(self) -> RichStyle:
+        key = (self.fg, self.bg)
+        style = Pixel.style_cache.get(key)
+        if style is not None:
+            return style
         kwargs = dict()
         if self.fg is not None:
             fg = self.fg
@@ -31,14 +74,22 @@ class Pixel:
         if self.bg is not None:
             bg = self.bg
             kwargs['bgcolor'] = bg.rich_color
-        return RichStyle(**kwargs)
+        style = RichStyle(**kwargs)
+        Pixel.style_cache.set(key, style)
+        return style
 
     @property
     def segment(self) -> Segment:
-        return Segment(self.char, self.style)
+        # pixels are immutable and interned, so the segment is built once
+        # per distinct cell
+        segment = self._segment
+        if segment is None:
+            segment = Segment(self.char, self.style)
+            object.__setattr__(self, "_segment", segment)
+        return segment
 
     def clone(self):
-        return Pixel(self.char, self.fg, self.bg)
+        return self
 
     def is_blank(self):
         return (
@@ -50,7 +101,7 @@ class Pixel:
 
     def __add__(self, other):
         if other is None:
-            return self.clone()
+            return self
         char = other.char if other.char is not None else self.char
         fg = other.fg if other.fg is not None else self.fg
         bg = other.bg if other.bg is not None else self.bg
@@ -59,13 +110,19 @@ class Pixel:
 
     def __mul__(self, other):
         if other is None:
-            return self.clone()
+            return self
         if type(other) == float:
-            pixel = self.clone()
-            pixel.set_opacity(other)
-            return pixel
+            return self.with_opacity(other)
         if other.bg is not None and other.bg.a == 1:
-            return other.clone()
+            return other
+        key = (self, other)
+        result = Pixel.blend_cache.get(key)
+        if result is None:
+            result = self._blend(other)
+            Pixel.blend_cache.set(key, result)
+        return result
+
+    def _blend(self, other):
         if other.is_blank():
             char = self.char
             fg = self.fg
@@ -90,6 +147,8 @@ class Pixel:
         return f'Pixel(char=\'{self.char}\', fg={self.fg}, bg={self.bg})'
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if other is None:
             return False
         return (
@@ -98,8 +157,7 @@ class Pixel:
             and self.bg == other.bg
         )
 
-    def set_opacity(self, opacity: float):
-        if self.fg is not None:
-            self.fg = self.fg.with_alpha(opacity)
-        if self.bg is not None:
-            self.bg = self.bg.with_alpha(opacity)
+    def with_opacity(self, opacity: float) -> "Pixel":
+        fg = self.fg.with_alpha(opacity) if self.fg is not None else None
+        bg = self.bg.with_alpha(opacity) if self.bg is not None else None
+        return Pixel(self.char, fg, bg)
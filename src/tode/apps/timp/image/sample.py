@@ -0,0 +1,65 @@
+# cSpell:disable
+"""Rows read from a layer or from the composited image, for tools that
+copy cells from one place to another.
+
+A stroke reads the same few source rows over and over, so the rows are
+kept in a small ring buffer and only fetched, and composited, once while
+they stay in it.
+"""
+from __future__ import annotations
+
+from typing import Callable
+
+from .flat import flatten_line
+from .layer import Layer
+from .storage import Cell, pack_pixel
+
+
+RING_SIZE = 32
+
+Fetch = Callable[[int], list[Cell] | None]
+
+
+def layer_rows(layer: Layer) -> Fetch:
+    """Rows of `layer` in image coordinates."""
+    def fetch(y: int) -> list[Cell] | None:
+        row = layer.get_row(y)
+        return None if row is None else list(zip(*row))
+    return fetch
+
+
+def merged_rows(layers: list[Layer]) -> Fetch:
+    """Rows of the visible `layers` composited, bottom first."""
+    def fetch(y: int) -> list[Cell] | None:
+        line = flatten_line(layers, y)
+        return None if line is None else [pack_pixel(pixel) for pixel in line]
+    return fetch
+
+
+class RowRing:
+    """The last `size` rows fetched, the oldest one is replaced first."""
+
+    def __init__(self, fetch: Fetch, height: int, size: int = RING_SIZE):
+        self.fetch = fetch
+        self.height = height
+        self._keys: list[int | None] = [None] * size
+        self._rows: list[list[Cell] | None] = [None] * size
+        self._slots: dict[int, int] = dict()
+        self._next = 0
+
+    def __call__(self, y: int) -> list[Cell] | None:
+        slot = self._slots.get(y)
+        if slot is not None:
+            return self._rows[slot]
+        if not 0 <= y < self.height:
+            return None
+        slot = self._next
+        self._next = (slot + 1) % len(self._keys)
+        old = self._keys[slot]
+        if old is not None:
+            del self._slots[old]
+        row = self.fetch(y)
+        self._keys[slot] = y
+        self._rows[slot] = row
+        self._slots[y] = slot
+        return row
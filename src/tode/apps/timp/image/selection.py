@@ -0,0 +1,294 @@
+# cSpell:disable
+"""Selection masks.
+
+A selection keeps one packed bitset per row, as a python int where bit x
+is column x, so combining two selections is one integer operation per row
+and walking the selected spans of a row costs one step per span.
+"""
+from __future__ import annotations
+
+import math
+
+from textual.geometry import Offset, Region, Size
+
+from .storage import Spans
+
+
+MODES = ("replace", "add", "subtract", "intersect")
+
+
+def _span_bits(start: int, end: int) -> int:
+    return ((1 << (end - start)) - 1) << start
+
+
+def bit_spans(bits: int) -> list[tuple[int, int]]:
+    """(start, end) of every run of set bits."""
+    spans = []
+    x = 0
+    while bits:
+        skip = (bits & -bits).bit_length() - 1
+        bits >>= skip
+        x += skip
+        clear = ~bits
+        run = (clear & -clear).bit_length() - 1
+        spans.append((x, x + run))
+        bits >>= run
+        x += run
+    return spans
+
+
+def line_points(x0: int, y0: int, x1: int, y1: int) -> list[tuple[int, int]]:
+    """Cells of the Bresenham line from (x0, y0) to (x1, y1), both included."""
+    points = []
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    step_x = 1 if x0 < x1 else -1
+    step_y = 1 if y0 < y1 else -1
+    error = dx + dy
+    while True:
+        points.append((x0, y0))
+        if x0 == x1 and y0 == y1:
+            return points
+        double = 2 * error
+        if double >= dy:
+            error += dy
+            x0 += step_x
+        if double <= dx:
+            error += dx
+            y0 += step_y
+
+
+def _polygon_rows(
+    points: list[tuple[int, int]],
+    height: int,
+    width: int
+) -> dict[int, int]:
+    """Even-odd scanline fill of a closed polygon through cell centers.
+
+    Edges are bucketed by their first row and kept in an active list, so
+    the work is proportional to the rows and crossings, not the area.
+    """
+    starts: dict[int, list] = dict()
+    for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]):
+        if y0 == y1:
+            continue
+        if y0 > y1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        first = max(y0, 0)
+        # rows whose center line y + 0.5 crosses the edge, top inclusive
+        last = min(y1, height)
+        if first >= last:
+            continue
+        slope = (x1 - x0) / (y1 - y0)
+        x = x0 + 0.5 + (first - y0) * slope
+        starts.setdefault(first, []).append([x, slope, last])
+
+    rows = dict()
+    active = []
+    for y in range(min(starts, default=0), height):
+        active += starts.pop(y, ())
+        active = [edge for edge in active if edge[2] > y]
+        if not active:
+            if not starts:
+                break
+            continue
+        crossings = sorted(edge[0] for edge in active)
+        bits = 0
+        for left, right in zip(crossings[::2], crossings[1::2]):
+            # cells whose center x + 0.5 lies between the two crossings
+            start = max(math.ceil(left - 0.5), 0)
+            end = min(math.floor(right - 0.5) + 1, width)
+            if end > start:
+                bits |= _span_bits(start, end)
+        if bits:
+            rows[y] = bits
+        for edge in active:
+            edge[0] += edge[1]
+    return rows
+
+
+def combine(
+    current: Selection | None,
+    other: Selection | None,
+    mode: str,
+    size: Size
+) -> Selection | None:
+    """Like Selection.combine, with None standing for an empty selection."""
+    if mode != "replace":
+        empty = Selection(size)
+        other = (current or empty).combine(other or empty, mode)
+    if other is not None and other.is_empty():
+        return None
+    return other
+
+
+class Selection:
+
+    def __init__(self, size: Size, rows: list[int] | None = None) -> None:
+        self.size = size
+        self._rows = rows if rows is not None else [0] * size.height
+        self._full = (1 << size.width) - 1
+        self._bbox = None
+
+    def __str__(self):
+        return f'Selection(bbox={self.bbox})'
+
+    def __repr__(self):
+        return f'Selection(bbox={self.bbox})'
+
+    def from_spans(size: Size, spans: Spans) -> Selection:
+        selection = Selection(size)
+        for y, row_spans in spans.items():
+            for start, end in row_spans:
+                selection._rows[y] |= _span_bits(start, end)
+        return selection
+
+    def from_region(size: Size, region: Region) -> Selection:
+        region = region.intersection(Region(0, 0, *size))
+        selection = Selection(size)
+        if region.area:
+            bits = _span_bits(region.x, region.right)
+            for y in range(region.y, region.bottom):
+                selection._rows[y] = bits
+        return selection
+
+    def from_polygon(size: Size, points: list[Offset]) -> Selection:
+        """Cells inside a closed polygon by the even-odd rule.
+
+        Vertices are cell positions, the cells its edges pass over are
+        included as well.
+        """
+        selection = Selection(size)
+        points = [(point.x, point.y) for point in points]
+        rows = selection._rows
+        for y, bits in _polygon_rows(points, size.height, size.width).items():
+            rows[y] |= bits
+        for start, end in zip(points, points[1:] + points[:1]):
+            selection.add_line(Offset(*start), Offset(*end))
+        return selection
+
+    def all(size: Size) -> Selection:
+        return Selection(size, [(1 << size.width) - 1] * size.height)
+
+    def copy(self) -> Selection:
+        return Selection(self.size, self._rows.copy())
+
+    def row(self, y: int) -> int:
+        return self._rows[y]
+
+    def add_line(self, start: Offset, end: Offset) -> None:
+        """Selects the cells of the line from `start` to `end`, in place."""
+        rows = self._rows
+        width, height = self.size
+        for x, y in line_points(*start, *end):
+            if 0 <= x < width and 0 <= y < height:
+                rows[y] |= 1 << x
+        self._bbox = None
+
+    def mask(self, offset: Offset, size: Size) -> list[int]:
+        """Rows of bits for the area of `size` placed at `offset`.
+
+        Bit x of row y is set when the cell at `offset` + (x, y) is
+        selected, such as a layer moved by `offset`.
+        """
+        dx, dy = offset
+        width, height = size
+        full = (1 << width) - 1
+        mask = [0] * height
+        for y in range(max(-dy, 0), min(self.size.height - dy, height)):
+            bits = self._rows[y + dy]
+            mask[y] = (bits >> dx if dx >= 0 else bits << -dx) & full
+        return mask
+
+    def contains(self, x: int, y: int) -> bool:
+        if not (0 <= y < self.size.height and 0 <= x < self.size.width):
+            return False
+        return bool(self._rows[y] >> x & 1)
+
+    def __contains__(self, pos: Offset) -> bool:
+        return self.contains(pos.x, pos.y)
+
+    def is_empty(self) -> bool:
+        return not any(self._rows)
+
+    @property
+    def bbox(self) -> Region | None:
+        """Smallest region holding every selected cell, None if empty."""
+        if self._bbox is None:
+            rows = [y for y, bits in enumerate(self._rows) if bits]
+            if not rows:
+                return None
+            merged = 0
+            for y in rows:
+                merged |= self._rows[y]
+            start = (merged & -merged).bit_length() - 1
+            end = merged.bit_length()
+            height = rows[-1] + 1 - rows[0]
+            self._bbox = Region(start, rows[0], end - start, height)
+        return self._bbox
+
+    def spans(self, y: int) -> list[tuple[int, int]]:
+        return bit_spans(self._rows[y])
+
+    def to_spans(self) -> Spans:
+        return {
+            y: bit_spans(bits) for y, bits in enumerate(self._rows) if bits
+        }
+
+    def clip(self, spans: Spans) -> Spans:
+        """The parts of `spans` inside the selection."""
+        clipped = dict()
+        for y, row_spans in spans.items():
+            bits = 0
+            for start, end in row_spans:
+                bits |= _span_bits(start, end)
+            bits &= self._rows[y]
+            if bits:
+                clipped[y] = bit_spans(bits)
+        return clipped
+
+    def outline(self, y: int) -> list[tuple[int, int]]:
+        """Spans of selected cells on row `y` with an unselected neighbour."""
+        bits = self._rows[y]
+        if not bits:
+            return []
+        above = self._rows[y - 1] if y > 0 else 0
+        below = self._rows[y + 1] if y + 1 < self.size.height else 0
+        inside = bits & above & below & (bits << 1) & (bits >> 1)
+        return bit_spans(bits & ~inside)
+
+    def union(self, other: Selection) -> Selection:
+        return Selection(
+            self.size, [a | b for a, b in zip(self._rows, other._rows)]
+        )
+
+    def intersect(self, other: Selection) -> Selection:
+        return Selection(
+            self.size, [a & b for a, b in zip(self._rows, other._rows)]
+        )
+
+    def subtract(self, other: Selection) -> Selection:
+        return Selection(
+            self.size, [a & ~b for a, b in zip(self._rows, other._rows)]
+        )
+
+    def invert(self) -> Selection:
+        full = self._full
+        return Selection(self.size, [~bits & full for bits in self._rows])
+
+    __or__ = union
+    __and__ = intersect
+    __sub__ = subtract
+    __invert__ = invert
+
+    def combine(self, other: Selection, mode: str) -> Selection:
+        """Applies `other` to this selection the way a selection tool does."""
+        if mode == "replace":
+            return other
+        if mode == "add":
+            return self.union(other)
+        if mode == "subtract":
+            return self.subtract(other)
+        if mode == "intersect":
+            return self.intersect(other)
+        raise ValueError(f"unknown selection mode {mode!r}")
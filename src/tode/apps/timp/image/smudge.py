@@ -0,0 +1,159 @@
+# cSpell:disable
+"""Smudging, vectorized over the brush footprint.
+
+The brush carries an RGBA sample for every cell of its stamp. At each dab
+the sample is mixed with the colors under the brush and written back, so
+colors are dragged along the stroke. Foreground and background are mixed
+as premultiplied float arrays of shape (height, width, 4), one array
+operation per dab instead of one Color.blend per cell.
+"""
+from __future__ import annotations
+
+from textual.geometry import Offset, Size
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, smudging is then disabled
+    np = None
+
+from .layer import Layer
+from .pixel import Pixel
+from .selection import Selection
+from .stamp import Stamp
+from .storage import BG, CELL, FG
+
+
+enabled = np is not None
+
+_SPACE = ord(Pixel.BLANK)
+
+
+def _unpack(packed, present):
+    """Premultiplied RGBA floats, unset colors are fully transparent."""
+    colors = np.empty(packed.shape + (4,))
+    alpha = np.where(present, (packed & 0xFF) / 255, 0.0)
+    colors[..., 0] = (packed >> 24) * alpha
+    colors[..., 1] = ((packed >> 16) & 0xFF) * alpha
+    colors[..., 2] = ((packed >> 8) & 0xFF) * alpha
+    colors[..., 3] = alpha
+    return colors
+
+
+def _bits(rows: list[int], width: int):
+    """Row bitsets as a boolean array of shape (len(rows), width)."""
+    rows = np.array(rows, dtype=np.int64)
+    return ((rows[:, None] >> np.arange(width)) & 1).astype(bool)
+
+
+def _pack(colors):
+    """Packed colors and whether each one is visible at all."""
+    alpha = np.rint(colors[..., 3] * 255).astype(np.uint32)
+    present = alpha > 0
+    safe = np.where(present, colors[..., 3], 1.0)
+    rgb = np.clip(np.rint(colors[..., :3] / safe[..., None]), 0, 255)
+    rgb = rgb.astype(np.uint32)
+    packed = (rgb[..., 0] << 24) | (rgb[..., 1] << 16) | (rgb[..., 2] << 8)
+    packed |= alpha
+    return np.where(present, packed, 0).astype(np.uint32), present
+
+
+class SmudgeBuffer:
+    """Colors picked up by the brush during one stroke.
+
+    `rate` is how much of the carried sample is kept at each dab, higher
+    values smear colors further along the stroke.
+    """
+
+    def __init__(self, stamp: Stamp, rate: float) -> None:
+        self.stamp = stamp
+        self.rate = rate
+        self.footprint = _bits(stamp.mask, stamp.width)
+        # premultiplied samples, picked up by the first dab
+        self.fg = None
+        self.bg = None
+
+    def _read(self, layer: Layer, left: int, top: int):
+        """The cells under the footprint, only their tiles are read."""
+        height, width = self.footprint.shape
+        glyphs = np.zeros((height, width), dtype=np.uint32)
+        fg = np.zeros((height, width), dtype=np.uint32)
+        bg = np.zeros((height, width), dtype=np.uint32)
+        mask = np.zeros((height, width), dtype=np.uint8)
+        image_width = layer.storage.size.width
+        start = max(left, 0)
+        end = min(left + width, image_width)
+        if start >= end:
+            return glyphs, fg, bg, mask
+        for dy in range(height):
+            row = layer.get_row(top + dy, start, end)
+            if row is None:
+                continue
+            columns = slice(start - left, end - left)
+            glyphs[dy, columns] = np.frombuffer(row[0], np.uint32)[start:end]
+            fg[dy, columns] = np.frombuffer(row[1], np.uint32)[start:end]
+            bg[dy, columns] = np.frombuffer(row[2], np.uint32)[start:end]
+            mask[dy, columns] = np.frombuffer(row[3], np.uint8)[start:end]
+        return glyphs, fg, bg, mask
+
+    def _area(self, left: int, top: int, size, selection: Selection | None):
+        """Footprint cells inside the image and the selection."""
+        height, width = self.footprint.shape
+        area = self.footprint.copy()
+        xs = np.arange(left, left + width)
+        ys = np.arange(top, top + height)
+        area &= ((xs >= 0) & (xs < size.width))[None, :]
+        area &= ((ys >= 0) & (ys < size.height))[:, None]
+        if selection is not None:
+            window = selection.mask(Offset(left, top), Size(width, height))
+            area &= _bits(window, width)
+        return area
+
+    def dab(
+        self,
+        layer: Layer,
+        x: int,
+        y: int,
+        selection: Selection | None = None
+    ) -> None:
+        center_x, center_y = self.stamp.center
+        left = x - center_x
+        top = y - center_y
+        glyphs, fg, bg, mask = self._read(layer, left, top)
+        fg_colors = _unpack(fg, (mask & FG) != 0)
+        bg_colors = _unpack(bg, (mask & BG) != 0)
+        if self.fg is None:
+            self.fg = fg_colors
+            self.bg = bg_colors
+            return
+        rate = self.rate
+        self.fg = rate * self.fg + (1 - rate) * fg_colors
+        self.bg = rate * self.bg + (1 - rate) * bg_colors
+
+        new_fg, fg_set = _pack(self.fg)
+        new_bg, bg_set = _pack(self.bg)
+        was_set = (mask & CELL) != 0
+        is_set = was_set | fg_set | bg_set
+        new_glyphs = np.where(was_set, glyphs, _SPACE)
+        new_mask = (
+            is_set.astype(np.uint8) * CELL
+            | fg_set.astype(np.uint8) * FG
+            | bg_set.astype(np.uint8) * BG
+        )
+        new_glyphs = np.where(is_set, new_glyphs, 0)
+        new_fg = np.where(fg_set, new_fg, 0)
+        new_bg = np.where(bg_set, new_bg, 0)
+        changed = (
+            (new_glyphs != glyphs) | (new_fg != fg) | (new_bg != bg)
+            | (new_mask != mask)
+        )
+        changed &= self._area(left, top, layer.storage.size, selection)
+
+        cells = np.stack([new_glyphs, new_fg, new_bg, new_mask], axis=-1)
+        for dy, (row, row_changed) in enumerate(
+            zip(cells.tolist(), changed.tolist())
+        ):
+            if any(row_changed):
+                layer.set_cells(top + dy, left, [
+                    tuple(cell) if keep else None
+                    for cell, keep in zip(row, row_changed)
+                ])
@@ -0,0 +1,127 @@
+# cSpell:disable
+"""Brush stamps.
+
+A stamp keeps one bitset per row, like Selection, so placing it along a
+stroke is a shift and an or per row, and the union of every placement is
+painted once as row spans.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+
+
+SHAPES = ("square", "circle", "custom")
+MAX_SIZE = 15
+
+
+class Stamp:
+    """A brush shape, drawn centered on each point of a stroke.
+
+    Cells of the `None` group take the brush glyph, the other groups
+    carry their own.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        groups: list[tuple[str | None, list[int]]]
+    ) -> None:
+        if not 0 < width <= MAX_SIZE or not 0 < height <= MAX_SIZE:
+            raise ValueError(f"stamps are at most {MAX_SIZE}x{MAX_SIZE}")
+        self.width = width
+        self.height = height
+        self.groups = groups
+        self.center = ((width - 1) // 2, (height - 1) // 2)
+
+    def __str__(self):
+        return f'Stamp(width={self.width}, height={self.height})'
+
+    def __repr__(self):
+        return f'Stamp(width={self.width}, height={self.height})'
+
+    def square(size: int) -> Stamp:
+        return Stamp(size, size, [(None, [(1 << size) - 1] * size)])
+
+    def circle(size: int) -> Stamp:
+        """Cells whose center lies inside a circle of diameter `size`."""
+        center = (size - 1) / 2
+        radius = (size / 2) ** 2
+        rows = []
+        for y in range(size):
+            bits = 0
+            for x in range(size):
+                if (x - center) ** 2 + (y - center) ** 2 <= radius:
+                    bits |= 1 << x
+            rows.append(bits)
+        return Stamp(size, size, [(None, rows)])
+
+    def from_text(text: str) -> Stamp:
+        """A stamp painting the glyphs of `text`, spaces are left out."""
+        return Stamp.from_glyphs([list(line) for line in text.splitlines()])
+
+    def from_glyphs(lines: list[list[str | None]]) -> Stamp:
+        """A stamp painting the glyphs of each line, blanks are left out."""
+        width = max((len(line) for line in lines), default=0)
+        groups: dict[str, list[int]] = dict()
+        for y, line in enumerate(lines):
+            for x, char in enumerate(line):
+                if char is None or char == " ":
+                    continue
+                rows = groups.get(char)
+                if rows is None:
+                    rows = groups[char] = [0] * len(lines)
+                rows[y] |= 1 << x
+        if not groups:
+            raise ValueError("the stamp has no glyphs")
+        return Stamp(width, len(lines), list(groups.items()))
+
+    @property
+    def mask(self) -> list[int]:
+        """Every cell of the stamp, whatever its group."""
+        mask = [0] * self.height
+        for _, rows in self.groups:
+            mask = [a | b for a, b in zip(mask, rows)]
+        return mask
+
+    def edge(self) -> list[int]:
+        """Cells of the stamp with a neighbour outside of it."""
+        mask = self.mask
+        edge = []
+        for y, bits in enumerate(mask):
+            above = mask[y - 1] if y > 0 else 0
+            below = mask[y + 1] if y + 1 < self.height else 0
+            inside = bits & above & below & (bits << 1) & (bits >> 1)
+            edge.append(bits & ~inside)
+        return edge
+
+    def place(
+        self,
+        rows: list[int],
+        points: list[tuple[int, int]],
+        width: int,
+        height: int
+    ) -> dict[int, int]:
+        """Row bitsets of `rows` centered on every point, cut to the size."""
+        center_x, center_y = self.center
+        placed: dict[int, int] = dict()
+        for x, y in points:
+            left = x - center_x
+            top = y - center_y
+            for dy, bits in enumerate(rows):
+                row_y = top + dy
+                if not bits or not 0 <= row_y < height:
+                    continue
+                bits = bits << left if left >= 0 else bits >> -left
+                placed[row_y] = placed.get(row_y, 0) | bits
+        full = (1 << width) - 1
+        return {y: bits & full for y, bits in placed.items() if bits & full}
+
+
+@lru_cache(maxsize=64)
+def shape_stamp(shape: str, size: int) -> Stamp:
+    if shape == "square":
+        return Stamp.square(size)
+    if shape == "circle":
+        return Stamp.circle(size)
+    raise ValueError(f"unknown brush shape {shape!r}")
@@ -0,0 +1,514 @@
+# cSpell:disable
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from array import array
+from functools import lru_cache
+
+from textual.color import Color
+from textual.geometry import Region, Size
+
+from .pixel import Pixel
+
+
+# bits of the per-cell mask
+CELL = 1
+FG = 2
+BG = 4
+
+# glyphs made of more than one codepoint are stored as ids past the
+# unicode range
+GLYPH_BASE = 0x110000
+_glyphs: list[str] = []
+_glyph_ids: dict[str, int] = dict()
+
+
+def encode_glyph(char: str | None) -> int:
+    if char is None:
+        return 0
+    if len(char) == 1:
+        return ord(char)
+    glyph_id = _glyph_ids.get(char)
+    if glyph_id is None:
+        glyph_id = GLYPH_BASE + len(_glyphs)
+        _glyphs.append(char)
+        _glyph_ids[char] = glyph_id
+    return glyph_id
+
+
+def decode_glyph(glyph: int) -> str | None:
+    if glyph == 0:
+        return None
+    if glyph < GLYPH_BASE:
+        return chr(glyph)
+    return _glyphs[glyph - GLYPH_BASE]
+
+
+def interned_glyphs() -> list[str]:
+    """Glyphs encoded so far as ids, the first one is GLYPH_BASE."""
+    return list(_glyphs)
+
+
+def pack_color(color: Color) -> int:
+    r, g, b = color.rgb
+    a = round(color.a * 255)
+    return (r << 24) | (g << 16) | (b << 8) | a
+
+
+@lru_cache(maxsize=4096)
+def unpack_color(value: int, alpha: float | None = None) -> Color:
+    if alpha is None:
+        alpha = (value & 0xFF) / 255
+    return Color(value >> 24, (value >> 16) & 0xFF, (value >> 8) & 0xFF, alpha)
+
+
+Cell = tuple[int, int, int, int]
+# (start, end) column spans of each row
+Spans = dict[int, list[tuple[int, int]]]
+
+
+def pack_pixel(pixel: Pixel | None) -> Cell:
+    if pixel is None:
+        return (0, 0, 0, 0)
+    mask = CELL
+    fg = bg = 0
+    if pixel.fg is not None:
+        fg = pack_color(pixel.fg)
+        mask |= FG
+    if pixel.bg is not None:
+        bg = pack_color(pixel.bg)
+        mask |= BG
+    return (encode_glyph(pixel.char), fg, bg, mask)
+
+
+def unpack_pixel(cell: Cell, opacity: float | None = None) -> Pixel | None:
+    """The pixel of `cell`, the alpha of its colors scaled by `opacity`."""
+    glyph, fg, bg, mask = cell
+    if not mask & CELL:
+        return None
+    fg_alpha = bg_alpha = None
+    if opacity is not None:
+        fg_alpha = (fg & 0xFF) / 255 * opacity
+        bg_alpha = (bg & 0xFF) / 255 * opacity
+    return Pixel(
+        decode_glyph(glyph),
+        fg=unpack_color(fg, fg_alpha) if mask & FG else None,
+        bg=unpack_color(bg, bg_alpha) if mask & BG else None,
+    )
+
+
+def add_cells(below: Cell, above: Cell) -> Cell:
+    """Packed equivalent of `Pixel.__add__`."""
+    if not below[3] & CELL:
+        return above
+    if not above[3] & CELL:
+        return below
+    glyph = above[0] or below[0]
+    mask = CELL
+    if above[3] & FG:
+        fg = above[1]
+        mask |= FG
+    else:
+        fg = below[1]
+        mask |= below[3] & FG
+    if above[3] & BG:
+        bg = above[2]
+        mask |= BG
+    else:
+        bg = below[2]
+        mask |= below[3] & BG
+    return (glyph, fg, bg, mask)
+
+
+def fade_cell(cell: Cell, keep: float) -> Cell:
+    """`cell` with the alpha of its colors scaled by `keep`.
+
+    The cell is cleared once neither color is left, cells without colors
+    are cleared right away.
+    """
+    glyph, fg, bg, mask = cell
+    if not mask & CELL:
+        return cell
+    if mask & FG:
+        alpha = round((fg & 0xFF) * keep)
+        fg = (fg & ~0xFF) | alpha if alpha else 0
+        mask = mask if alpha else mask & ~FG
+    if mask & BG:
+        alpha = round((bg & 0xFF) * keep)
+        bg = (bg & ~0xFF) | alpha if alpha else 0
+        mask = mask if alpha else mask & ~BG
+    if not mask & (FG | BG):
+        return EMPTY
+    return (glyph, fg, bg, mask)
+
+
+TILE_WIDTH = 16
+TILE_HEIGHT = 8
+TILE_AREA = TILE_WIDTH * TILE_HEIGHT
+
+EMPTY: Cell = (0, 0, 0, 0)
+
+Row = tuple[array, array, array, bytearray]
+
+
+def shift_spans(spans: Spans, offset: tuple[int, int], size: Size) -> Spans:
+    """`spans` moved by `offset` and cut to `size`."""
+    dx, dy = offset
+    width, height = size
+    shifted = dict()
+    for y, row_spans in spans.items():
+        y += dy
+        if not 0 <= y < height:
+            continue
+        row_spans = [
+            (max(start + dx, 0), min(end + dx, width))
+            for start, end in row_spans
+            if start + dx < width and end + dx > 0
+        ]
+        if row_spans:
+            shifted[y] = row_spans
+    return shifted
+
+
+def shift_row(row: Row, dx: int) -> Row | None:
+    """`row` moved `dx` cells to the right, cut to the same width."""
+    width = len(row[3])
+    if abs(dx) >= width:
+        return None
+    pad = abs(dx)
+    empty = array('I', bytes(4 * pad))
+    glyphs, fg, bg, mask = row
+    if dx > 0:
+        end = width - dx
+        return (
+            empty + glyphs[:end],
+            empty + fg[:end],
+            empty + bg[:end],
+            bytearray(pad) + mask[:end],
+        )
+    return (
+        glyphs[pad:] + empty,
+        fg[pad:] + empty,
+        bg[pad:] + empty,
+        mask[pad:] + bytearray(pad),
+    )
+
+
+class Tile:
+    """A dense TILE_WIDTH x TILE_HEIGHT block of cells."""
+
+    __slots__ = ("glyphs", "fg", "bg", "mask", "count", "owners")
+
+    def __init__(self, cell: Cell = EMPTY, count: int = 0) -> None:
+        glyph, fg, bg, mask = cell
+        self.glyphs = array('I', [glyph]) * TILE_AREA
+        self.fg = array('I', [fg]) * TILE_AREA
+        self.bg = array('I', [bg]) * TILE_AREA
+        self.mask = bytearray([mask]) * TILE_AREA
+        # set cells inside the image, the tile is dropped when it reaches 0
+        self.count = count
+        # storages holding the tile, copied before it is written to while
+        # there is more than one
+        self.owners = 1
+
+    def copy(self) -> Tile:
+        tile = Tile()
+        tile.glyphs = array('I', self.glyphs)
+        tile.fg = array('I', self.fg)
+        tile.bg = array('I', self.bg)
+        tile.mask = bytearray(self.mask)
+        tile.count = self.count
+        return tile
+
+
+class LazyTile(ABC):
+    """A dense tile whose cells are only read when first accessed."""
+
+    __slots__ = ()
+
+    @abstractmethod
+    def load(self) -> Tile:
+        """Reads the cells, the storage then keeps the Tile instead."""
+
+
+@lru_cache(maxsize=256)
+def _uniform_run(cell: Cell) -> tuple[array, array, array, bytearray]:
+    glyph, fg, bg, mask = cell
+    return (
+        array('I', [glyph]) * TILE_WIDTH,
+        array('I', [fg]) * TILE_WIDTH,
+        array('I', [bg]) * TILE_WIDTH,
+        bytes([mask]) * TILE_WIDTH,
+    )
+
+
+class PixelStorage:
+    """Cells of a layer kept as parallel arrays instead of Pixel objects.
+
+    Each cell is a glyph codepoint, a packed RGBA foreground, a packed RGBA
+    background and a mask telling which of those are set.
+
+    Cells are grouped in tiles of TILE_WIDTH x TILE_HEIGHT. A tile is None
+    while all of its cells are empty, a single Cell tuple while all of its
+    cells hold the same value, and a dense Tile otherwise, so sparse and
+    flat layers cost memory only where they have detail. Storages read from
+    a file may also hold LazyTiles, loaded the first time they are touched.
+    """
+
+    def __init__(self, size: Size) -> None:
+        self.size = size
+        self.columns = -(-size.width // TILE_WIDTH)
+        self.rows = -(-size.height // TILE_HEIGHT)
+        self._tiles: list[Tile | LazyTile | Cell | None] = [None] * (
+            self.columns * self.rows
+        )
+        # number of set cells on each row, so empty rows are cheap to skip
+        self._row_count = array('I', bytes(4 * size.height))
+
+    def filled(size: Size, cell: Cell) -> PixelStorage:
+        storage = PixelStorage(size)
+        if cell[3] & CELL:
+            storage._tiles = [cell] * len(storage._tiles)
+            storage._row_count = array('I', [size.width]) * size.height
+        return storage
+
+    def from_rows(size: Size, rows: list[list[Pixel | None]]) -> PixelStorage:
+        storage = PixelStorage(size)
+        for y, row in enumerate(rows):
+            for x, pixel in enumerate(row):
+                if pixel is not None:
+                    storage.set(x, y, pack_pixel(pixel))
+        return storage
+
+    def copy(self, mask: list[int] | None = None) -> PixelStorage:
+        """A copy sharing its tiles with this storage until either writes.
+
+        With `mask`, one bitset per row as kept by Selection, cells outside
+        of it are left out of the copy. Tiles entirely inside the mask stay
+        shared, only the ones crossing its edge are copied.
+        """
+        storage = PixelStorage(self.size)
+        for index, tile in enumerate(self._tiles):
+            if type(tile) is Tile:
+                tile.owners += 1
+            storage._tiles[index] = tile
+        storage._row_count = array('I', self._row_count)
+        if mask is not None:
+            storage._keep(mask)
+        return storage
+
+    def _keep(self, mask: list[int]) -> None:
+        width, height = self.size
+        for index in range(len(self._tiles)):
+            if self._tiles[index] is None:
+                continue
+            ty, tx = divmod(index, self.columns)
+            x0 = tx * TILE_WIDTH
+            x1 = min(x0 + TILE_WIDTH, width)
+            y0 = ty * TILE_HEIGHT
+            y1 = min(y0 + TILE_HEIGHT, height)
+            tile_bits = ((1 << (x1 - x0)) - 1) << x0
+            rows = [mask[y] & tile_bits for y in range(y0, y1)]
+            if all(bits == tile_bits for bits in rows):
+                continue
+            if not any(rows):
+                self._drop_tile(index, x1 - x0, y0, y1)
+                continue
+            for y, bits in zip(range(y0, y1), rows):
+                outside = tile_bits & ~bits
+                for x in range(x0, x1):
+                    if outside >> x & 1:
+                        self.set(x, y, EMPTY)
+                if self._tiles[index] is None:
+                    break
+
+    def __del__(self) -> None:
+        # the other holders of shared tiles may write to them in place now
+        for tile in self._tiles:
+            if type(tile) is Tile:
+                tile.owners -= 1
+
+    def _own(self, index: int, tile: Tile) -> Tile:
+        """`tile`, copied first if another storage holds it as well."""
+        if tile.owners == 1:
+            return tile
+        tile.owners -= 1
+        tile = self._tiles[index] = tile.copy()
+        return tile
+
+    def _drop_tile(self, index: int, width: int, y0: int, y1: int) -> None:
+        tile = self.tile(index)
+        if type(tile) is Tile:
+            tile.owners -= 1
+        for y in range(y0, y1):
+            if type(tile) is tuple:
+                count = width if tile[3] & CELL else 0
+            else:
+                start = (y - y0) * TILE_WIDTH
+                mask = tile.mask[start:start + width]
+                count = sum(1 for cell_mask in mask if cell_mask & CELL)
+            self._row_count[y] -= count
+        self._tiles[index] = None
+
+    def _tile_area(self, tx: int, ty: int) -> int:
+        width = min(TILE_WIDTH, self.size.width - tx * TILE_WIDTH)
+        height = min(TILE_HEIGHT, self.size.height - ty * TILE_HEIGHT)
+        return width * height
+
+    def tile(self, index: int) -> Tile | Cell | None:
+        tile = self._tiles[index]
+        if isinstance(tile, LazyTile):
+            tile = self._tiles[index] = tile.load()
+        return tile
+
+    def get(self, x: int, y: int) -> Cell:
+        index = (y // TILE_HEIGHT) * self.columns + x // TILE_WIDTH
+        tile = self._tiles[index]
+        if tile is None:
+            return EMPTY
+        if type(tile) is tuple:
+            return tile
+        if type(tile) is not Tile:
+            tile = self.tile(index)
+        i = (y % TILE_HEIGHT) * TILE_WIDTH + x % TILE_WIDTH
+        return (tile.glyphs[i], tile.fg[i], tile.bg[i], tile.mask[i])
+
+    def set(self, x: int, y: int, cell: Cell) -> None:
+        tx = x // TILE_WIDTH
+        ty = y // TILE_HEIGHT
+        index = ty * self.columns + tx
+        tile = self.tile(index)
+        if tile is None:
+            if not cell[3] & CELL:
+                return
+            tile = self._tiles[index] = Tile()
+        elif type(tile) is tuple:
+            if tile == cell:
+                return
+            count = self._tile_area(tx, ty) if tile[3] & CELL else 0
+            tile = self._tiles[index] = Tile(tile, count)
+        else:
+            tile = self._own(index, tile)
+
+        i = (y % TILE_HEIGHT) * TILE_WIDTH + x % TILE_WIDTH
+        was_set = tile.mask[i] & CELL
+        glyph, fg, bg, mask = cell
+        tile.glyphs[i] = glyph
+        tile.fg[i] = fg
+        tile.bg[i] = bg
+        tile.mask[i] = mask
+        is_set = mask & CELL
+        if is_set and not was_set:
+            tile.count += 1
+            self._row_count[y] += 1
+        elif was_set and not is_set:
+            tile.count -= 1
+            self._row_count[y] -= 1
+            if tile.count == 0:
+                self._tiles[index] = None
+
+    def bounds(self) -> Region | None:
+        """Region holding every set cell, to the nearest tile column."""
+        rows = [y for y, count in enumerate(self._row_count) if count]
+        if not rows:
+            return None
+        columns = self.columns
+        used = {
+            index % columns
+            for index, tile in enumerate(self._tiles) if tile is not None
+        }
+        start = min(used) * TILE_WIDTH
+        end = min((max(used) + 1) * TILE_WIDTH, self.size.width)
+        return Region(start, rows[0], end - start, rows[-1] + 1 - rows[0])
+
+    def set_span(self, y: int, start: int, end: int, cell: Cell) -> None:
+        """Sets the cells from `start` to `end` of row `y`, a tile at a time.
+
+        Like set, tiles left without any set cell are dropped.
+        """
+        ty, tile_y = divmod(y, TILE_HEIGHT)
+        glyph, fg, bg, mask = cell
+        is_set = mask & CELL
+        x = start
+        while x < end:
+            tx = x // TILE_WIDTH
+            first = x
+            x = min((tx + 1) * TILE_WIDTH, end)
+            index = ty * self.columns + tx
+            tile = self.tile(index)
+            if tile is None:
+                if not is_set:
+                    continue
+                tile = self._tiles[index] = Tile()
+            elif type(tile) is tuple:
+                if tile == cell:
+                    continue
+                count = self._tile_area(tx, ty) if tile[3] & CELL else 0
+                tile = self._tiles[index] = Tile(tile, count)
+            else:
+                tile = self._own(index, tile)
+
+            n = x - first
+            i = tile_y * TILE_WIDTH + first % TILE_WIDTH
+            j = i + n
+            was_set = sum(cell_mask & CELL for cell_mask in tile.mask[i:j])
+            tile.glyphs[i:j] = array('I', [glyph]) * n
+            tile.fg[i:j] = array('I', [fg]) * n
+            tile.bg[i:j] = array('I', [bg]) * n
+            tile.mask[i:j] = bytes([mask]) * n
+            change = (n if is_set else 0) - was_set
+            tile.count += change
+            self._row_count[y] += change
+            if tile.count == 0:
+                self._tiles[index] = None
+
+    def is_row_empty(self, y: int) -> bool:
+        return self._row_count[y] == 0
+
+    def get_row(
+        self,
+        y: int,
+        start: int = 0,
+        end: int | None = None
+    ) -> Row | None:
+        """Row `y`, None if none of its cells is set.
+
+        Only the tiles crossing the columns from `start` to `end` are read,
+        the other cells come back empty. Showing part of a wide row then
+        does not load the tiles around it.
+        """
+        if self._row_count[y] == 0:
+            return None
+        if end is None:
+            end = self.size.width
+        first_column = max(start, 0) // TILE_WIDTH
+        last_column = (end - 1) // TILE_WIDTH
+        ty, tile_y = divmod(y, TILE_HEIGHT)
+        start = tile_y * TILE_WIDTH
+        end = start + TILE_WIDTH
+        glyphs = array('I')
+        fg = array('I')
+        bg = array('I')
+        mask = bytearray()
+        first = ty * self.columns
+        for tx in range(self.columns):
+            if first_column <= tx <= last_column:
+                tile = self.tile(first + tx)
+            else:
+                tile = None
+            if tile is None:
+                tile = EMPTY
+            if type(tile) is tuple:
+                run = _uniform_run(tile)
+                glyphs.extend(run[0])
+                fg.extend(run[1])
+                bg.extend(run[2])
+                mask.extend(run[3])
+            else:
+                glyphs.extend(tile.glyphs[start:end])
+                fg.extend(tile.fg[start:end])
+                bg.extend(tile.bg[start:end])
+                mask.extend(tile.mask[start:end])
+        width = self.size.width
+        del glyphs[width:], fg[width:], bg[width:], mask[width:]
+        return (glyphs, fg, bg, mask)
@@ -0,0 +1,232 @@
+# cSpell:disable
+"""Headless rendering of TIMP documents.
+
+Loads a document without starting the app, composites its visible layers
+through the same LayerView chain the Image widget uses and writes the
+result as ANSI, plain text or HTML. Directories are rendered in parallel,
+one document per worker process.
+
+    python -m apps.timp.render drawing.timp
+    python -m apps.timp.render -f html -o thumbs/ -j 8 library/
+"""
+from __future__ import annotations
+
+import argparse
+import html
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO
+
+from textual.color import Color
+from textual.geometry import Size
+
+from .image import ansi, document
+from .image.canvas import LayerView
+from .image.layer import Layer
+from .image.pixel import Pixel
+
+
+FORMATS = {"ansi": ".ans", "plain": ".txt", "html": ".html"}
+SOURCES = (".timp", ".ans")
+
+
+def load(path: str) -> tuple[Size, list[Layer]]:
+    if path.endswith(".ans"):
+        layer = ansi.read_file(path, "Background")
+        return layer.storage.size, [layer]
+    size, layers, _ = document.read_layers(path)
+    return size, layers
+
+
+def composite_view(size: Size, layers: list[Layer]) -> LayerView | None:
+    """Chains a LayerView per visible layer, bottom first."""
+    view = None
+    for layer in layers:
+        if layer.visible:
+            view = LayerView(size, view, layer)
+    return view
+
+
+def plain_line(line: list[Pixel | None]) -> str:
+    chars = [
+        Pixel.BLANK if pixel is None else pixel.char or Pixel.BLANK
+        for pixel in line
+    ]
+    return "".join(chars).rstrip()
+
+
+def _css(color: Color | None, prop: str) -> str:
+    if color is None:
+        return ""
+    return f"{prop}:{color.css};"
+
+
+def html_line(line: list[Pixel | None]) -> str:
+    """Encodes a row as spans, one per run of cells with the same colors."""
+    out = []
+    run = []
+    style = None
+    for pixel in line:
+        if pixel is None:
+            char, fg, bg = Pixel.BLANK, None, None
+        else:
+            char, fg, bg = pixel.char or Pixel.BLANK, pixel.fg, pixel.bg
+        pixel_style = _css(fg, "color") + _css(bg, "background-color")
+        if run and pixel_style != style:
+            out.append(_html_run(run, style))
+            run = []
+        style = pixel_style
+        run.append(char)
+    if run:
+        out.append(_html_run(run, style))
+    return "".join(out)
+
+
+def _html_run(run: list[str], style: str) -> str:
+    text = html.escape("".join(run))
+    if not style:
+        return text
+    return f'<span style="{style}">{text}</span>'
+
+
+def render(size: Size, layers: list[Layer], fmt: str, file: IO[str]) -> None:
+    encode = {"ansi": ansi.ansi_line, "plain": plain_line, "html": html_line}
+    encode = encode[fmt]
+    view = composite_view(size, layers)
+    blank = [None] * size.width
+    if fmt == "html":
+        file.write("<pre>\n")
+    for y in range(size.height):
+        line = view.get_line(y) if view is not None else None
+        file.write(encode(line if line is not None else blank))
+        file.write("\n")
+    if fmt == "html":
+        file.write("</pre>\n")
+
+
+def render_file(source: str, target: str | None, fmt: str) -> None:
+    size, layers = load(source)
+    if target is None:
+        render(size, layers, fmt, sys.stdout)
+        return
+    with open(target, "w", encoding="utf-8") as f:
+        render(size, layers, fmt, f)
+
+
+def _target(source: str, output: str | None, fmt: str) -> str:
+    root, _ = os.path.splitext(os.path.basename(source))
+    target_dir = output if output is not None else os.path.dirname(source)
+    os.makedirs(target_dir or ".", exist_ok=True)
+    return os.path.join(target_dir, root + FORMATS[fmt])
+
+
+def _jobs(
+    sources: list[str],
+    output: str | None,
+    fmt: str
+) -> tuple[list[tuple], list[tuple]]:
+    """Plans the renders, returning the jobs and the ones refused.
+
+    A job is refused when its target is one of the sources or when several
+    sources would be rendered to the same target.
+    """
+    single = len(sources) == 1 and not os.path.isdir(sources[0])
+    if single and (output is None or not os.path.isdir(output)):
+        # a single document goes to stdout or straight to the output file
+        return _check_jobs([(sources[0], output, fmt)], sources)
+    jobs = []
+    found = []
+    for source in sources:
+        if not os.path.isdir(source):
+            found.append(source)
+            jobs.append((source, _target(source, output, fmt), fmt))
+            continue
+        for name in sorted(os.listdir(source)):
+            if os.path.splitext(name)[1] not in SOURCES:
+                continue
+            path = os.path.join(source, name)
+            found.append(path)
+            target = _target(path, output, fmt)
+            # an .ans file found in a directory is already what ansi renders
+            if target != path:
+                jobs.append((path, target, fmt))
+    return _check_jobs(jobs, found)
+
+
+def _check_jobs(
+    jobs: list[tuple],
+    sources: list[str]
+) -> tuple[list[tuple], list[tuple]]:
+    sources = {os.path.realpath(source) for source in sources}
+    targets = dict()
+    for job in jobs:
+        if job[1] is not None:
+            targets.setdefault(os.path.realpath(job[1]), []).append(job[0])
+    accepted = []
+    errors = []
+    for job in jobs:
+        source, target, _ = job
+        if target is None:
+            accepted.append(job)
+            continue
+        key = os.path.realpath(target)
+        others = [other for other in targets[key] if other != source]
+        if key in sources:
+            errors.append((source, f"refusing to overwrite source {target}"))
+        elif others:
+            errors.append(
+                (source, f"{target} would also be rendered from {others[0]}")
+            )
+        else:
+            accepted.append(job)
+    return accepted, errors
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="timp-render",
+        description="Render TIMP documents without starting the app."
+    )
+    parser.add_argument(
+        "sources", nargs="+",
+        help=".timp or .ans files, or directories of them"
+    )
+    parser.add_argument(
+        "-f", "--format", choices=FORMATS, default="ansi",
+        help="output format (default: ansi)"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="output file, or directory when rendering directories"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help="worker processes for batches (default: one per CPU)"
+    )
+    args = parser.parse_args(argv)
+
+    jobs, errors = _jobs(args.sources, args.output, args.format)
+    if len(jobs) <= 1 or args.jobs == 1:
+        for job in jobs:
+            try:
+                render_file(*job)
+            except (OSError, document.DocumentError) as error:
+                errors.append((job[0], error))
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = [
+                (job[0], executor.submit(render_file, *job)) for job in jobs
+            ]
+            for source, future in futures:
+                error = future.exception()
+                if error is not None:
+                    errors.append((source, error))
+
+    for source, error in errors:
+        print(f"{source}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
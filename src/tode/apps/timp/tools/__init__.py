@@ -1,22 +1,13 @@
 
 from .tool import Tool
 from .pencil import Pencil
-
-
-class MoveTool(Tool):
-    symbol = ""
-
-
-class RectangleSelect(Tool):
-    symbol = "󰒆"
-
-
-class FreeSelect(Tool):
-    symbol = "󰴲"
-
-
-class FuzzySelect(Tool):
-    symbol = "󰁨"
+from .bucket_fill import BucketFill
+from .fuzzy_select import FuzzySelect
+from .select import FreeSelect, RectangleSelect
+from .move import MoveTool
+from .eraser import Eraser
+from .clone import Clone
+from .smudge import Smudge
 
 
 class Crop(Tool):
@@ -31,22 +22,6 @@ class WarpTransform(Tool):
     symbol = "󱪁"
 
 
-class BucketFill(Tool):
-    symbol = ""
-
-
-class Eraser(Tool):
-    symbol = "󰇾"
-
-
-class Clone(Tool):
-    symbol = "󰴹"
-
-
-class Smudge(Tool):
-    symbol = "󰆽"
-
-
 class Paths(Tool):
     symbol = "󰕙"
 
@@ -0,0 +1,97 @@
+from textual.geometry import Offset
+from textual.reactive import var
+
+from ..utils.choice import Choice
+from ..utils.number import Number
+
+from ..image.canvas import Layer
+from ..image.fill import MATCH_MODES, flood_spans
+from ..image.pixel import Pixel
+from ..image.selection import Selection
+from ..image.storage import shift_spans
+from .pencil import CheckboxOption, FormLine, PaintBackgroundOption
+from .tool import Tool, ToolOptions
+
+
+class MatchModeOption(FormLine):
+    label = "match: "
+
+    def __init__(self, mode: str = "composite"):
+        super().__init__()
+        self.value = Choice(MATCH_MODES, mode)
+
+
+class ToleranceOption(FormLine):
+    label = "tolerance: "
+
+    def __init__(self, tolerance: int = 0):
+        super().__init__()
+        # per channel, out of 255
+        self.value = Number(tolerance, 0, 255, step=5)
+
+
+class ContiguousOption(CheckboxOption):
+    label = "contiguous: "
+    default = True
+
+
+class BucketFillToolOptions(ToolOptions):
+    title = "Bucket Fill"
+
+    tolerance = var(0)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.match_mode = MatchModeOption()
+        self.tolerance_line = ToleranceOption()
+        self.contiguous = ContiguousOption()
+        self.paint_background = PaintBackgroundOption(checked=True)
+
+    def watch_tolerance(self, old_value, new_value) -> None:
+        self.tolerance_line.value.set(new_value)
+
+    def on_number_changed(self, message) -> None:
+        if message.number is self.tolerance_line.value:
+            self.tolerance = message.value
+            message.stop()
+
+    def compose(self):
+        yield self.match_mode
+        yield self.tolerance_line
+        yield self.contiguous
+        yield self.paint_background
+
+
+class BucketFill(Tool):
+    symbol = ""
+    tool_options = BucketFillToolOptions()
+    brush = var(Pixel.BLANK)
+
+    def apply_to_layer(
+        self,
+        layer: Layer,
+        pos: Offset,
+        selection: Selection | None = None
+    ) -> None:
+        if selection is not None and pos not in selection:
+            return
+        options = self.tool_options
+        fg = self.color_area.fg
+        bg = self.color_area.bg
+        if not options.paint_background.value.checked:
+            bg = None
+        local = pos - layer.offset
+        if not layer.storage.size.contains_point(local):
+            return
+        spans = flood_spans(
+            layer.storage,
+            local.x,
+            local.y,
+            match=options.match_mode.value.value,
+            tolerance=options.tolerance,
+            contiguous=options.contiguous.checked
+        )
+        spans = shift_spans(spans, layer.offset, layer.storage.size)
+        if selection is not None:
+            spans = selection.clip(spans)
+        layer.apply_spans(spans, Pixel(char=self.brush, fg=fg, bg=bg))
@@ -0,0 +1,98 @@
+from textual.geometry import Offset
+from textual.widgets import Static
+
+from ..image.canvas import Layer
+from ..image.sample import RowRing, layer_rows, merged_rows
+from ..image.stamp import Stamp
+from ..image.storage import Spans
+from .pencil import CheckboxOption, FormLine, Pencil, PencilToolOptions
+
+
+class SourceLine(FormLine):
+    label = "source: "
+
+    def __init__(self):
+        super().__init__()
+        self.value = Static("ctrl+click")
+
+
+class SampleMergedOption(CheckboxOption):
+    label = "sample merged: "
+
+
+class CloneToolOptions(PencilToolOptions):
+    title = "Clone"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.source_line = SourceLine()
+        self.sample_merged = SampleMergedOption()
+
+    def compose(self):
+        yield self.shape
+        yield self.size_line
+        yield self.spacing_line
+        yield self.source_line
+        yield self.sample_merged
+
+
+class Clone(Pencil):
+    """Copies cells from a source point along the stroke.
+
+    Ctrl+click sets the source, on the active layer, or on the whole image
+    with sample merged. The first stroke after that fixes the offset
+    between the source and the brush, later strokes keep it.
+    """
+
+    symbol = "󰴹"
+    tool_options = CloneToolOptions()
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # image, layer and position of the source
+        self._source = None
+        self._offset: Offset | None = None
+        # source rows of the stroke in progress
+        self._rows: RowRing | None = None
+
+    def ctrl_click(self, image, layer: Layer, pos: Offset) -> None:
+        self._source = (image, layer, pos)
+        self._offset = None
+        self.tool_options.source_line.value.update(f"{pos.x}, {pos.y}")
+
+    def apply_to_image(self, image, layer: Layer, pos: Offset) -> None:
+        if layer is None or self._source is None:
+            return
+        source_image, source_layer, source_pos = self._source
+        if source_image is not image:
+            return
+        if self._offset is None:
+            self._offset = source_pos - pos
+        if self.tool_options.sample_merged.checked:
+            fetch = merged_rows(image.visible_layers)
+        elif source_layer is not None:
+            fetch = layer_rows(source_layer)
+        else:
+            return
+        self._rows = RowRing(fetch, image.image_size.height)
+        super().apply_to_image(image, layer, pos)
+
+    def drag_image(
+        self,
+        image,
+        layer: Layer,
+        start: Offset,
+        end: Offset
+    ) -> None:
+        if self._rows is not None:
+            super().drag_image(image, layer, start, end)
+
+    def end_stroke(self, image, pos: Offset) -> None:
+        super().end_stroke(image, pos)
+        self._rows = None
+
+    def stamp_groups(self, stamp: Stamp) -> list[tuple[None, list[int]]]:
+        return [(None, stamp.mask)]
+
+    def paint(self, layer: Layer, spans: Spans, key: None) -> None:
+        layer.apply_rows(spans, self._rows, self._offset)
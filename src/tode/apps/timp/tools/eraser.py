@@ -0,0 +1,74 @@
+from textual.reactive import var
+
+from ..utils.number import Number
+
+from ..image.canvas import Layer
+from ..image.stamp import Stamp
+from ..image.storage import Spans
+from .pencil import CheckboxOption, FormLine, Pencil, PencilToolOptions
+
+
+class StrengthOption(FormLine):
+    label = "strength: "
+
+    def __init__(self, strength: int = 100):
+        super().__init__()
+        self.value = Number(strength, 10, 100, step=10, suffix="%")
+
+
+class FalloffOption(CheckboxOption):
+    label = "soft edge: "
+
+
+class EraserToolOptions(PencilToolOptions):
+    title = "Eraser"
+
+    # percent of the alpha taken away, 100 clears the cells
+    strength = var(100)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.strength_line = StrengthOption()
+        self.falloff = FalloffOption()
+
+    def watch_strength(self, old_value, new_value) -> None:
+        self.strength_line.value.set(new_value)
+
+    def on_number_changed(self, message) -> None:
+        if message.number is self.strength_line.value:
+            self.strength = int(message.value)
+            message.stop()
+
+    def compose(self):
+        yield self.shape
+        yield self.size_line
+        yield self.spacing_line
+        yield self.strength_line
+        yield self.falloff
+
+
+class Eraser(Pencil):
+    """Clears cells along a stroke, or fades them below full strength.
+
+    With the soft edge on, the outer ring of the stamp is erased at half
+    the strength.
+    """
+
+    symbol = "󰇾"
+    tool_options = EraserToolOptions()
+
+    def stamp_groups(self, stamp: Stamp) -> list[tuple[float, list[int]]]:
+        options = self.tool_options
+        strength = options.strength / 100
+        mask = stamp.mask
+        if not options.falloff.checked:
+            return [(strength, mask)]
+        edge = stamp.edge()
+        core = [bits & ~edge_bits for bits, edge_bits in zip(mask, edge)]
+        return [(strength, core), (strength / 2, edge)]
+
+    def paint(self, layer: Layer, spans: Spans, strength: float) -> None:
+        if strength >= 1:
+            layer.set_spans(spans, None)
+        else:
+            layer.fade_spans(spans, strength)
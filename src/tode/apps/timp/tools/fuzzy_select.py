@@ -0,0 +1,72 @@
+from textual.geometry import Offset
+from textual.reactive import var
+
+from ..image.canvas import Layer
+from ..image.fill import flood_spans
+from ..image.selection import Selection
+from ..image.storage import shift_spans
+from ..utils.number import Number
+from .bucket_fill import ContiguousOption, MatchModeOption
+from .pencil import FormLine
+from .select import SelectModeOption
+from .tool import Tool, ToolOptions
+
+
+class ThresholdOption(FormLine):
+    label = "threshold: "
+
+    def __init__(self, threshold: int = 15):
+        super().__init__()
+        # per channel, out of 255
+        self.value = Number(threshold, 0, 255, step=5)
+
+
+class FuzzySelectToolOptions(ToolOptions):
+    title = "Fuzzy Select"
+
+    threshold = var(15)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.mode = SelectModeOption()
+        self.match_mode = MatchModeOption()
+        self.threshold_line = ThresholdOption()
+        self.contiguous = ContiguousOption()
+
+    def watch_threshold(self, old_value, new_value) -> None:
+        self.threshold_line.value.set(new_value)
+
+    def on_number_changed(self, message) -> None:
+        if message.number is self.threshold_line.value:
+            self.threshold = message.value
+            message.stop()
+
+    def compose(self):
+        yield self.mode
+        yield self.match_mode
+        yield self.threshold_line
+        yield self.contiguous
+
+
+class FuzzySelect(Tool):
+    symbol = "󰁨"
+    tool_options = FuzzySelectToolOptions()
+
+    def apply_to_image(self, image, layer: Layer, pos: Offset) -> None:
+        if layer is None:
+            return
+        options = self.tool_options
+        local = pos - layer.offset
+        if not layer.storage.size.contains_point(local):
+            return
+        spans = flood_spans(
+            layer.storage,
+            local.x,
+            local.y,
+            match=options.match_mode.value.value,
+            tolerance=options.threshold,
+            contiguous=options.contiguous.checked
+        )
+        spans = shift_spans(spans, layer.offset, image.image_size)
+        selection = Selection.from_spans(image.image_size, spans)
+        image.select(selection, options.mode.value.value)
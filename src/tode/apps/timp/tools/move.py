@@ -0,0 +1,31 @@
+from textual.geometry import Offset
+
+from ..image.canvas import Layer
+from .tool import Tool, ToolOptions
+
+
+class MoveToolOptions(ToolOptions):
+    title = "Move"
+
+
+class MoveTool(Tool):
+    """Drags the active layer around by changing its offset."""
+
+    symbol = ""
+    tool_options = MoveToolOptions()
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # position and layer offset where the stroke started
+        self._start = None
+
+    def apply_to_image(self, image, layer: Layer, pos: Offset) -> None:
+        if layer is None:
+            return
+        if self._start is None:
+            self._start = (pos, layer.offset)
+        start, offset = self._start
+        layer.move_to(offset + pos - start)
+
+    def end_stroke(self, image, pos: Offset) -> None:
+        self._start = None
@@ -4,12 +4,20 @@ from textual.widget import Widget
 from textual.widgets import Static
 
 from ..utils.checkbox import Checkbox
+from ..utils.choice import Choice
+from ..utils.number import Number
 
 from ..image.canvas import Layer
 from ..image.pixel import Pixel
+from ..image.selection import Selection, bit_spans, line_points
+from ..image.stamp import MAX_SIZE, SHAPES, Stamp, shape_stamp
+from ..image.storage import Spans
 from .tool import Tool, ToolOptions
 
 
+MAX_SPACING = 50
+
+
 class FormLine(Widget):
     DEFAULT_CSS = """
     FormLine {
@@ -43,16 +51,16 @@ class BrushLine(FormLine):
     value = Static(" ")
 
 
-class PaintBackgroundOption(FormLine):
-    DEFAULT_CSS = """
-
-    """
+class CheckboxOption(FormLine):
+    """A line with a checkbox, checked at first if `default` is True."""
 
     checked = var(False)
-    label = "background: "
+    default = False
 
-    def __init__(self, checked: bool = False):
+    def __init__(self, checked: bool | None = None):
         super().__init__()
+        if checked is None:
+            checked = self.default
         self.value = Checkbox(checked=checked)
         self.checked = checked
 
@@ -64,22 +72,89 @@ class PaintBackgroundOption(FormLine):
         message.stop()
 
 
+class PaintBackgroundOption(CheckboxOption):
+    label = "background: "
+
+
+class ShapeOption(FormLine):
+    label = "shape: "
+
+    def __init__(self, shape: str = "square"):
+        super().__init__()
+        self.value = Choice(SHAPES, shape)
+
+
+class SizeOption(FormLine):
+    label = "size: "
+
+    def __init__(self, size: int = 1):
+        super().__init__()
+        self.value = Number(size, 1, MAX_SIZE)
+
+
+class SpacingOption(FormLine):
+    label = "spacing: "
+
+    def __init__(self, spacing: int = 1):
+        super().__init__()
+        self.value = Number(spacing, 1, MAX_SPACING)
+
+
 class PencilToolOptions(ToolOptions):
     title = "Pencil"
 
     brush = var(" ")
+    brush_size = var(1)
+    # cells travelled along a stroke between two stamps
+    spacing = var(1)
 
     def __init__(self, brush: str | None = " ") -> None:
         super().__init__()
         self.brush_line = BrushLine()
+        self.shape = ShapeOption()
+        self.size_line = SizeOption()
+        self.spacing_line = SpacingOption()
         self.paint_background = PaintBackgroundOption()
+        # used by the custom shape
+        self.custom: Stamp | None = None
         self.brush = brush
 
     def watch_brush(self, old_value, new_value) -> None:
         self.brush_line.value.update(new_value)
 
+    def watch_brush_size(self, old_value, new_value) -> None:
+        self.size_line.value.set(new_value)
+
+    def watch_spacing(self, old_value, new_value) -> None:
+        self.spacing_line.value.set(new_value)
+
+    def on_number_changed(self, message) -> None:
+        if message.number is self.size_line.value:
+            self.brush_size = int(message.value)
+            message.stop()
+        elif message.number is self.spacing_line.value:
+            self.spacing = int(message.value)
+            message.stop()
+
+    def use_stamp(self, stamp: Stamp) -> None:
+        """Paints with `stamp` through the custom shape."""
+        self.custom = stamp
+        self.shape.value.set("custom")
+
+    @property
+    def stamp(self) -> Stamp:
+        shape = self.shape.value.value
+        if shape == "custom":
+            if self.custom is not None:
+                return self.custom
+            shape = "square"
+        return shape_stamp(shape, self.brush_size)
+
     def compose(self):
         yield self.brush_line
+        yield self.shape
+        yield self.size_line
+        yield self.spacing_line
         yield self.paint_background
 
 
@@ -88,14 +163,101 @@ class Pencil(Tool):
     tool_options = PencilToolOptions()
     brush = var(Pixel.BLANK)
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # row bitsets of the cells stamped so far in the current stroke,
+        # for each group of the stamp
+        self._painted: dict[int, dict[int, int]] = dict()
+        # cells travelled since the last stamp
+        self._travel = 0
+
     def watch_brush(self, old_value, new_value) -> None:
         self.tool_options.brush = new_value
 
-    def apply_to_layer(self, layer: Layer, pos: Offset) -> None:
-        char = self.brush
+    def pixel(self, char: str | None = None) -> Pixel:
         fg = self.color_area.fg
         bg = self.color_area.bg
         if not self.tool_options.paint_background.value.checked:
             bg = None
-        pixel = Pixel(char=char, fg=fg, bg=bg)
-        layer.apply(pos, pixel)
+        return Pixel(char=char or self.brush, fg=fg, bg=bg)
+
+    def apply_to_layer(
+        self,
+        layer: Layer,
+        pos: Offset,
+        selection: Selection | None = None
+    ) -> None:
+        # a click starts a new stroke
+        self._painted = dict()
+        self._travel = 0
+        self.stamp(layer, [(pos.x, pos.y)], selection)
+
+    def end_stroke(self, image, pos: Offset) -> None:
+        self._painted = dict()
+        self._travel = 0
+
+    def drag_image(
+        self,
+        image,
+        layer: Layer,
+        start: Offset,
+        end: Offset
+    ) -> None:
+        if layer is not None:
+            self.apply_line(layer, start, end, image.selection)
+
+    def apply_line(
+        self,
+        layer: Layer,
+        start: Offset,
+        end: Offset,
+        selection: Selection | None = None
+    ) -> None:
+        """Stamps the line from `start` to `end` in a single batch.
+
+        `start` is left out, it was painted by the previous segment.
+        """
+        spacing = max(self.tool_options.spacing, 1)
+        points = []
+        for point in line_points(start.x, start.y, end.x, end.y)[1:]:
+            self._travel += 1
+            if self._travel >= spacing:
+                self._travel = 0
+                points.append(point)
+        if points:
+            self.stamp(layer, points, selection)
+
+    def stamp(
+        self,
+        layer: Layer,
+        points: list[tuple[int, int]],
+        selection: Selection | None = None
+    ) -> None:
+        """Paints the brush stamp centered on every point.
+
+        Cells a group already stamped during the stroke are skipped, so
+        overlapping stamps write each cell once.
+        """
+        stamp = self.tool_options.stamp
+        width, height = layer.storage.size
+        for group, (key, rows) in enumerate(self.stamp_groups(stamp)):
+            painted = self._painted.setdefault(group, dict())
+            placed = stamp.place(rows, points, width, height)
+            spans = dict()
+            for y, bits in placed.items():
+                done = painted.get(y, 0)
+                painted[y] = done | bits
+                bits &= ~done
+                if selection is not None:
+                    bits &= selection.row(y)
+                if bits:
+                    spans[y] = bit_spans(bits)
+            if spans:
+                self.paint(layer, spans, key)
+
+    def stamp_groups(self, stamp: Stamp) -> list[tuple[object, list[int]]]:
+        """Parts of the stamp painted separately, and what paint gets."""
+        return stamp.groups
+
+    def paint(self, layer: Layer, spans: Spans, glyph: str | None) -> None:
+        layer.apply_spans(spans, self.pixel(glyph))
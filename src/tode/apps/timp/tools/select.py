@@ -0,0 +1,111 @@
+from textual.geometry import Offset, Region
+
+from ..utils.choice import Choice
+
+from ..image.canvas import Layer
+from ..image.selection import MODES, Selection, combine
+from .pencil import FormLine
+from .tool import Tool, ToolOptions
+
+
+class SelectModeOption(FormLine):
+    label = "mode: "
+
+    def __init__(self, mode: str = "replace"):
+        super().__init__()
+        self.value = Choice(MODES, mode)
+
+
+class SelectToolOptions(ToolOptions):
+
+    def __init__(self, title: str) -> None:
+        super().__init__()
+        self.title = title
+        self.mode = SelectModeOption()
+
+    def compose(self):
+        yield self.mode
+
+
+class DragSelect(Tool):
+    """Selection tools that shape a selection while the mouse is dragged.
+
+    The selection shown while dragging is always rebuilt from the one the
+    stroke started with, so modes other than replace do not accumulate.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._image = None
+        self._base = None
+
+    def _begin(self, image) -> bool:
+        """Starts a stroke unless one is going on, True if it just did."""
+        if self._image is image:
+            return False
+        self._image = image
+        self._base = image.selection
+        return True
+
+    def _select(self, image, shape: Selection) -> None:
+        selection = combine(
+            self._base,
+            shape,
+            self.tool_options.mode.value.value,
+            image.image_size
+        )
+        image.select(selection)
+
+    def end_stroke(self, image, pos: Offset) -> None:
+        self._image = None
+        self._base = None
+
+
+class RectangleSelect(DragSelect):
+    symbol = "󰒆"
+    tool_options = SelectToolOptions("Rectangle Select")
+
+    def apply_to_image(self, image, layer: Layer, pos: Offset) -> None:
+        if self._begin(image):
+            self._anchor = pos
+        anchor = self._anchor
+        region = Region.from_corners(
+            min(anchor.x, pos.x),
+            min(anchor.y, pos.y),
+            max(anchor.x, pos.x) + 1,
+            max(anchor.y, pos.y) + 1
+        )
+        self._select(image, Selection.from_region(image.image_size, region))
+
+
+class FreeSelect(DragSelect):
+    """Selects the inside of a freehand outline.
+
+    Only the path is drawn while dragging, each segment added to it as it
+    comes; the outline is closed back to its first point and filled once
+    the mouse is released.
+    """
+    symbol = "󰴲"
+    tool_options = SelectToolOptions("Free Select")
+
+    def apply_to_image(self, image, layer: Layer, pos: Offset) -> None:
+        if self._begin(image):
+            self._points = [pos]
+            self._path = Selection(image.image_size)
+            if self.tool_options.mode.value.value != "replace":
+                if self._base is not None:
+                    self._path = self._base.copy()
+        elif self._points[-1] == pos:
+            return
+        else:
+            self._path.add_line(self._points[-1], pos)
+            self._points.append(pos)
+        self._path.add_line(pos, pos)
+        image.select(self._path)
+
+    def end_stroke(self, image, pos: Offset) -> None:
+        if self._image is image:
+            self._select(
+                image, Selection.from_polygon(image.image_size, self._points)
+            )
+        super().end_stroke(image, pos)
@@ -0,0 +1,96 @@
+from textual.geometry import Offset
+from textual.reactive import var
+
+from ..utils.number import Number
+
+from ..image import smudge
+from ..image.canvas import Layer
+from ..image.selection import Selection
+from .pencil import FormLine, Pencil, PencilToolOptions
+
+
+class RateOption(FormLine):
+    label = "rate: "
+
+    def __init__(self, rate: int = 50):
+        super().__init__()
+        self.value = Number(rate, 0, 100, step=10, suffix="%")
+
+
+class SmudgeToolOptions(PencilToolOptions):
+    title = "Smudge"
+
+    # percent of the carried colors kept at each dab
+    rate = var(50)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.rate_line = RateOption()
+
+    def watch_rate(self, old_value, new_value) -> None:
+        self.rate_line.value.set(new_value)
+
+    def on_number_changed(self, message) -> None:
+        if message.number is self.rate_line.value:
+            self.rate = int(message.value)
+            message.stop()
+
+    def compose(self):
+        yield self.shape
+        yield self.size_line
+        yield self.spacing_line
+        yield self.rate_line
+
+
+class Smudge(Pencil):
+    """Drags the colors under the brush along the stroke.
+
+    Needs numpy, without it the tool is disabled.
+    """
+
+    symbol = "󰆽"
+    tool_options = SmudgeToolOptions()
+
+    def __init__(self, *args, **kwargs) -> None:
+        if not smudge.enabled:
+            kwargs["disabled"] = True
+        super().__init__(*args, **kwargs)
+        if not smudge.enabled:
+            self.tooltip = "Smudge needs numpy"
+        self._buffer: smudge.SmudgeBuffer | None = None
+
+    def apply_to_layer(
+        self,
+        layer: Layer,
+        pos: Offset,
+        selection: Selection | None = None
+    ) -> None:
+        if not smudge.enabled:
+            return
+        options = self.tool_options
+        self._buffer = smudge.SmudgeBuffer(options.stamp, options.rate / 100)
+        super().apply_to_layer(layer, pos, selection)
+
+    def apply_line(
+        self,
+        layer: Layer,
+        start: Offset,
+        end: Offset,
+        selection: Selection | None = None
+    ) -> None:
+        if self._buffer is not None:
+            super().apply_line(layer, start, end, selection)
+
+    def end_stroke(self, image, pos: Offset) -> None:
+        super().end_stroke(image, pos)
+        self._buffer = None
+
+    def stamp(
+        self,
+        layer: Layer,
+        points: list[tuple[int, int]],
+        selection: Selection | None = None
+    ) -> None:
+        # every dab mixes what the previous ones left, so they run in order
+        for x, y in points:
+            self._buffer.dab(layer, x, y, selection)
@@ -4,6 +4,7 @@ from textual.widget import Widget
 
 from .color_area import ColorArea
 from ..image.canvas import Layer
+from ..image.selection import Selection
 
 from ..utils.button import Button
 
@@ -53,5 +54,30 @@ class Tool(Button):
     def on_click(self, event):
         self.post_message(ToolSelected(self))
 
-    def apply_to_layer(self, layer: Layer, pos: Offset) -> None:
+    def apply_to_image(self, image, layer: Layer, pos: Offset) -> None:
+        self.apply_to_layer(layer, pos, image.selection)
+
+    def ctrl_click(self, image, layer: Layer, pos: Offset) -> None:
+        """Ctrl+click on the canvas, for tools with a second action."""
+        self.apply_to_image(image, layer, pos)
+
+    def drag_image(
+        self,
+        image,
+        layer: Layer,
+        start: Offset,
+        end: Offset
+    ) -> None:
+        """The mouse was dragged from `start` to `end` during a stroke."""
+        self.apply_to_image(image, layer, end)
+
+    def end_stroke(self, image, pos: Offset) -> None:
+        pass
+
+    def apply_to_layer(
+        self,
+        layer: Layer,
+        pos: Offset,
+        selection: Selection | None = None
+    ) -> None:
         pass
@@ -0,0 +1,34 @@
+from textual.message import Message
+from textual.widgets import Static
+
+
+class Choice(Static):
+    """Shows one of a few values, clicking moves to the next one."""
+
+    DEFAULT_CSS = """
+      Choice:hover {
+        background: #0078d7;
+      }
+    """
+
+    class Changed(Message):
+
+        def __init__(self, value):
+            self.value = value
+            super().__init__()
+
+    def __init__(self, options: tuple[str, ...], value: str | None = None):
+        super().__init__(value or options[0])
+        self.options = options
+        self.value = value or options[0]
+
+    def set(self, value: str) -> None:
+        """Shows `value` without posting Changed."""
+        self.value = value
+        self.update(value)
+
+    def on_click(self, event):
+        i = self.options.index(self.value)
+        self.value = self.options[(i + 1) % len(self.options)]
+        self.update(self.value)
+        self.post_message(Choice.Changed(self.value))
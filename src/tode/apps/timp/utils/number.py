@@ -0,0 +1,68 @@
+from textual.message import Message
+from textual.widgets import Static
+
+
+class Number(Static, can_focus=True):
+    """Shows a number between two bounds.
+
+    Clicking, scrolling or +/- (up/down) while focused steps it, a right
+    click steps it down.
+    """
+
+    DEFAULT_CSS = """
+      Number:hover, Number:focus {
+        background: #0078d7;
+      }
+    """
+
+    BINDINGS = [
+        ("plus,up", "step(1)", "Increase"),
+        ("minus,down", "step(-1)", "Decrease"),
+    ]
+
+    class Changed(Message):
+
+        def __init__(self, number, value):
+            self.number = number
+            self.value = value
+            super().__init__()
+
+    def __init__(
+        self,
+        value: float,
+        minimum: float,
+        maximum: float,
+        step: float = 1,
+        suffix: str = ""
+    ):
+        super().__init__()
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.suffix = suffix
+        self.value = value
+        self.set(value)
+
+    def set(self, value: float) -> None:
+        """Shows `value`, clamped to the bounds, without posting Changed."""
+        # steps of 0.1 would otherwise drift
+        value = round(min(max(value, self.minimum), self.maximum), 6)
+        self.value = value
+        self.update(f"{value:g}{self.suffix}")
+
+    def action_step(self, direction: int) -> None:
+        old = self.value
+        self.set(self.value + direction * self.step)
+        if self.value != old:
+            self.post_message(Number.Changed(self, self.value))
+
+    def on_click(self, event):
+        self.action_step(-1 if event.button == 3 else 1)
+
+    def on_mouse_scroll_up(self, event):
+        event.stop()
+        self.action_step(1)
+
+    def on_mouse_scroll_down(self, event):
+        event.stop()
+        self.action_step(-1)
@@ -0,0 +1,110 @@
+import io
+
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image import Image, ansi
+from apps.timp.image.pixel import Pixel
+
+
+def _read(text, **kwargs):
+    return ansi.read_layer(io.StringIO(text), "layer", **kwargs)
+
+
+def _chars(layer, y=0):
+    return "".join(
+        pixel.char if pixel is not None else "."
+        for pixel in layer.get_line(y) or [None] * layer.storage.size.width
+    )
+
+
+def test_plain_text():
+    layer = _read("ab\ncde\n")
+    assert layer.storage.size == Size(3, 2)
+    assert _chars(layer, 0) == "ab."
+    assert _chars(layer, 1) == "cde"
+
+
+def test_unusual_parameters_are_tolerated():
+    layer = _read("\x1b[?7ha\x1b[1;2Cb\x1b[;mc\x1b[?25l\x1b[31;?mz\n")
+    assert _chars(layer) == "a.bcz"
+
+
+def test_tabs_move_to_the_next_stop():
+    layer = _read("a\tb\n")
+    assert _chars(layer) == "a" + "." * 7 + "b"
+
+
+def test_long_lines_wrap():
+    layer = _read("x" * 100 + "\n")
+    assert layer.storage.size == Size(80, 2)
+    assert _chars(layer, 1) == "x" * 20 + "." * 60
+    assert _read("x" * 100 + "\n", wrap=None).storage.size == Size(100, 1)
+
+
+def test_bold_brightens_whatever_the_order():
+    bright_red = ansi.ansi_color(9)
+    for codes in ("1;31", "31;1"):
+        layer = _read(f"\x1b[{codes}mx\n")
+        assert layer.get_line(0)[0].fg == bright_red
+    layer = _read("\x1b[31mx\x1b[1my\x1b[22mz\n")
+    line = layer.get_line(0)
+    assert [pixel.fg for pixel in line] == [
+        ansi.ansi_color(1), bright_red, ansi.ansi_color(1)
+    ]
+
+
+def test_stops_at_end_of_file_marker():
+    layer = _read("ab\n\x1aSAUCE00 garbage\n")
+    assert layer.storage.size == Size(2, 1)
+
+
+def test_falls_back_to_cp437(tmp_path):
+    path = tmp_path / "art.ans"
+    path.write_bytes(b"\xb0\xdb\x1b[0m\n\x1aSAUCE\xff")
+    with ansi.open_text(str(path)) as f:
+        layer = ansi.read_layer(f, "layer")
+    assert _chars(layer) == "░█"
+
+
+def test_utf8_is_kept(tmp_path):
+    path = tmp_path / "art.ans"
+    path.write_bytes("█é\n".encode("utf-8"))
+    with ansi.open_text(str(path)) as f:
+        assert f.read() == "█é\n"
+
+
+def test_prefix_may_cut_a_character(tmp_path, monkeypatch):
+    monkeypatch.setattr(ansi, "PREFIX_SIZE", 4)
+    path = tmp_path / "art.ans"
+    path.write_bytes("ab█é\n".encode("utf-8"))
+    with ansi.open_text(str(path)) as f:
+        assert f.read() == "ab█é\n"
+
+
+def test_written_lines_read_back():
+    red = Color(255, 0, 0)
+    line = [Pixel("a", fg=red), None, Pixel(" ", bg=red)]
+    layer = _read(ansi.ansi_line(line) + "\n")
+    read = layer.get_line(0)
+    assert read[:2] == line[:2]
+    # the foreground of a blank is not written
+    assert (read[2].char, read[2].bg) == (" ", red)
+
+
+def test_wide_export_round_trip(tmp_path):
+    path = str(tmp_path / "wide.ans")
+    size = Size(100, 2)
+    image = Image("image", size)
+    image.post_message = lambda message: None
+    image.create_layer("layer", size)
+    layer = image.active_layer
+    red = Color(255, 0, 0)
+    for x in (0, 85, 95):
+        layer.set(Offset(x, 1), Pixel("x", fg=red))
+    image.export_ansi(path)
+    assert ansi.sauce_width(path) == 100
+    read = Image.from_ansi(path).active_layer
+    assert read.storage.size == size
+    assert read.get_line(0) is None
+    assert read.get_line(1) == layer.get_line(1)
@@ -0,0 +1,55 @@
+from textual.color import Color
+from textual.geometry import Offset, Region, Size
+
+from apps.timp.image import Image
+from apps.timp.image.clipboard import glyphs
+from apps.timp.image.pixel import Pixel
+from apps.timp.image.selection import Selection
+
+
+SIZE = Size(20, 10)
+RED = Color(255, 0, 0)
+
+
+def _image():
+    image = Image("image", SIZE)
+    image.post_message = lambda message: None
+    image.create_layer("layer", SIZE)
+    layer = image.active_layer
+    for x in range(SIZE.width):
+        layer.set(Offset(x, 2), Pixel("x", fg=RED))
+    return image, layer
+
+
+def test_cut_and_paste_a_selection():
+    image, layer = _image()
+    image.select(Selection.from_region(SIZE, Region(3, 1, 4, 3)))
+    clip = image.cut()
+    assert clip.region == Region(3, 1, 4, 3)
+    assert layer.get(Offset(4, 2)) is None
+    assert layer.get(Offset(8, 2)) == Pixel("x", fg=RED)
+    pasted = image.paste(clip)
+    assert image.active_layer is pasted
+    assert pasted.get(Offset(4, 2)) == Pixel("x", fg=RED)
+    assert pasted.get(Offset(8, 2)) is None
+    # writing to the paste leaves the clipboard as it was
+    pasted.set(Offset(4, 2), None)
+    assert image.paste(clip).get(Offset(4, 2)) == Pixel("x", fg=RED)
+
+
+def test_copy_follows_the_layer_offset():
+    image, layer = _image()
+    layer.move_to(Offset(2, 1))
+    image.select(Selection.from_region(SIZE, Region(0, 3, 5, 1)))
+    pasted = image.paste(image.copy())
+    assert pasted.offset == Offset(2, 1)
+    assert [pasted.get(Offset(x, 3)) is not None for x in range(7)] == [
+        False, False, True, True, True, False, False
+    ]
+
+
+def test_clipboard_glyphs():
+    image, layer = _image()
+    layer.set(Offset(4, 3), Pixel("y", fg=RED))
+    image.select(Selection.from_region(SIZE, Region(3, 2, 3, 2)))
+    assert glyphs(image.copy()) == [["x", "x", "x"], [None, "y", None]]
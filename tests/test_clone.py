@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image import Image
+from apps.timp.image.pixel import Pixel
+from apps.timp.image.sample import RowRing
+from apps.timp.tools.clone import Clone
+
+
+SIZE = Size(20, 6)
+RED = Color(255, 0, 0)
+
+
+def test_row_ring_fetches_each_row_once():
+    fetched = []
+
+    def fetch(y):
+        fetched.append(y)
+        return [y]
+
+    ring = RowRing(fetch, 10, size=2)
+    assert [ring(0), ring(1), ring(0)] == [[0], [1], [0]]
+    assert ring(-1) is None and ring(10) is None
+    assert fetched == [0, 1]
+    # the oldest row makes room for the next one
+    ring(2)
+    ring(0)
+    assert fetched == [0, 1, 2, 0]
+    ring(2)
+    assert fetched == [0, 1, 2, 0]
+
+
+def _image():
+    image = Image("image", SIZE)
+    image.post_message = lambda message: None
+    image.create_layer("bottom", SIZE)
+    image.create_layer("top", SIZE)
+    for x in range(4):
+        image.get_layer("bottom").set(Offset(x, 1), Pixel("b", fg=RED))
+    image.get_layer("top").set(Offset(1, 1), Pixel("t", fg=RED))
+    return image
+
+
+def _clone(merged):
+    clone = Clone(color_area=SimpleNamespace(fg=RED, bg=None))
+    clone.tool_options.sample_merged.checked = merged
+    return clone
+
+
+def _stroke(clone, image, layer):
+    clone.apply_to_image(image, layer, Offset(10, 4))
+    clone.drag_image(image, layer, Offset(10, 4), Offset(13, 4))
+    clone.end_stroke(image, Offset(13, 4))
+
+
+def _chars(layer):
+    return [
+        None if pixel is None else pixel.char
+        for pixel in layer.get_line(4)[10:14]
+    ]
+
+
+def test_clone_from_the_active_layer():
+    image = _image()
+    top = image.get_layer("top")
+    clone = _clone(False)
+    clone.ctrl_click(image, image.get_layer("bottom"), Offset(0, 1))
+    _stroke(clone, image, top)
+    assert _chars(top) == ["b"] * 4
+
+
+def test_clone_sample_merged():
+    image = _image()
+    top = image.get_layer("top")
+    clone = _clone(True)
+    clone.ctrl_click(image, None, Offset(0, 1))
+    _stroke(clone, image, top)
+    assert _chars(top) == ["b", "t", "b", "b"]
+    image.set_layer_visible("top", False)
+    clone.apply_to_image(image, image.get_layer("bottom"), Offset(11, 4))
+    clone.end_stroke(image, Offset(11, 4))
+    assert image.get_layer("bottom").get(Offset(11, 4)).char == "b"
+    clone.tool_options.sample_merged.checked = False
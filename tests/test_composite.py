@@ -0,0 +1,66 @@
+import random
+
+import pytest
+from textual.color import Color
+
+from apps.timp.image import composite
+from apps.timp.image.canvas import pixel_compute
+from apps.timp.image.pixel import Pixel
+from apps.timp.image.storage import pack_pixel, unpack_pixel
+
+pytest.importorskip("numpy")
+
+
+def _color(rng):
+    if rng.random() < 0.3:
+        return None
+    alpha = rng.choice([0, 64, 128, 255])
+    return Color(
+        rng.randrange(256), rng.randrange(256), rng.randrange(256),
+        alpha / 255
+    )
+
+
+def _line(rng, width, holes=0.2):
+    line = []
+    for _ in range(width):
+        if rng.random() < holes:
+            line.append(None)
+            continue
+        pixel = Pixel(rng.choice([" ", "a", "b"]), _color(rng), _color(rng))
+        # the planes keep colors packed, compare against packed pixels
+        line.append(unpack_pixel(pack_pixel(pixel)))
+    return line
+
+
+def _key(pixel):
+    if pixel is None:
+        return None
+    return (pixel.char, _color_key(pixel.fg), _color_key(pixel.bg))
+
+
+def _color_key(color):
+    if color is None:
+        return None
+    return (color.rgb, round(color.a, 2))
+
+
+def test_blend_matches_pixel_mul():
+    rng = random.Random(1)
+    for _ in range(20):
+        below = _line(rng, 64, holes=0)
+        above = _line(rng, 64)
+        planes = composite.blend(
+            composite.pixel_planes(below), composite.pixel_planes(above)
+        )
+        expected = [pixel_compute(b, a) for b, a in zip(below, above)]
+        assert [_key(p) for p in composite.to_pixels(planes)] == [
+            _key(p) for p in expected
+        ]
+
+
+def test_composite_stack_skips_empty_rows():
+    line = [Pixel("a", fg=Color(1, 2, 3))] * 4
+    planes = composite.pixel_planes(line)
+    assert composite.composite_stack([None, planes, None]) is planes
+    assert composite.composite_stack([None, None]) is None
@@ -0,0 +1,39 @@
+from apps.timp.image.dirty import DirtyRows
+
+
+def test_starts_dirty():
+    rows = DirtyRows(3, 10)
+    assert all(y in rows for y in range(3))
+    assert rows.span(0) is None
+    assert 0 not in DirtyRows(3, 10, dirty=False)
+
+
+def test_spans_coalesce():
+    rows = DirtyRows(3, 10, dirty=False)
+    rows.mark(1, 2, 4)
+    rows.mark(1, 6, 7)
+    assert 1 in rows
+    assert rows.span(1) == (2, 7)
+    assert 0 not in rows
+
+
+def test_full_span_marks_the_row():
+    rows = DirtyRows(2, 10, dirty=False)
+    rows.mark(0, 0, 10)
+    assert 0 in rows
+    assert rows.span(0) is None
+
+
+def test_whole_row_absorbs_spans():
+    rows = DirtyRows(2, 10, dirty=False)
+    rows.mark_row(1)
+    rows.mark(1, 2, 3)
+    assert rows.span(1) is None
+
+
+def test_clear_and_mark_all():
+    rows = DirtyRows(2, 10)
+    rows.clear(0)
+    assert 0 not in rows and 1 in rows
+    rows.mark_all()
+    assert 0 in rows
@@ -0,0 +1,137 @@
+import math
+
+import pytest
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image import document
+from apps.timp.image.document import DocumentError, MappedTile
+from apps.timp.image.layer import Layer
+from apps.timp.image.pixel import Pixel
+
+
+SIZE = Size(40, 10)
+RED = Color(255, 0, 0)
+
+
+def _layers():
+    bottom = Layer.fill_with("bottom", SIZE, RED)
+    top = Layer("top", SIZE, visible=False, offset=Offset(3, 1))
+    for layer in (bottom, top):
+        layer.post_message = lambda message: None
+    top.set(Offset(5, 2), Pixel("é", fg=RED))
+    top.set(Offset(30, 8), Pixel("👍🏽"))
+    return [bottom, top]
+
+
+def _cells(layer):
+    return [layer.storage.get(x, y) for y in range(SIZE.height)
+            for x in range(SIZE.width)]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "image.timp")
+    layers = _layers()
+    document.write_layers(path, SIZE, layers, 1)
+    size, read, active = document.read_layers(path)
+    assert size == SIZE
+    assert active == 1
+    assert [layer.name for layer in read] == ["bottom", "top"]
+    assert read[1].offset == Offset(3, 1)
+    assert not read[1].visible
+    for before, after in zip(layers, read):
+        assert _cells(after) == _cells(before)
+
+
+def _write_v1(path, layers):
+    # version 1 has no layer offsets, written by hand from the v1 layout
+    with open(path, "wb") as f:
+        f.write(document._HEADER.pack(
+            document.MAGIC, 1, SIZE.width, SIZE.height, len(layers), 0, 0
+        ))
+        index_offset = f.tell()
+        f.write(document._COUNT.pack(0))
+        for layer in layers:
+            name = layer.name.encode("utf-8")
+            f.write(document._LAYER_V1.pack(
+                len(name), math.nan, document.VISIBLE
+            ))
+            f.write(name)
+            f.write(bytes(layer.storage._row_count))
+            for index in range(len(layer.storage._tiles)):
+                tile = layer.storage.tile(index)
+                if tile is None:
+                    f.write(document._TILE.pack(0, 0, 0, 0, 0, 0))
+                else:
+                    glyph, fg, bg, mask = tile
+                    f.write(document._TILE.pack(
+                        document.UNIFORM_TILE, mask, glyph, fg, bg, 0
+                    ))
+        f.seek(0)
+        f.write(document._HEADER.pack(
+            document.MAGIC, 1, SIZE.width, SIZE.height, len(layers), 0,
+            index_offset
+        ))
+
+
+def test_reads_version_1(tmp_path):
+    path = str(tmp_path / "old.timp")
+    layer = _layers()[0]
+    _write_v1(path, [layer])
+    size, read, active = document.read_layers(path)
+    assert size == SIZE and active == 0
+    assert read[0].offset == Offset(0, 0)
+    assert _cells(read[0]) == _cells(layer)
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.timp"
+    path.write_bytes(b"")
+    with pytest.raises(DocumentError):
+        document.read_layers(str(path))
+
+
+def test_not_a_document(tmp_path):
+    path = tmp_path / "text.timp"
+    path.write_bytes(b"hello world")
+    with pytest.raises(DocumentError):
+        document.read_layers(str(path))
+
+
+@pytest.mark.parametrize("length", [3, 10, 40, 200, 1000, -1])
+def test_truncated_file(tmp_path, length):
+    path = str(tmp_path / "image.timp")
+    document.write_layers(path, SIZE, _layers(), 0)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:length])
+    with pytest.raises(DocumentError):
+        document.read_layers(path)
+
+
+def test_corrupt_index(tmp_path):
+    path = str(tmp_path / "image.timp")
+    document.write_layers(path, SIZE, _layers(), 0)
+    with open(path, "r+b") as f:
+        header = document._HEADER.unpack(f.read(document._HEADER.size))
+        f.seek(0)
+        # the index now points past the end of the file
+        f.write(document._HEADER.pack(*header[:-1], 1 << 40))
+    with pytest.raises(DocumentError):
+        document.read_layers(path)
+
+
+def test_windowed_rows_leave_other_tiles_mapped(tmp_path):
+    path = str(tmp_path / "image.timp")
+    layer = Layer("layer", SIZE)
+    layer.post_message = lambda message: None
+    for x in range(SIZE.width):
+        layer.set(Offset(x, 0), Pixel(chr(ord("a") + x % 26)))
+    document.write_layers(path, SIZE, [layer], 0)
+    _, (read,), _ = document.read_layers(path)
+    row = read.get_row(0, 0, 10)
+    assert bytes(row[0][:3]) == bytes(layer.get_row(0)[0][:3])
+    tiles = read.storage._tiles
+    assert not isinstance(tiles[0], MappedTile)
+    assert all(isinstance(tile, MappedTile) for tile in tiles[1:3])
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image.layer import Layer
+from apps.timp.image.pixel import Pixel
+from apps.timp.image.storage import (
+    BG, EMPTY, FG, fade_cell, pack_color, pack_pixel
+)
+from apps.timp.tools.eraser import Eraser
+
+
+SIZE = Size(10, 5)
+RED = Color(255, 0, 0)
+BLUE = Color(0, 0, 255)
+
+
+def test_fade_cell_scales_alpha():
+    glyph, fg, bg, mask = fade_cell(pack_pixel(Pixel("x", RED, BLUE)), 0.5)
+    assert mask & (FG | BG) == FG | BG
+    assert fg == pack_color(RED) & ~0xFF | 128
+    assert bg == pack_color(BLUE) & ~0xFF | 128
+
+
+def test_fade_cell_clears_spent_cells():
+    assert fade_cell(pack_pixel(Pixel("x", RED)), 0) == EMPTY
+    assert fade_cell(pack_pixel(Pixel("x")), 0.5) == EMPTY
+    assert fade_cell(EMPTY, 0.5) == EMPTY
+
+
+def _eraser(strength, falloff=False, size=1):
+    eraser = Eraser(color_area=SimpleNamespace(fg=RED, bg=None))
+    options = eraser.tool_options
+    options.strength = strength
+    options.falloff.checked = falloff
+    options.brush_size = size
+    return eraser
+
+
+def _layer():
+    layer = Layer.fill_with("layer", SIZE, RED)
+    layer.post_message = lambda message: None
+    return layer
+
+
+def _alpha(layer, x, y):
+    pixel = layer.get(Offset(x, y))
+    return None if pixel is None else round(pixel.bg.a, 2)
+
+
+def test_full_strength_clears():
+    eraser = _eraser(100)
+    layer = _layer()
+    eraser.apply_to_layer(layer, Offset(2, 2))
+    eraser.apply_line(layer, Offset(2, 2), Offset(5, 2))
+    eraser.end_stroke(None, Offset(5, 2))
+    assert [_alpha(layer, x, 2) for x in range(7)] == [
+        1, 1, None, None, None, None, 1
+    ]
+
+
+def test_cells_fade_once_per_stroke():
+    eraser = _eraser(50, size=3)
+    layer = _layer()
+    eraser.apply_to_layer(layer, Offset(2, 2))
+    # the stamps overlap, the cells under both are faded once
+    eraser.apply_line(layer, Offset(2, 2), Offset(3, 2))
+    eraser.end_stroke(None, Offset(3, 2))
+    assert [_alpha(layer, x, 2) for x in range(6)] == [1, 0.5, 0.5, 0.5, 0.5, 1]
+
+
+def test_soft_edge():
+    eraser = _eraser(100, falloff=True, size=3)
+    layer = _layer()
+    eraser.apply_to_layer(layer, Offset(2, 2))
+    eraser.end_stroke(None, Offset(2, 2))
+    assert _alpha(layer, 2, 2) is None
+    assert _alpha(layer, 1, 1) == 0.5 and _alpha(layer, 3, 2) == 0.5
+    eraser.tool_options.falloff.checked = False
+    eraser.tool_options.brush_size = 1
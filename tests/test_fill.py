@@ -0,0 +1,80 @@
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image.fill import flood_spans
+from apps.timp.image.layer import Layer
+from apps.timp.image.pixel import Pixel
+
+
+RED = Color(255, 0, 0)
+DARK_RED = Color(250, 0, 0)
+BLUE = Color(0, 0, 255)
+
+
+def _layer(rows):
+    """A layer drawn from strings, # is a red wall and . a blue floor."""
+    size = Size(len(rows[0]), len(rows))
+    layer = Layer("layer", size)
+    layer.post_message = lambda message: None
+    colors = {"#": RED, "d": DARK_RED, ".": BLUE}
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row):
+            if char in colors:
+                layer.set(Offset(x, y), Pixel(" ", bg=colors[char]))
+    return layer
+
+
+def _cells(spans):
+    return {(x, y) for y, runs in spans.items() for start, end in runs
+            for x in range(start, end)}
+
+
+ROOMS = [
+    "....#...",
+    "..###...",
+    "..#.#...",
+    "..###.#.",
+]
+
+
+def test_fills_the_contiguous_region():
+    layer = _layer(ROOMS)
+    cells = _cells(flood_spans(layer.storage, 0, 0))
+    assert (1, 3) in cells and (3, 0) in cells
+    # the enclosed cell and the right side are not reached
+    assert (3, 2) not in cells and (5, 0) not in cells
+    assert not any(ROOMS[y][x] == "#" for x, y in cells)
+
+
+def test_non_contiguous_takes_every_match():
+    layer = _layer(ROOMS)
+    cells = _cells(flood_spans(layer.storage, 0, 0, contiguous=False))
+    assert (3, 2) in cells
+    assert len(cells) == sum(row.count(".") for row in ROOMS)
+
+
+def test_tolerance():
+    layer = _layer(["#d#."])
+    assert _cells(flood_spans(layer.storage, 0, 0)) == {(0, 0)}
+    cells = _cells(flood_spans(layer.storage, 0, 0, tolerance=5))
+    assert cells == {(0, 0), (1, 0), (2, 0)}
+
+
+def test_empty_cells_fill_together():
+    layer = _layer(["  #  ", "  #  "])
+    cells = _cells(flood_spans(layer.storage, 0, 1))
+    assert cells == {(0, 0), (1, 0), (0, 1), (1, 1)}
+
+
+def test_match_modes():
+    layer = Layer("layer", Size(3, 1))
+    layer.post_message = lambda message: None
+    layer.set(Offset(0, 0), Pixel("a", fg=RED, bg=BLUE))
+    layer.set(Offset(1, 0), Pixel("b", fg=RED))
+    layer.set(Offset(2, 0), Pixel("a", fg=BLUE, bg=BLUE))
+    assert _cells(flood_spans(layer.storage, 0, 0, "fg")) == {(0, 0), (1, 0)}
+    assert _cells(flood_spans(layer.storage, 0, 0, "bg", contiguous=False)) \
+        == {(0, 0), (2, 0)}
+    assert _cells(
+        flood_spans(layer.storage, 0, 0, "glyph", contiguous=False)
+    ) == {(0, 0), (2, 0)}
@@ -0,0 +1,65 @@
+import random
+
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image import Image
+from apps.timp.image.pixel import Pixel
+
+
+SIZE = Size(12, 5)
+
+
+def _color(rng):
+    if rng.random() < 0.3:
+        return None
+    return Color(rng.randrange(256), 0, 0, rng.choice([0.5, 1.0]))
+
+
+def _pixel(rng):
+    return Pixel(rng.choice([" ", "a"]), _color(rng), _color(rng))
+
+
+def _image(compositing):
+    image = Image("image", SIZE, compositing=compositing)
+    image.post_message = lambda message: None
+    for name in ("a", "b", "c", "d"):
+        image.create_layer(name, SIZE)
+    image.active_layer_name = "b"
+    return image
+
+
+def _paint(image, rng, count):
+    for _ in range(count):
+        layer = image.get_layer(rng.choice(image.layer_order))
+        posted = []
+        layer.post_message = posted.append
+        pos = Offset(rng.randrange(SIZE.width), rng.randrange(SIZE.height))
+        layer.set(pos, _pixel(rng))
+        image.on_layer_update(posted[0])
+
+
+def _lines(image):
+    view = image.active_view
+    return [view.get_line(y) for y in range(SIZE.height)]
+
+
+def test_flat_view_matches_the_chain():
+    chain = _image("chain")
+    flat = _image("flat")
+    for seed in range(5):
+        # the same edits on both images
+        _paint(chain, random.Random(seed), 30)
+        _paint(flat, random.Random(seed), 30)
+        assert _lines(flat) == _lines(chain)
+
+
+def test_flat_view_follows_visibility_and_active_layer():
+    chain = _image("chain")
+    flat = _image("flat")
+    _paint(chain, random.Random(7), 60)
+    _paint(flat, random.Random(7), 60)
+    for image in (chain, flat):
+        image.set_layer_visible("c", False)
+        image.active_layer_name = "d"
+    assert _lines(flat) == _lines(chain)
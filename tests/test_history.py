@@ -0,0 +1,129 @@
+from types import SimpleNamespace
+
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image.history import History
+from apps.timp.image.layer import Layer
+from apps.timp.image.pixel import Pixel
+from apps.timp.tools.move import MoveTool
+
+
+SIZE = Size(12, 6)
+RED = Color(255, 0, 0)
+
+
+def _layer(history):
+    layer = Layer("layer", SIZE)
+    layer.post_message = lambda message: None
+    layer.history = history
+    return layer
+
+
+def _cells(layer):
+    return [layer.storage.get(x, y) for y in range(SIZE.height)
+            for x in range(SIZE.width)]
+
+
+def _stroke(history, layer, char, positions):
+    for x, y in positions:
+        layer.set(Offset(x, y), Pixel(char, fg=RED))
+    history.end_stroke()
+    return _cells(layer)
+
+
+def test_undo_and_redo_strokes():
+    history = History()
+    layer = _layer(history)
+    blank = _cells(layer)
+    first = _stroke(history, layer, "a", [(0, 0), (1, 0), (1, 0)])
+    second = _stroke(history, layer, "b", [(1, 0), (5, 3)])
+    assert history.undo()
+    assert _cells(layer) == first
+    assert history.undo()
+    assert _cells(layer) == blank
+    assert not history.undo()
+    assert history.redo()
+    assert history.redo()
+    assert _cells(layer) == second
+    assert not history.redo()
+
+
+def test_a_new_stroke_drops_redo():
+    history = History()
+    layer = _layer(history)
+    _stroke(history, layer, "a", [(0, 0)])
+    history.undo()
+    assert history.can_redo()
+    _stroke(history, layer, "b", [(2, 2)])
+    assert not history.can_redo()
+
+
+def test_unchanged_cells_are_not_recorded():
+    history = History()
+    layer = _layer(history)
+    layer.set(Offset(0, 0), Pixel("a"))
+    layer.set(Offset(0, 0), None)
+    history.end_stroke()
+    assert not history.can_undo()
+
+
+def test_spilled_entries_still_undo():
+    history = History(budget=0)
+    layer = _layer(history)
+    states = [_cells(layer)]
+    for i in range(5):
+        states.append(_stroke(history, layer, str(i), [(i, i % 6), (0, 0)]))
+    # everything but the latest entry went to the spill file
+    assert history.memory == sum(delta.size for delta in history._undo[-1])
+    for state in reversed(states[:-1]):
+        history.undo()
+        assert _cells(layer) == state
+    for state in states[1:]:
+        history.redo()
+        assert _cells(layer) == state
+    history.clear()
+
+
+def test_without_spilling_old_entries_are_dropped():
+    history = History(budget=0, spill=False)
+    layer = _layer(history)
+    for i in range(3):
+        _stroke(history, layer, str(i), [(i, 0)])
+    assert history.undo()
+    assert not history.undo()
+
+
+def test_span_writes_are_undone():
+    history = History()
+    layer = _layer(history)
+    blank = _cells(layer)
+    layer.set_spans({1: [(2, 9)], 4: [(0, 12)]}, Pixel(" ", bg=RED))
+    history.end_stroke()
+    assert _cells(layer) != blank
+    history.undo()
+    assert _cells(layer) == blank
+
+
+def test_moves_are_undone():
+    history = History()
+    layer = _layer(history)
+    painted = _stroke(history, layer, "a", [(1, 1)])
+    tool = MoveTool()
+    image = SimpleNamespace()
+    # one drag is one entry, however many steps it took
+    for pos in (Offset(0, 0), Offset(2, 1), Offset(3, 2)):
+        tool.apply_to_image(image, layer, pos)
+    tool.end_stroke(image, Offset(3, 2))
+    history.end_stroke()
+    assert layer.offset == Offset(3, 2)
+    assert layer.get(Offset(4, 3)) == Pixel("a", fg=RED)
+    assert history.undo()
+    assert layer.offset == Offset(0, 0)
+    assert _cells(layer) == painted
+    assert history.redo()
+    assert layer.offset == Offset(3, 2)
+    assert history.undo() and history.undo()
+    assert layer.offset == Offset(0, 0)
+    assert layer.get(Offset(1, 1)) is None
+    assert not history.can_undo()
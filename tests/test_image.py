@@ -0,0 +1,78 @@
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image import Image
+from apps.timp.image.layer import Layer
+from apps.timp.image.pixel import Pixel
+
+
+SIZE = Size(8, 4)
+
+
+def _image(*names, **kwargs):
+    layers = {name: Layer(name, SIZE) for name in names}
+    image = Image("image", SIZE, layers=layers, **kwargs)
+    image.post_message = lambda message: None
+    return image
+
+
+def test_layers_given_to_the_constructor_are_indexed():
+    image = _image("a", "b", "c", layer_order=["c", "a", "b"])
+    assert image.layer_order == ["c", "a", "b"]
+    assert image._layer_index == {"c": 0, "a": 1, "b": 2}
+    assert image._visible_index == [0, 1, 2]
+    assert image.active_layer_name == "b"
+    assert set(image.views) >= {"a", "b", "c"}
+    assert image.views["a"].base is image.views["c"]
+
+
+def test_layer_accessors():
+    image = _image("a", "b", "c")
+    image.set_layer_visible("b", False)
+    assert [layer.name for layer in image.layers] == ["a", "b", "c"]
+    assert [layer.name for layer in image.visible_layers] == ["a", "c"]
+    assert image.get_layer("b").name == "b" and image.get_layer("d") is None
+    assert image.layer_index("c") == 2 and image.layer_index("d") is None
+
+
+def test_constructor_keeps_the_active_layer():
+    image = _image("a", "b", active_layer_name="a")
+    assert image.active_layer.name == "a"
+
+
+def test_reindex_after_changes():
+    image = _image("a", "b", "c")
+    image.set_layer_visible("b", False)
+    assert image._visible_index == [0, 2]
+    assert image.views["c"].base is image.views["a"]
+    image.move_layer("c", 0)
+    assert image._layer_index == {"c": 0, "a": 1, "b": 2}
+    assert image._visible_index == [0, 1]
+    image.remove_layer("c")
+    assert image._layer_index == {"a": 0, "b": 1}
+    assert image._visible_index == [0]
+
+
+def test_updates_reach_the_views_above():
+    image = Image.new(SIZE, Color(255, 255, 255))
+    image.post_message = lambda message: None
+    image.create_layer("top", SIZE)
+    background = image._layers["Background"]
+    posted = []
+    background.post_message = posted.append
+    background.set(Offset(2, 1), Pixel("x", fg=Color(0, 0, 0)))
+    image.on_layer_update(posted[0])
+    assert image.active_view.get(Offset(2, 1)).char == "x"
+
+
+def test_views_widen_a_windowed_row():
+    image = _image("a", "b")
+    layer = image._layers["a"]
+    posted = []
+    layer.post_message = posted.append
+    for x in range(SIZE.width):
+        layer.set(Offset(x, 0), Pixel(str(x), fg=Color(0, 0, 0)))
+    image.on_layer_update(posted[0])
+    view = image.active_view
+    assert [p.char for p in view.get_line(0, 2, 4)[2:4]] == ["2", "3"]
+    assert [p.char for p in view.get_line(0)] == [str(x) for x in range(8)]
@@ -0,0 +1,121 @@
+import pytest
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image import Image, journal
+from apps.timp.image.pixel import Pixel
+
+
+SIZE = Size(20, 6)
+RED = Color(255, 0, 0)
+
+
+def _image():
+    image = Image("image", SIZE)
+    image.post_message = lambda message: None
+    image.create_layer("Background", SIZE, RED)
+    image.create_layer("ink", SIZE)
+    return image
+
+
+def _state(layers):
+    return [
+        (
+            layer.name, layer.visible, layer.offset,
+            [layer.storage.get(x, y) for y in range(SIZE.height)
+             for x in range(SIZE.width)]
+        )
+        for layer in layers
+    ]
+
+
+def _live(image):
+    return _state(image._layers[name] for name in image.layer_order)
+
+
+@pytest.fixture
+def autosaved(tmp_path):
+    path = str(tmp_path / "image.timp")
+    image = _image()
+    image.autosave(path)
+    yield image, path
+    image.autosave(None)
+
+
+def test_edits_are_replayed(autosaved):
+    image, path = autosaved
+    ink = image._layers["ink"]
+    ink.set(Offset(1, 1), Pixel("a", fg=RED))
+    ink.set(Offset(2, 1), Pixel("👍🏽"))
+    ink.move_to(Offset(3, 2))
+    image.journal.flush()
+    _, layers, _ = journal.recover(path)
+    assert _state(layers) == _live(image)
+
+
+def test_structural_changes_are_journaled(autosaved):
+    image, path = autosaved
+    image.create_layer("top", SIZE, Color(0, 0, 255))
+    top = image._layers["top"]
+    top.set(Offset(0, 0), Pixel("t", fg=RED))
+    image.move_layer("top", 0)
+    image.set_layer_visible("ink", False)
+    image._layers["ink"].set(Offset(5, 5), Pixel("i", fg=RED))
+    image.remove_layer("Background")
+    image.journal.flush()
+    _, layers, _ = journal.recover(path)
+    assert [layer.name for layer in layers] == ["top", "ink"]
+    assert _state(layers) == _live(image)
+
+
+def test_stale_journal_is_skipped(autosaved):
+    image, path = autosaved
+    image.create_layer("top", SIZE)
+    image.journal.flush()
+    with open(journal.journal_path(path), "rb") as f:
+        stale = f.read()
+    image.save(path)
+    # a crash after the snapshot was replaced but before the truncate
+    with open(journal.journal_path(path), "wb") as f:
+        f.write(stale)
+    _, layers, _ = journal.recover(path)
+    assert [layer.name for layer in layers] == ["Background", "ink", "top"]
+
+
+def test_torn_record_is_ignored(autosaved):
+    image, path = autosaved
+    image._layers["ink"].set(Offset(0, 0), Pixel("a", fg=RED))
+    image.journal.flush()
+    with open(journal.journal_path(path), "ab") as f:
+        f.write(bytes([journal.SET, 1, 0]))
+    _, layers, _ = journal.recover(path)
+    assert _state(layers) == _live(image)
+
+
+def test_failed_command_is_raised_and_writer_survives(autosaved):
+    image, path = autosaved
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        image.journal._call(fail)
+    image._layers["ink"].set(Offset(0, 0), Pixel("a", fg=RED))
+    image.journal.flush()
+    _, layers, _ = journal.recover(path)
+    assert _state(layers) == _live(image)
+
+
+def test_compaction_folds_the_journal(tmp_path):
+    path = str(tmp_path / "image.timp")
+    image = _image()
+    image.journal = journal.Journal(image, path, compact_size=64)
+    for layer in image._layers.values():
+        layer.journal = image.journal
+    ink = image._layers["ink"]
+    for x in range(SIZE.width):
+        ink.set(Offset(x, 0), Pixel("x", fg=RED))
+    image.journal.flush()
+    image.autosave(None)
+    _, layers, _ = journal.recover(path)
+    assert _state(layers) == _live(image)
@@ -0,0 +1,89 @@
+from textual.color import Color
+from textual.geometry import Offset, Region, Size
+
+from apps.timp.image.layer import Layer, LayerUpdate
+from apps.timp.image.pixel import Pixel
+from apps.timp.image.storage import pack_pixel, shift_spans
+
+
+RED = Color(255, 0, 0)
+
+
+def _layer(size=Size(10, 5)):
+    layer = Layer("layer", size)
+    posted = []
+    layer.post_message = posted.append
+    return layer, posted
+
+
+def test_writes_share_one_update():
+    layer, posted = _layer()
+    layer.set(Offset(1, 1), Pixel("a"))
+    layer.set(Offset(4, 1), Pixel("b"))
+    layer.set(Offset(2, 3), Pixel("c"))
+    assert len(posted) == 1
+    update = posted[0]
+    assert update.spans == {1: (1, 5), 3: (2, 3)}
+    layer.end_update(update)
+    layer.set(Offset(0, 0), Pixel("d"))
+    assert len(posted) == 2
+
+
+def test_update_regions_merge_rows():
+    update = LayerUpdate(None)
+    for y in (1, 2, 3):
+        update.add(y, 2, 5)
+    update.add(4, 0, 1)
+    assert update.regions == [Region(2, 1, 3, 3), Region(0, 4, 1, 1)]
+    assert update.region == Region(0, 1, 5, 4)
+
+
+def test_apply_spans_is_one_update():
+    layer, posted = _layer()
+    layer.apply_spans({0: [(0, 3)], 2: [(1, 2), (5, 7)]}, Pixel("x", fg=RED))
+    assert len(posted) == 1
+    assert posted[0].spans == {0: (0, 3), 2: (1, 7)}
+    assert layer.get(Offset(6, 2)) == Pixel("x", fg=RED)
+    assert layer.get(Offset(3, 2)) is None
+
+
+def test_offset_layers_read_in_image_coordinates():
+    layer, posted = _layer()
+    layer.set(Offset(1, 1), Pixel("a", fg=RED))
+    layer.end_update(posted[0])
+    layer.move_to(Offset(3, 2))
+    assert layer.get(Offset(4, 3)) == Pixel("a", fg=RED)
+    assert layer.get(Offset(1, 1)) is None
+    assert layer.get_line(3)[4] == Pixel("a", fg=RED)
+    assert layer.get_line(0) is None
+    # writes land in layer coordinates
+    layer.set(Offset(3, 2), Pixel("b", fg=RED))
+    assert layer.storage.get(0, 0) == pack_pixel(Pixel("b", fg=RED))
+
+
+def test_cells_moved_off_the_image_come_back():
+    layer, posted = _layer()
+    layer.set(Offset(9, 4), Pixel("a", fg=RED))
+    layer.move_to(Offset(5, 0))
+    assert layer.get_line(4) == [None] * 10
+    layer.move_to(Offset(0, 0))
+    assert layer.get(Offset(9, 4)) == Pixel("a", fg=RED)
+
+
+def test_move_invalidates_old_and_new_bounds():
+    layer, posted = _layer(Size(40, 10))
+    layer.set(Offset(1, 1), Pixel("a", fg=RED))
+    layer.end_update(posted[0])
+    posted.clear()
+    layer.move_to(Offset(0, 4))
+    rows = set()
+    for update in posted:
+        rows |= set(update.spans) | set(update.lines)
+    assert {1, 5} <= rows and 0 not in rows and 9 not in rows
+
+
+def test_shift_spans():
+    assert shift_spans({0: [(0, 4)], 3: [(8, 12)]}, (2, 1), Size(10, 4)) == {
+        1: [(2, 6)]
+    }
+    assert shift_spans({2: [(0, 4)]}, (-2, -1), Size(10, 4)) == {1: [(0, 2)]}
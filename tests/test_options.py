@@ -0,0 +1,121 @@
+import asyncio
+
+from textual.app import App
+
+from apps.timp.image.stamp import MAX_SIZE
+from apps.timp.tools.bucket_fill import (
+    BucketFillToolOptions, ContiguousOption
+)
+from apps.timp.tools.eraser import EraserToolOptions
+from apps.timp.tools.fuzzy_select import FuzzySelectToolOptions
+from apps.timp.tools.pencil import (
+    MAX_SPACING, PaintBackgroundOption, PencilToolOptions
+)
+from apps.timp.tools.smudge import SmudgeToolOptions
+from apps.timp.utils.number import Number
+
+
+def _run(options, interact):
+    class OptionsApp(App):
+        def compose(self):
+            yield options
+
+    async def main():
+        app = OptionsApp()
+        async with app.run_test() as pilot:
+            await interact(pilot)
+            await pilot.pause()
+
+    asyncio.run(main())
+
+
+def test_number_steps_and_clamps():
+    number = Number(0.5, 0, 1, step=0.1, suffix="%")
+    number.set(2)
+    assert number.value == 1
+    number.set(0.3)
+    assert str(number.render()) == "0.3%"
+
+
+def test_tolerance_is_editable():
+    options = BucketFillToolOptions()
+
+    async def interact(pilot):
+        number = options.tolerance_line.value
+        await pilot.click(Number)
+        number.focus()
+        await pilot.press("plus", "plus", "minus", "up")
+
+    _run(options, interact)
+    assert options.tolerance == 15
+    assert options.tolerance_line.value.value == 15
+
+
+def test_threshold_is_editable():
+    options = FuzzySelectToolOptions()
+
+    async def interact(pilot):
+        options.threshold_line.value.focus()
+        await pilot.press("minus", "down", "down")
+
+    _run(options, interact)
+    assert options.threshold == 0
+
+
+def test_size_and_spacing_are_editable():
+    options = PencilToolOptions()
+
+    async def interact(pilot):
+        options.size_line.value.focus()
+        await pilot.press(*["plus"] * (MAX_SIZE + 2))
+        options.spacing_line.value.focus()
+        await pilot.press("up", "up", "down", "minus", "minus")
+
+    _run(options, interact)
+    assert options.brush_size == MAX_SIZE
+    assert options.spacing == 1
+    assert options.stamp.width == MAX_SIZE
+    options.spacing = MAX_SPACING + 5
+    assert options.spacing_line.value.value == MAX_SPACING
+
+
+def test_strength_is_editable():
+    options = EraserToolOptions()
+
+    async def interact(pilot):
+        options.strength_line.value.focus()
+        await pilot.press("minus", "minus", "down", "up", "plus", "plus")
+        options.size_line.value.focus()
+        await pilot.press("plus")
+
+    _run(options, interact)
+    assert options.strength == 100
+    assert str(options.strength_line.value.render()) == "100%"
+    # the pencil options still handle their own lines
+    assert options.brush_size == 2
+
+
+def test_rate_is_editable():
+    options = SmudgeToolOptions()
+
+    async def interact(pilot):
+        options.rate_line.value.focus()
+        await pilot.press("plus", "plus", "plus", "down")
+
+    _run(options, interact)
+    assert options.rate == 70
+    assert str(options.rate_line.value.render()) == "70%"
+
+
+def test_checkbox_options():
+    assert ContiguousOption().checked
+    assert not ContiguousOption(checked=False).checked
+    assert not PaintBackgroundOption().checked
+    options = BucketFillToolOptions()
+
+    async def interact(pilot):
+        await pilot.click("ContiguousOption Checkbox")
+
+    _run(options, interact)
+    assert not options.contiguous.checked
+    assert options.paint_background.checked
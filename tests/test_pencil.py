@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp.image.layer import Layer
+from apps.timp.image.selection import line_points
+from apps.timp.image.stamp import Stamp
+from apps.timp.tools.pencil import Pencil
+
+
+RED = Color(255, 0, 0)
+SIZE = Size(20, 10)
+
+
+def test_line_points_include_both_ends():
+    assert line_points(2, 3, 2, 3) == [(2, 3)]
+    assert line_points(0, 0, 3, 0) == [(0, 0), (1, 0), (2, 0), (3, 0)]
+    assert line_points(0, 0, 3, 3) == [(i, i) for i in range(4)]
+
+
+def test_line_points_are_connected():
+    for end in [(7, 2), (-5, 9), (3, -8), (-6, -6), (0, 5)]:
+        points = line_points(0, 0, *end)
+        assert points[0] == (0, 0) and points[-1] == end
+        assert len(points) == max(abs(end[0]), abs(end[1])) + 1
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            assert max(abs(x1 - x0), abs(y1 - y0)) == 1
+
+
+def _pencil():
+    pencil = Pencil(color_area=SimpleNamespace(fg=RED, bg=None))
+    pencil.brush = "x"
+    return pencil
+
+
+def _layer():
+    layer = Layer("layer", SIZE)
+    posted = []
+    layer.post_message = posted.append
+    return layer, posted
+
+
+def _painted(layer):
+    return {
+        (x, y) for y in range(SIZE.height) for x in range(SIZE.width)
+        if layer.get(Offset(x, y)) is not None
+    }
+
+
+def test_drag_leaves_no_gaps():
+    pencil = _pencil()
+    layer, posted = _layer()
+    pencil.apply_to_layer(layer, Offset(1, 1))
+    layer.end_update(posted[-1])
+    pencil.apply_line(layer, Offset(1, 1), Offset(15, 6))
+    assert _painted(layer) == set(line_points(1, 1, 15, 6))
+    # the whole segment is one update
+    assert len(posted) == 2
+    pencil.end_stroke(None, Offset(15, 6))
+
+
+def test_custom_stamp_paints_its_glyphs():
+    pencil = _pencil()
+    pencil.tool_options.use_stamp(Stamp.from_text("ab\n c"))
+    layer, posted = _layer()
+    pencil.apply_to_layer(layer, Offset(5, 5))
+    pencil.end_stroke(None, Offset(5, 5))
+    assert pencil.tool_options.shape.value.value == "custom"
+    assert {pos: layer.get(Offset(*pos)).char for pos in _painted(layer)} == {
+        (5, 5): "a", (6, 5): "b", (6, 6): "c"
+    }
+    pencil.tool_options.shape.value.set("square")
+
+
+def test_spacing_skips_cells():
+    pencil = _pencil()
+    pencil.tool_options.spacing = 3
+    layer, posted = _layer()
+    pencil.apply_to_layer(layer, Offset(0, 0))
+    pencil.apply_line(layer, Offset(0, 0), Offset(9, 0))
+    pencil.end_stroke(None, Offset(9, 0))
+    pencil.tool_options.spacing = 1
+    assert _painted(layer) == {(0, 0), (3, 0), (6, 0), (9, 0)}
@@ -0,0 +1,56 @@
+import pytest
+from textual.color import Color
+
+from apps.timp.image.pixel import Pixel
+
+
+RED = Color(255, 0, 0)
+HALF_BLUE = Color(0, 0, 255, 0.5)
+
+
+def test_pixels_are_interned():
+    assert Pixel("a", fg=RED) is Pixel("a", fg=RED)
+    assert Pixel("a", fg=RED) is not Pixel("b", fg=RED)
+
+
+def test_pixels_are_immutable():
+    pixel = Pixel("a")
+    with pytest.raises(AttributeError):
+        pixel.char = "b"
+    assert pixel.clone() is pixel
+
+
+def test_add_overrides_set_fields():
+    below = Pixel("a", fg=RED, bg=RED)
+    assert below + Pixel("b") == Pixel("b", fg=RED, bg=RED)
+    assert below + None is below
+
+
+def test_mul_opaque_background_wins():
+    above = Pixel("b", bg=RED)
+    assert Pixel("a", bg=HALF_BLUE) * above is above
+
+
+def test_mul_blank_keeps_glyph_below():
+    below = Pixel("a", fg=RED, bg=RED)
+    result = below * Pixel(" ", bg=HALF_BLUE)
+    assert result.char == "a"
+    assert result.fg == RED
+    assert result.bg.a == 1
+
+
+def test_mul_is_cached():
+    Pixel.blend_cache.clear()
+    below = Pixel("a", fg=RED, bg=RED)
+    above = Pixel("b", fg=RED, bg=HALF_BLUE)
+    result = below * above
+    assert Pixel.blend_cache.get((below, above)) is result
+    assert below * above is result
+
+
+def test_style_and_segment_are_shared():
+    first = Pixel("a", fg=RED)
+    second = Pixel("b", fg=RED)
+    assert first.style is second.style
+    assert first.segment is first.segment
+    assert first.segment.text == "a"
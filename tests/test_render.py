@@ -0,0 +1,77 @@
+import io
+import os
+
+import pytest
+from textual.color import Color
+from textual.geometry import Offset, Size
+
+from apps.timp import render
+from apps.timp.image import composite
+from apps.timp.image.layer import Layer
+from apps.timp.image.pixel import Pixel
+
+
+def _touch(path, text="ab\n"):
+    path.write_text(text)
+    return str(path)
+
+
+def test_explicit_file_never_overwrites_itself(tmp_path):
+    source = _touch(tmp_path / "x.ans")
+    jobs, errors = render._jobs([source, source], None, "ansi")
+    assert jobs == []
+    assert [error[0] for error in errors] == [source, source]
+    jobs, errors = render._jobs([source], source, "plain")
+    assert jobs == [] and len(errors) == 1
+
+
+def test_colliding_targets_are_errors(tmp_path):
+    a = _touch(tmp_path / "a.ans")
+    other = tmp_path / "other"
+    other.mkdir()
+    b = _touch(other / "a.ans")
+    out = str(tmp_path / "out")
+    jobs, errors = render._jobs([a, b], out, "html")
+    assert jobs == []
+    assert sorted(error[0] for error in errors) == sorted([a, b])
+
+
+def test_directory_skips_its_own_ansi_files(tmp_path):
+    _touch(tmp_path / "a.ans")
+    _touch(tmp_path / "b.ans")
+    jobs, errors = render._jobs([str(tmp_path)], None, "html")
+    assert errors == []
+    assert sorted(os.path.basename(job[1]) for job in jobs) == [
+        "a.html", "b.html"
+    ]
+    jobs, errors = render._jobs([str(tmp_path)], None, "ansi")
+    assert jobs == [] and errors == []
+
+
+def test_main_renders_and_reports(tmp_path, capsys):
+    source = _touch(tmp_path / "x.ans", "hi\n")
+    target = str(tmp_path / "x.txt")
+    assert render.main(["-f", "plain", "-o", target, source]) == 0
+    with open(target) as f:
+        assert f.read() == "hi\n"
+    assert render.main(["-o", source, source]) == 1
+    assert "refusing to overwrite" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_layers_over_empty_rows(monkeypatch, vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(composite, "enabled", vectorized)
+    size = Size(5, 2)
+    bottom = Layer("bottom", size)
+    top = Layer("top", size)
+    for layer in (bottom, top):
+        layer.post_message = lambda message: None
+    bottom.set(Offset(0, 0), Pixel("a", fg=Color(255, 0, 0)))
+    # the bottom layer has nothing on the second row
+    top.set(Offset(1, 1), Pixel("b", fg=Color(0, 0, 255)))
+    top.set(Offset(2, 0), Pixel("c", fg=Color(0, 0, 255)))
+    out = io.StringIO()
+    render.render(size, [bottom, top], "plain", out)
+    assert out.getvalue() == "a c\n b\n"
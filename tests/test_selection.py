@@ -0,0 +1,125 @@
+from rich.segment import Segment
+from textual.color import Color
+from textual.geometry import Offset, Region, Size
+from textual.strip import Strip
+
+from apps.timp.image import Image
+from apps.timp.image.canvas import OUTLINE_STYLE, outline_strip
+from apps.timp.image.pixel import Pixel
+from apps.timp.image.selection import Selection, bit_spans
+from apps.timp.tools.fuzzy_select import FuzzySelect
+from apps.timp.tools.select import FreeSelect, RectangleSelect
+
+
+SIZE = Size(10, 4)
+RED = Color(255, 0, 0)
+
+
+def _region(x, y, width, height):
+    return Selection.from_region(SIZE, Region(x, y, width, height))
+
+
+def test_bit_spans():
+    assert bit_spans(0) == []
+    assert bit_spans(0b1110011) == [(0, 2), (4, 7)]
+
+
+def test_set_operations():
+    a = _region(0, 0, 4, 2)
+    b = _region(2, 1, 4, 2)
+    assert a.union(b).to_spans() == {0: [(0, 4)], 1: [(0, 6)], 2: [(2, 6)]}
+    assert a.intersect(b).to_spans() == {1: [(2, 4)]}
+    assert a.subtract(b).to_spans() == {0: [(0, 4)], 1: [(0, 2)]}
+    assert a.invert().contains(9, 3) and not a.invert().contains(0, 0)
+    assert a.union(b).bbox == Region(0, 0, 6, 3)
+    assert Selection(SIZE).bbox is None
+
+
+def test_clip_and_outline():
+    selection = _region(1, 0, 3, 3)
+    assert selection.clip({1: [(0, 10)], 3: [(0, 10)]}) == {1: [(1, 4)]}
+    assert selection.outline(1) == [(1, 2), (3, 4)]
+    assert selection.outline(0) == [(1, 4)]
+
+
+def test_mask_follows_an_offset():
+    selection = _region(2, 1, 3, 2)
+    mask = selection.mask(Offset(1, 1), Size(4, 3))
+    assert [bit_spans(bits) for bits in mask] == [[(1, 4)], [(1, 4)], []]
+    mask = selection.mask(Offset(-2, 0), Size(12, 2))
+    assert [bit_spans(bits) for bits in mask] == [[], [(4, 7)]]
+
+
+def test_polygon_includes_its_edges():
+    selection = Selection.from_polygon(
+        SIZE, [Offset(0, 0), Offset(4, 0), Offset(4, 3), Offset(0, 3)]
+    )
+    assert selection.to_spans() == {y: [(0, 5)] for y in range(4)}
+
+
+def _image():
+    image = Image("image", SIZE)
+    image.post_message = lambda message: None
+    image.create_layer("layer", SIZE)
+    layer = image.active_layer
+    for x in range(3):
+        layer.set(Offset(x, 1), Pixel(" ", bg=RED))
+    layer.set(Offset(6, 1), Pixel(" ", bg=RED))
+    return image, layer
+
+
+def test_fuzzy_select_grows_from_the_click():
+    image, layer = _image()
+    tool = FuzzySelect()
+    tool.apply_to_image(image, layer, Offset(0, 1))
+    assert image.selection.to_spans() == {1: [(0, 3)]}
+    tool.tool_options.contiguous.checked = False
+    tool.apply_to_image(image, layer, Offset(0, 1))
+    assert image.selection.to_spans() == {1: [(0, 3), (6, 7)]}
+    tool.tool_options.contiguous.checked = True
+
+
+def test_add_line():
+    selection = Selection(SIZE)
+    selection.add_line(Offset(0, 0), Offset(3, 3))
+    assert selection.to_spans() == {y: [(y, y + 1)] for y in range(4)}
+    assert selection.bbox == Region(0, 0, 4, 4)
+
+
+def test_free_select_fills_on_release():
+    image, layer = _image()
+    tool = FreeSelect()
+    corners = [Offset(1, 0), Offset(5, 0), Offset(5, 3), Offset(1, 3)]
+    for pos in corners:
+        tool.apply_to_image(image, layer, pos)
+    # only the path while dragging
+    assert image.selection.to_spans()[1] == [(5, 6)]
+    tool.end_stroke(image, corners[-1])
+    assert image.selection.to_spans() == {y: [(1, 6)] for y in range(4)}
+
+
+def test_rectangle_select_adds_to_the_selection():
+    image, layer = _image()
+    image.select(_region(0, 0, 1, 1))
+    tool = RectangleSelect()
+    tool.tool_options.mode.value.value = "add"
+    for pos in (Offset(3, 2), Offset(5, 3), Offset(4, 3)):
+        tool.apply_to_image(image, layer, pos)
+    tool.end_stroke(image, Offset(4, 3))
+    tool.tool_options.mode.value.value = "replace"
+    assert image.selection.to_spans() == {
+        0: [(0, 1)], 2: [(3, 5)], 3: [(3, 5)]
+    }
+
+
+def test_outline_keeps_the_whole_row():
+    strip = Strip([Segment("0123456789")])
+    for spans in ([(2, 4)], [(0, 3), (7, 10)], []):
+        outlined = outline_strip(strip, spans)
+        assert outlined.cell_length == 10
+        assert outlined.text == "0123456789"
+    styled = [
+        segment.text for segment in outline_strip(strip, [(2, 4)])
+        if segment.style == OUTLINE_STYLE
+    ]
+    assert styled == ["23"]
@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+import pytest
+from textual.color import Color
+from textual.geometry import Offset, Region, Size
+
+from apps.timp.image.layer import Layer
+from apps.timp.image.pixel import Pixel
+from apps.timp.image import smudge
+from apps.timp.image.selection import Selection
+from apps.timp.image.smudge import SmudgeBuffer
+from apps.timp.image.stamp import Stamp
+from apps.timp.tools.smudge import Smudge
+
+pytest.importorskip("numpy")
+
+
+SIZE = Size(40, 6)
+RED = Color(255, 0, 0)
+BLUE = Color(0, 0, 255)
+
+
+def _layer():
+    layer = Layer("layer", SIZE)
+    layer.post_message = lambda message: None
+    for y in range(SIZE.height):
+        for x in range(SIZE.width):
+            layer.set(Offset(x, y), Pixel(" ", bg=RED if x < 5 else BLUE))
+    return layer
+
+
+def _bg(layer, x, y):
+    return layer.get(Offset(x, y)).bg
+
+
+def test_first_dab_only_picks_up():
+    layer = _layer()
+    buffer = SmudgeBuffer(Stamp.square(1), 0.5)
+    buffer.dab(layer, 4, 2)
+    assert _bg(layer, 4, 2) == RED
+    assert buffer.bg.shape == (1, 1, 4)
+
+
+def test_colors_are_dragged_along():
+    layer = _layer()
+    buffer = SmudgeBuffer(Stamp.square(1), 0.5)
+    for x in range(4, 8):
+        buffer.dab(layer, x, 2)
+    reds = [_bg(layer, x, 2).r for x in range(4, 9)]
+    assert reds[0] == 255 and reds[-1] == 0
+    # less of the red is left at every dab
+    assert reds[1] > reds[2] > reds[3] > 0
+    assert _bg(layer, 5, 1) == BLUE
+
+
+def test_dabs_stay_in_the_selection():
+    layer = _layer()
+    selection = Selection.from_region(SIZE, Region(5, 2, 1, 1))
+    buffer = SmudgeBuffer(Stamp.square(3), 0.5)
+    buffer.dab(layer, 4, 2, selection)
+    buffer.dab(layer, 5, 2, selection)
+    assert _bg(layer, 5, 2) != BLUE
+    assert _bg(layer, 6, 2) == BLUE and _bg(layer, 5, 3) == BLUE
+
+
+def test_dabs_past_the_edge():
+    layer = _layer()
+    buffer = SmudgeBuffer(Stamp.square(3), 0.5)
+    buffer.dab(layer, 0, 0)
+    buffer.dab(layer, -1, 0)
+    assert _bg(layer, 0, 0) == RED
+
+
+def test_reads_only_the_tiles_under_the_brush():
+    layer = _layer()
+    storage = layer.storage
+    read = []
+    tile = storage.tile
+    storage.tile = lambda index: read.append(index) or tile(index)
+    buffer = SmudgeBuffer(Stamp.square(3), 0.5)
+    buffer.dab(layer, 4, 2)
+    assert set(read) == {0}
+
+
+def _smudge():
+    return Smudge(color_area=SimpleNamespace(fg=None, bg=None))
+
+
+def test_smudge_tool_stroke():
+    tool = _smudge()
+    assert not tool.disabled
+    layer = _layer()
+    tool.apply_to_layer(layer, Offset(4, 2))
+    tool.apply_line(layer, Offset(4, 2), Offset(7, 2))
+    tool.end_stroke(None, Offset(7, 2))
+    assert _bg(layer, 6, 2).r > 0
+    assert tool._buffer is None
+
+
+def test_disabled_without_numpy(monkeypatch):
+    monkeypatch.setattr(smudge, "enabled", False)
+    tool = _smudge()
+    assert tool.disabled
+    assert "numpy" in tool.tooltip
@@ -0,0 +1,33 @@
+import pytest
+
+from apps.timp.image.stamp import MAX_SIZE, Stamp, shape_stamp
+
+
+def test_square_and_circle():
+    assert shape_stamp("square", 3).groups == [(None, [0b111] * 3)]
+    assert Stamp.circle(5).mask == [0b01110] + [0b11111] * 3 + [0b01110]
+    assert Stamp.circle(4).center == (1, 1)
+
+
+def test_from_text_groups_the_glyphs():
+    stamp = Stamp.from_text("ab\n b")
+    assert (stamp.width, stamp.height) == (2, 2)
+    assert dict(stamp.groups) == {"a": [0b01, 0], "b": [0b10, 0b10]}
+
+
+def test_from_glyphs_skips_blanks():
+    stamp = Stamp.from_glyphs([[None, "👍🏽"], [" ", None]])
+    assert dict(stamp.groups) == {"👍🏽": [0b10, 0]}
+
+
+@pytest.mark.parametrize("text", ["", "  \n ", "x" * (MAX_SIZE + 1)])
+def test_unusable_text(text):
+    with pytest.raises(ValueError):
+        Stamp.from_text(text)
+
+
+def test_edge_and_place():
+    stamp = Stamp.square(3)
+    assert stamp.edge() == [0b111, 0b101, 0b111]
+    placed = stamp.place(stamp.mask, [(0, 0), (5, 0)], 6, 4)
+    assert placed == {0: 0b110011, 1: 0b110011}
@@ -0,0 +1,154 @@
+from textual.color import Color
+from textual.geometry import Size
+
+from apps.timp.image.pixel import Pixel
+from apps.timp.image.storage import (
+    CELL, EMPTY, FG, TILE_HEIGHT, TILE_WIDTH, PixelStorage, Tile,
+    decode_glyph, encode_glyph, pack_pixel, unpack_pixel
+)
+
+
+RED = Color(255, 0, 0)
+# alpha is kept in 8 bits
+BLUE = Color(0, 0, 255, 51 / 255)
+
+
+def test_pack_pixel_round_trip():
+    for pixel in (
+        Pixel("x"),
+        Pixel("x", fg=RED),
+        Pixel(" ", bg=BLUE),
+        Pixel("#", fg=RED, bg=BLUE),
+    ):
+        assert unpack_pixel(pack_pixel(pixel)) == pixel
+
+
+def test_pack_none_is_empty():
+    assert pack_pixel(None) == EMPTY
+    assert unpack_pixel(EMPTY) is None
+
+
+def test_pack_pixel_mask():
+    glyph, fg, bg, mask = pack_pixel(Pixel("a", fg=RED))
+    assert glyph == ord("a")
+    assert mask == CELL | FG
+    assert bg == 0
+
+
+def test_opacity_scales_the_cell_alpha():
+    pixel = unpack_pixel(pack_pixel(Pixel("#", fg=RED, bg=BLUE)), 0.5)
+    assert pixel.fg.a == 0.5
+    assert round(pixel.bg.a * 255) == 26
+
+
+def test_multi_codepoint_glyphs():
+    glyph = encode_glyph("é")
+    assert glyph > 0x10FFFF
+    assert encode_glyph("é") == glyph
+    assert decode_glyph(glyph) == "é"
+
+
+def test_set_and_get():
+    storage = PixelStorage(Size(5, 3))
+    cell = pack_pixel(Pixel("a", fg=RED))
+    storage.set(4, 2, cell)
+    assert storage.get(4, 2) == cell
+    assert storage.get(0, 0) == EMPTY
+
+
+def test_get_row():
+    storage = PixelStorage(Size(5, 3))
+    assert storage.get_row(1) is None
+    cell = pack_pixel(Pixel("a", fg=RED))
+    storage.set(2, 1, cell)
+    glyphs, fg, bg, mask = storage.get_row(1)
+    assert len(glyphs) == len(mask) == 5
+    assert list(zip(glyphs, fg, bg, mask))[2] == cell
+    assert list(mask) == [0, 0, cell[3], 0, 0]
+    storage.set(2, 1, EMPTY)
+    assert storage.get_row(1) is None
+
+
+def test_from_rows():
+    rows = [[None, Pixel("a")], [Pixel("b", bg=RED), None]]
+    storage = PixelStorage.from_rows(Size(2, 2), rows)
+    assert unpack_pixel(storage.get(1, 0)) == Pixel("a")
+    assert unpack_pixel(storage.get(0, 1)) == Pixel("b", bg=RED)
+    assert storage.get(0, 0) == EMPTY
+
+
+def test_tiles_are_allocated_on_write():
+    storage = PixelStorage(Size(TILE_WIDTH * 3, TILE_HEIGHT * 2))
+    assert storage._tiles == [None] * 6
+    storage.set(TILE_WIDTH + 1, TILE_HEIGHT, pack_pixel(Pixel("a")))
+    assert [type(tile) for tile in storage._tiles].count(Tile) == 1
+    assert type(storage._tiles[4]) is Tile
+
+
+def test_cleared_tiles_are_dropped():
+    storage = PixelStorage(Size(TILE_WIDTH, TILE_HEIGHT))
+    storage.set(1, 1, pack_pixel(Pixel("a")))
+    storage.set(2, 1, pack_pixel(Pixel("b")))
+    storage.set(1, 1, EMPTY)
+    assert storage._tiles[0] is not None
+    storage.set(2, 1, EMPTY)
+    assert storage._tiles[0] is None
+    assert storage.is_row_empty(1)
+
+
+def test_filled_storage_keeps_uniform_tiles():
+    cell = pack_pixel(Pixel(" ", bg=RED))
+    size = Size(TILE_WIDTH * 2 + 3, TILE_HEIGHT + 1)
+    storage = PixelStorage.filled(size, cell)
+    assert all(tile == cell for tile in storage._tiles)
+    glyphs, fg, bg, mask = storage.get_row(size.height - 1)
+    assert len(mask) == size.width
+    assert set(zip(glyphs, fg, bg, mask)) == {cell}
+    # writing to a uniform tile expands only that one
+    storage.set(0, 0, pack_pixel(Pixel("x", bg=RED)))
+    assert type(storage._tiles[0]) is Tile
+    assert storage._tiles[1] == cell
+    assert storage.get(1, 0) == cell
+
+
+def _dense(size=Size(TILE_WIDTH * 2, TILE_HEIGHT)):
+    storage = PixelStorage(size)
+    for x in range(size.width):
+        storage.set(x, 0, pack_pixel(Pixel(chr(ord("a") + x % 26))))
+    return storage
+
+
+def test_copies_share_tiles_until_written():
+    storage = _dense()
+    copy = storage.copy()
+    assert copy._tiles[0] is storage._tiles[0]
+    assert storage._tiles[0].owners == 2
+    copy.set(0, 0, pack_pixel(Pixel("z")))
+    assert copy._tiles[0] is not storage._tiles[0]
+    assert decode_glyph(storage.get(0, 0)[0]) == "a"
+    assert decode_glyph(copy.get(0, 0)[0]) == "z"
+    assert storage._tiles[0].owners == 1
+    assert copy._tiles[1] is storage._tiles[1]
+
+
+def test_last_holder_writes_in_place():
+    storage = _dense()
+    copy = storage.copy()
+    tile = storage._tiles[0]
+    del copy
+    assert tile.owners == 1
+    storage.set(0, 0, pack_pixel(Pixel("z")))
+    assert storage._tiles[0] is tile
+
+
+def test_masked_copy_keeps_only_the_mask():
+    storage = _dense()
+    # the first tile whole, two cells of the second one
+    mask = [(1 << TILE_WIDTH) - 1] * TILE_HEIGHT
+    mask[0] |= 0b11 << TILE_WIDTH
+    copy = storage.copy(mask)
+    assert copy._tiles[0] is storage._tiles[0]
+    assert copy._tiles[1] is not storage._tiles[1]
+    assert copy.get(TILE_WIDTH + 2, 0) == EMPTY
+    assert copy.get(TILE_WIDTH + 1, 0) == storage.get(TILE_WIDTH + 1, 0)
+    assert storage._tiles[1].owners == 1